@@ -0,0 +1,30 @@
+"""Holidays per club
+
+Revision ID: 0b7e3d9a5c12
+Revises: 6a1f3c8e2b97
+Create Date: 2026-10-19 23:12:40.318205
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0b7e3d9a5c12"
+down_revision = "6a1f3c8e2b97"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Существующие праздники относятся к клубу 1 (DEFAULT_CLUB_ID), как и остальные данные в add_clubs
+    op.add_column('holidays', sa.Column('club_id', sa.Integer(), nullable=False, server_default='1'))
+    op.alter_column('holidays', 'club_id', server_default=None)
+    op.create_foreign_key('holidays_club_id_fkey', 'holidays', 'clubs', ['club_id'], ['id'])
+    op.drop_constraint('holidays_pkey', 'holidays', type_='primary')
+    op.create_primary_key('holidays_pkey', 'holidays', ['club_id', 'date'])
+
+def downgrade() -> None:
+    # Одна дата на шард: из праздников разных клубов на один день остаётся одна строка
+    op.execute("DELETE FROM holidays a USING holidays b WHERE a.date = b.date AND a.club_id > b.club_id")
+    op.drop_constraint('holidays_pkey', 'holidays', type_='primary')
+    op.create_primary_key('holidays_pkey', 'holidays', ['date'])
+    op.drop_constraint('holidays_club_id_fkey', 'holidays', type_='foreignkey')
+    op.drop_column('holidays', 'club_id')
@@ -0,0 +1,30 @@
+"""Add cache events
+
+Revision ID: 1a9c4b7e2f58
+Revises: 8d3e6f1a4c92
+Create Date: 2026-10-19 16:07:33.218940
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "1a9c4b7e2f58"
+down_revision = "8d3e6f1a4c92"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Журнал событий инвалидации для CACHE_BUS_MODE=poll (когда LISTEN/NOTIFY недоступен)
+    op.create_table(
+        'cache_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cache_events_created_at', 'cache_events', ['created_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_cache_events_created_at', table_name='cache_events')
+    op.drop_table('cache_events')
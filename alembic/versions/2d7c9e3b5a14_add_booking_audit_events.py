@@ -0,0 +1,53 @@
+"""Add booking audit events
+
+Revision ID: 2d7c9e3b5a14
+Revises: 9f2e6a4c1d83
+Create Date: 2026-10-19 20:14:37.930216
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "2d7c9e3b5a14"
+down_revision = "9f2e6a4c1d83"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Журнал действий с бронями; пишется пачками из буфера воркера
+    op.create_table(
+        'booking_audit_events',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('club_id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('court_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_booking_audit_events_booking_id', 'booking_audit_events', ['booking_id'], unique=False)
+    op.create_index('ix_booking_audit_events_court_id_created_at', 'booking_audit_events', ['court_id', 'created_at'], unique=False)
+
+    # Только добавление: UPDATE и DELETE строк журнала запрещены на уровне базы
+    op.execute("""
+        CREATE FUNCTION booking_audit_events_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'booking_audit_events is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER booking_audit_events_append_only
+        BEFORE UPDATE OR DELETE ON booking_audit_events
+        FOR EACH ROW EXECUTE FUNCTION booking_audit_events_append_only()
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER booking_audit_events_append_only ON booking_audit_events")
+    op.execute("DROP FUNCTION booking_audit_events_append_only()")
+    op.drop_index('ix_booking_audit_events_court_id_created_at', table_name='booking_audit_events')
+    op.drop_index('ix_booking_audit_events_booking_id', table_name='booking_audit_events')
+    op.drop_table('booking_audit_events')
@@ -0,0 +1,21 @@
+"""Audit events created_at index
+
+Revision ID: 3c9a1e7d4f68
+Revises: 0b7e3d9a5c12
+Create Date: 2026-10-19 23:41:06.572913
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "3c9a1e7d4f68"
+down_revision = "0b7e3d9a5c12"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Постраничная лента журнала по курсору (created_at, id) без фильтра по корту
+    op.create_index('ix_booking_audit_events_created_at_id', 'booking_audit_events', ['created_at', 'id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_booking_audit_events_created_at_id', table_name='booking_audit_events')
@@ -0,0 +1,32 @@
+"""User search indexes
+
+Revision ID: 3f1b7c2e9d40
+Revises: 9a6c77ebbb38
+Create Date: 2026-10-19 10:12:04.511382
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "3f1b7c2e9d40"
+down_revision = "9a6c77ebbb38"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Триграммы для нечёткого поиска и LIKE '%...%' по имени, email и цифрам телефона
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX ix_users_full_name_trgm ON users "
+        "USING gin (lower((first_name || ' ') || last_name) gin_trgm_ops)"
+    )
+    op.execute("CREATE INDEX ix_users_email_trgm ON users USING gin (lower(email) gin_trgm_ops)")
+    op.execute(
+        "CREATE INDEX ix_users_phone_digits_trgm ON users "
+        "USING gin (regexp_replace(phone, '\\D', '', 'g') gin_trgm_ops)"
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_users_phone_digits_trgm', table_name='users')
+    op.drop_index('ix_users_email_trgm', table_name='users')
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
@@ -0,0 +1,48 @@
+"""Booking indexes
+
+Revision ID: 4e8a2c6f9b31
+Revises: c6b2d8e4a1f7
+Create Date: 2026-10-19 18:02:15.406129
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "4e8a2c6f9b31"
+down_revision = "c6b2d8e4a1f7"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Занятость корта (availability, create_booking, free-slots, лента корта): только активные брони
+    op.create_index(
+        'ix_bookings_court_active', 'bookings', ['court_id', 'start_time', 'end_time'],
+        unique=False, postgresql_where=sa.text("status = 'active'")
+    )
+    # Предстоящие брони пользователя (/bookings/my, лента пользователя): user_id = ? AND end_time > now()
+    op.create_index(
+        'ix_bookings_user_active', 'bookings', ['user_id', 'end_time'],
+        unique=False, postgresql_where=sa.text("status = 'active'")
+    )
+    # /bookings/filter по user_ids и периоду в любом статусе; user_id заодно покрывает внешний ключ
+    op.create_index('ix_bookings_user_id', 'bookings', ['user_id'], unique=False)
+    op.create_index('ix_bookings_start_time', 'bookings', ['start_time'], unique=False)
+
+    # Дубли первичных ключей и уникального ограничения users_email_key
+    op.drop_index('ix_bookings_id', table_name='bookings')
+    op.drop_index('ix_courts_id', table_name='courts')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+
+    op.execute("ANALYZE bookings")
+
+def downgrade() -> None:
+    op.create_index('ix_users_email', 'users', ['email'], unique=False)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_courts_id', 'courts', ['id'], unique=False)
+    op.create_index('ix_bookings_id', 'bookings', ['id'], unique=False)
+
+    op.drop_index('ix_bookings_start_time', table_name='bookings')
+    op.drop_index('ix_bookings_user_id', table_name='bookings')
+    op.drop_index('ix_bookings_user_active', table_name='bookings')
+    op.drop_index('ix_bookings_court_active', table_name='bookings')
@@ -0,0 +1,34 @@
+"""Add slot holds
+
+Revision ID: 5c0f8e2a7b13
+Revises: e7a4d91c3b25
+Create Date: 2026-10-19 13:41:52.107734
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "5c0f8e2a7b13"
+down_revision = "e7a4d91c3b25"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Используется только при SLOT_HOLD_BACKEND=db
+    op.create_table(
+        'slot_holds',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('court_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['court_id'], ['courts.id'], name='slot_holds_court_id_fkey', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='slot_holds_user_id_fkey', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_slot_holds_court_id', 'slot_holds', ['court_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_slot_holds_court_id', table_name='slot_holds')
+    op.drop_table('slot_holds')
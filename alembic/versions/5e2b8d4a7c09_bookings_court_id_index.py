@@ -0,0 +1,22 @@
+"""Bookings court_id index
+
+Revision ID: 5e2b8d4a7c09
+Revises: 3c9a1e7d4f68
+Create Date: 2026-10-20 00:06:52.184377
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "5e2b8d4a7c09"
+down_revision = "3c9a1e7d4f68"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # /bookings/filter по корту без фильтра по статусу: ix_bookings_court_active частичный и отменённые брони не покрывает
+    op.create_index('ix_bookings_court_id_start_time', 'bookings', ['court_id', 'start_time'], unique=False)
+    op.execute("ANALYZE bookings")
+
+def downgrade() -> None:
+    op.drop_index('ix_bookings_court_id_start_time', table_name='bookings')
@@ -0,0 +1,43 @@
+"""Booking times timestamptz
+
+Revision ID: 6a1f3c8e2b97
+Revises: 2d7c9e3b5a14
+Create Date: 2026-10-19 21:02:15.448193
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "6a1f3c8e2b97"
+down_revision = "2d7c9e3b5a14"
+branch_labels = None
+depends_on = None
+
+# Все существующие брони и удержания записаны наивным московским временем
+LEGACY_TIMEZONE = "Europe/Moscow"
+
+COLUMNS = [
+    ('bookings', 'start_time'),
+    ('bookings', 'end_time'),
+    ('slot_holds', 'start_time'),
+    ('slot_holds', 'end_time'),
+]
+
+def upgrade() -> None:
+    # Индексы по этим колонкам PostgreSQL перестраивает сам
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(timezone=True),
+            existing_nullable=False,
+            postgresql_using=f"{column} AT TIME ZONE '{LEGACY_TIMEZONE}'"
+        )
+
+def downgrade() -> None:
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=sa.DateTime(),
+            existing_nullable=False,
+            postgresql_using=f"{column} AT TIME ZONE '{LEGACY_TIMEZONE}'"
+        )
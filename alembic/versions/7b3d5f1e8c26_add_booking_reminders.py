@@ -0,0 +1,35 @@
+"""Add booking reminders
+
+Revision ID: 7b3d5f1e8c26
+Revises: 4e8a2c6f9b31
+Create Date: 2026-10-19 18:40:52.113074
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "7b3d5f1e8c26"
+down_revision = "4e8a2c6f9b31"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Состояние СМС-напоминания по брони
+    op.add_column('bookings', sa.Column('reminder_status', sa.String(), nullable=True))
+    op.add_column('bookings', sa.Column('reminder_attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('bookings', sa.Column('reminder_claimed_at', sa.DateTime(), nullable=True))
+    op.add_column('bookings', sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+
+    # Прошедшие брони не напоминаем и не держим в частичном индексе
+    op.execute("UPDATE bookings SET reminder_status = 'skipped' WHERE start_time <= now() AT TIME ZONE 'Europe/Moscow'")
+    op.create_index(
+        'ix_bookings_reminder_due', 'bookings', ['start_time'],
+        unique=False, postgresql_where=sa.text("status = 'active' AND reminder_status IS NULL")
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_bookings_reminder_due', table_name='bookings')
+    op.drop_column('bookings', 'reminder_sent_at')
+    op.drop_column('bookings', 'reminder_claimed_at')
+    op.drop_column('bookings', 'reminder_attempts')
+    op.drop_column('bookings', 'reminder_status')
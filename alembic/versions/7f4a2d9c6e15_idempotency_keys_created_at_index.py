@@ -0,0 +1,21 @@
+"""Idempotency keys created_at index
+
+Revision ID: 7f4a2d9c6e15
+Revises: 5e2b8d4a7c09
+Create Date: 2026-10-20 10:12:37.405118
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "7f4a2d9c6e15"
+down_revision = "5e2b8d4a7c09"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Периодическая чистка ключей старше IDEMPOTENCY_TTL_SECONDS
+    op.create_index('ix_idempotency_keys_created_at', 'idempotency_keys', ['created_at'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('ix_idempotency_keys_created_at', table_name='idempotency_keys')
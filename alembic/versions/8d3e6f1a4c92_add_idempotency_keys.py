@@ -0,0 +1,30 @@
+"""Add idempotency keys
+
+Revision ID: 8d3e6f1a4c92
+Revises: 5c0f8e2a7b13
+Create Date: 2026-10-19 14:58:09.664021
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "8d3e6f1a4c92"
+down_revision = "5c0f8e2a7b13"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Используется только при IDEMPOTENCY_BACKEND=db
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('fingerprint', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+def downgrade() -> None:
+    op.drop_table('idempotency_keys')
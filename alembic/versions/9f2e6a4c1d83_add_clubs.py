@@ -0,0 +1,57 @@
+"""Add clubs
+
+Revision ID: 9f2e6a4c1d83
+Revises: 7b3d5f1e8c26
+Create Date: 2026-10-19 19:31:08.552947
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9f2e6a4c1d83"
+down_revision = "7b3d5f1e8c26"
+branch_labels = None
+depends_on = None
+
+TENANT_TABLES = ('users', 'courts', 'bookings', 'tariffs')
+
+def upgrade() -> None:
+    # Клубы; все существующие данные относятся к клубу 1 (DEFAULT_CLUB_ID)
+    op.create_table(
+        'clubs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.execute("INSERT INTO clubs (id, name) VALUES (1, 'Основной клуб')")
+    op.execute("SELECT setval(pg_get_serial_sequence('clubs', 'id'), (SELECT max(id) FROM clubs))")
+
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column('club_id', sa.Integer(), nullable=False, server_default='1'))
+        op.alter_column(table, 'club_id', server_default=None)
+        op.create_foreign_key(f'{table}_club_id_fkey', table, 'clubs', ['club_id'], ['id'])
+
+    op.create_index('ix_users_club_id', 'users', ['club_id'], unique=False)
+    op.create_index('ix_courts_club_id', 'courts', ['club_id'], unique=False)
+    op.create_index('ix_tariffs_club_id', 'tariffs', ['club_id'], unique=False)
+    op.create_index('ix_bookings_club_id_start_time', 'bookings', ['club_id', 'start_time'], unique=False)
+
+    # Названия кортов уникальны в пределах клуба
+    op.drop_constraint('courts_name_key', 'courts', type_='unique')
+    op.create_unique_constraint('uq_courts_club_name', 'courts', ['club_id', 'name'])
+
+def downgrade() -> None:
+    op.drop_constraint('uq_courts_club_name', 'courts', type_='unique')
+    op.create_unique_constraint('courts_name_key', 'courts', ['name'])
+
+    op.drop_index('ix_bookings_club_id_start_time', table_name='bookings')
+    op.drop_index('ix_tariffs_club_id', table_name='tariffs')
+    op.drop_index('ix_courts_club_id', table_name='courts')
+    op.drop_index('ix_users_club_id', table_name='users')
+
+    for table in reversed(TENANT_TABLES):
+        op.drop_constraint(f'{table}_club_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'club_id')
+
+    op.drop_table('clubs')
@@ -0,0 +1,37 @@
+"""Add canonical phone_e164 column
+
+Revision ID: b52e0a8d61c7
+Revises: 3f1b7c2e9d40
+Create Date: 2026-10-19 11:03:47.902114
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b52e0a8d61c7"
+down_revision = "3f1b7c2e9d40"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('phone_e164', sa.String(), nullable=True))
+    # Заполняем из phone: только цифры, ведущая 8 заменяется на 7 (как в app.utils.phone.normalize_phone)
+    op.execute(
+        "UPDATE users SET phone_e164 = regexp_replace("
+        "regexp_replace(phone, '\\D', '', 'g'), '^8', '7')"
+    )
+    op.alter_column('users', 'phone_e164', nullable=False)
+    op.create_index('ix_users_phone_e164', 'users', ['phone_e164'], unique=True)
+
+    # Триграммный индекс по цифрам телефона теперь строится по готовой колонке
+    op.drop_index('ix_users_phone_digits_trgm', table_name='users')
+    op.execute("CREATE INDEX ix_users_phone_e164_trgm ON users USING gin (phone_e164 gin_trgm_ops)")
+
+def downgrade() -> None:
+    op.drop_index('ix_users_phone_e164_trgm', table_name='users')
+    op.execute(
+        "CREATE INDEX ix_users_phone_digits_trgm ON users "
+        "USING gin (regexp_replace(phone, '\\D', '', 'g') gin_trgm_ops)"
+    )
+    op.drop_index('ix_users_phone_e164', table_name='users')
+    op.drop_column('users', 'phone_e164')
@@ -0,0 +1,41 @@
+"""Add tariffs and holidays
+
+Revision ID: c6b2d8e4a1f7
+Revises: 1a9c4b7e2f58
+Create Date: 2026-10-19 17:25:40.871263
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c6b2d8e4a1f7"
+down_revision = "1a9c4b7e2f58"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Ценовые полосы по типу дня; court_id = NULL — тариф по умолчанию для всех кортов
+    op.create_table(
+        'tariffs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('court_id', sa.Integer(), nullable=True),
+        sa.Column('day_type', sa.String(), nullable=False),
+        sa.Column('starts_at', sa.Time(), nullable=False),
+        sa.Column('ends_at', sa.Time(), nullable=False),
+        sa.Column('price_per_hour', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['court_id'], ['courts.id'], name='tariffs_court_id_fkey', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tariffs_court_id', 'tariffs', ['court_id'], unique=False)
+
+    op.create_table(
+        'holidays',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('date')
+    )
+
+def downgrade() -> None:
+    op.drop_table('holidays')
+    op.drop_index('ix_tariffs_court_id', table_name='tariffs')
+    op.drop_table('tariffs')
@@ -0,0 +1,32 @@
+"""Add court schedules
+
+Revision ID: e7a4d91c3b25
+Revises: b52e0a8d61c7
+Create Date: 2026-10-19 12:20:15.338270
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e7a4d91c3b25"
+down_revision = "b52e0a8d61c7"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Часы работы и шаг слотов по дням недели; корты без записей работают по умолчанию 08:00–23:00, шаг 60
+    op.create_table(
+        'court_schedules',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('court_id', sa.Integer(), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('opens_at', sa.Time(), nullable=False),
+        sa.Column('closes_at', sa.Time(), nullable=False),
+        sa.Column('slot_minutes', sa.Integer(), nullable=False, server_default='60'),
+        sa.ForeignKeyConstraint(['court_id'], ['courts.id'], name='court_schedules_court_id_fkey', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('court_id', 'weekday', name='uq_court_schedules_court_weekday')
+    )
+
+def downgrade() -> None:
+    op.drop_table('court_schedules')
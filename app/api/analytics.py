@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.schemas.analytics import OccupancyHeatmap, RevenueCurve, PeakHours, SnapshotExport
+from app.db.session import get_db
+from app.db.tenancy import current_club_id
+from app.dependencies import get_current_admin
+from app.db.models import User as UserModel
+from app.services.analytics_service import (
+    export_snapshots,
+    occupancy_heatmap,
+    peak_hours,
+    revenue_curve,
+    snapshot_store,
+)
+from app.utils.query_budget import query_budget
+from app.utils.timezone import club_zone, local_now
+from datetime import date, timedelta
+from typing import List, Optional
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+ANALYTICS_MAX_DAYS = 3 * 366
+
+def _snapshot_and_range(db: Session, date_from: Optional[date], date_to: Optional[date]):
+    """Снимок клуба и период; по умолчанию — последние 365 дней по сегодняшний включительно."""
+    snapshot = snapshot_store.get(current_club_id(db))
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Снимок броней ещё не построен")
+    zone = club_zone(db)
+    date_to = date_to or local_now(zone).date()
+    date_from = date_from or date_to - timedelta(days=364)
+    if date_to < date_from:
+        raise HTTPException(status_code=422, detail="date_to must not be earlier than date_from")
+    if (date_to - date_from).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"Период не больше {ANALYTICS_MAX_DAYS} дней")
+    return snapshot, zone, date_from, date_to
+
+# Аналитика считается по снимку на диске: в базу ходит только авторизация
+
+@router.get("/heatmap", response_model=OccupancyHeatmap)
+@query_budget(1)
+def get_occupancy_heatmap(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    court_ids: Optional[List[int]] = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    snapshot, zone, date_from, date_to = _snapshot_and_range(db, date_from, date_to)
+    courts, heatmap = occupancy_heatmap(snapshot, zone, date_from, date_to, court_ids)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "snapshot_built_at": snapshot.built_at,
+        "courts": [
+            {"court_id": court_id, "occupancy": heatmap[i].round(4).tolist()}
+            for i, court_id in enumerate(courts)
+        ]
+    }
+
+@router.get("/revenue", response_model=RevenueCurve)
+@query_budget(1)
+def get_revenue_curve(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    bucket: str = Query("day", regex="^(day|week|month)$"),
+    court_ids: Optional[List[int]] = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    snapshot, zone, date_from, date_to = _snapshot_and_range(db, date_from, date_to)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "snapshot_built_at": snapshot.built_at,
+        "bucket": bucket,
+        "points": [
+            {"period_start": period_start, "revenue": revenue, "bookings": bookings}
+            for period_start, revenue, bookings in revenue_curve(snapshot, zone, date_from, date_to, bucket, court_ids)
+        ]
+    }
+
+@router.get("/peak-hours", response_model=PeakHours)
+@query_budget(1)
+def get_peak_hours(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(5, ge=1, le=24),
+    court_ids: Optional[List[int]] = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    snapshot, zone, date_from, date_to = _snapshot_and_range(db, date_from, date_to)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "snapshot_built_at": snapshot.built_at,
+        "hours": [
+            {"hour": hour, "booked_minutes": minutes, "occupancy": round(occupancy, 4)}
+            for hour, minutes, occupancy in peak_hours(snapshot, zone, date_from, date_to, limit, court_ids)
+        ]
+    }
+
+@router.post("/snapshot", response_model=SnapshotExport)
+def rebuild_snapshot(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    """Пересобирает снимки всех клубов базы текущего клуба, не дожидаясь фоновой выгрузки."""
+    return {"clubs": export_snapshots(db.get_bind())}
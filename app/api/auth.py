@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
-from app.schemas.user import UserCreate, User, Token
-from app.services.auth_service import create_user, authenticate_user, resend_verification_code
-from app.db.session import get_db
+from app.schemas.user import UserCreate, User, Token, UserBulkCreate, UserBulkResult
+from app.services.auth_service import create_user, create_users_bulk, authenticate_user, resend_verification_code
+from app.db.session import get_db, session_for_club
+from app.db.tenancy import current_club_id
+from app.core.config import settings
 from app.dependencies import get_current_admin, get_current_active_user
 from app.db.models import User as UserModel
 from app.core.security import create_access_token
 from random import randint
 from app.utils.sms import send_sms
+from app.utils.phone import normalize_phone
+from app.services.idempotency_service import idempotency, request_fingerprint
+from typing import Optional
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import logging
@@ -31,46 +36,78 @@ def create_refresh_token(data: dict):
     return encoded_jwt
 
 @router.post("/login")
-async def login(phone: str, db: Session = Depends(get_db)):
-    user = db.query(UserModel).filter(UserModel.phone == phone).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Генерируем код верификации
-    user.verification_code = str(randint(1000, 9999))
-    db.commit()
-    
-    # Отправляем СМС с кодом
-    try:
-        await send_sms(phone, user.verification_code)
-        logger.info(f"User login attempt: Phone: {phone}, User ID: {user.id}, Verification Code: {user.verification_code}")
-    except HTTPException as e:
-        logger.error(f"Failed to send SMS to {phone}: {e.detail}")
-        raise e
+async def login(
+    phone: str,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    phone_e164 = normalize_phone(phone)
 
-    return {
-        "status": "success",
-        "message": "Verification code sent",
-        "user_id": user.id
-    }
+    async def handler():
+        user = db.query(UserModel).filter(UserModel.phone_e164 == phone_e164).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Генерируем код верификации
+        user.verification_code = str(randint(1000, 9999))
+        db.commit()
+
+        # Отправляем СМС с кодом
+        try:
+            await send_sms(user.phone_e164, user.verification_code)
+            logger.info(f"User login attempt: Phone: {phone}, User ID: {user.id}, Verification Code: {user.verification_code}")
+        except HTTPException as e:
+            logger.error(f"Failed to send SMS to {phone}: {e.detail}")
+            raise e
+
+        return {
+            "status": "success",
+            "message": "Verification code sent",
+            "user_id": user.id
+        }
+
+    # Повтор с тем же ключом не генерирует новый код и не шлёт СМС повторно
+    return await idempotency.run_async(
+        f"login:{current_club_id(db)}:{phone_e164}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(phone_e164),
+        handler
+    )
 
 @router.post("/register", response_model=User)
 async def register_user(
     user: UserCreate,
     db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user)
+    current_user: UserModel = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     is_admin_creator = current_user and current_user.role == "admin"
-    return await create_user(db, user, is_admin_creator)
+
+    async def handler():
+        return User.from_orm(await create_user(db, user, is_admin_creator))
+
+    return await idempotency.run_async(
+        f"register:{current_club_id(db)}:{current_user.id if current_user else 'anon'}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(user.dict()),
+        handler
+    )
+
+@router.post("/register/bulk", response_model=UserBulkResult)
+async def register_users_bulk(
+    payload: UserBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    return await create_users_bulk(db, payload.users, is_admin_creator=True)
 
 @router.post("/verify", response_model=Token)
 def verify_user(phone: str, code: str, db: Session = Depends(get_db)):
-    user = authenticate_user(db, phone, code)
+    user = authenticate_user(db, normalize_phone(phone), code)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid code")
     
-    access_token = create_access_token(data={"sub": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": str(user.id)})
+    # Клуб в токене выбирает шард и фильтр club_id для всех последующих запросов
+    access_token = create_access_token(data={"sub": str(user.id), "club": user.club_id})
+    refresh_token = create_refresh_token(data={"sub": str(user.id), "club": user.club_id})
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -81,20 +118,22 @@ def verify_user(phone: str, code: str, db: Session = Depends(get_db)):
     }
 
 @router.post("/refresh")
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
+async def refresh_token(refresh_token: str):
     try:
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
+        club_id = int(payload.get("club", settings.DEFAULT_CLUB_ID))
         
-        # Проверяем, существует ли пользователь
-        user = db.query(UserModel).filter(UserModel.id == int(user_id)).first()
+        # Проверяем, существует ли пользователь (refresh-токен приходит параметром, поэтому шард выбираем здесь)
+        with session_for_club(club_id) as db:
+            user = db.query(UserModel).filter(UserModel.id == int(user_id)).first()
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         
         # Создаём новый access-токен
-        access_token = create_access_token(data={"sub": user_id})
+        access_token = create_access_token(data={"sub": user_id, "club": club_id})
         return {
             "access_token": access_token,
             "token_type": "bearer",
@@ -104,13 +143,23 @@ async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 @router.post("/resend-code")
-async def resend_code(phone: str, db: Session = Depends(get_db)):
-    user = db.query(UserModel).filter(UserModel.phone == phone).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    await resend_verification_code(db, phone)
-    
-    logger.info(f"User resend code attempt: Phone: {phone}, User ID: {user.id}, Verification Code: {user.verification_code}")
-    
-    return {"status": "success", "message": "Code resent"}
\ No newline at end of file
+async def resend_code(
+    phone: str,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    phone_e164 = normalize_phone(phone)
+
+    async def handler():
+        # resend_verification_code сам отвечает 404, если пользователя нет
+        user = await resend_verification_code(db, phone_e164)
+
+        logger.info(f"User resend code attempt: Phone: {phone}, User ID: {user.id}, Verification Code: {user.verification_code}")
+
+        return {"status": "success", "message": "Code resent"}
+
+    return await idempotency.run_async(
+        f"resend-code:{current_club_id(db)}:{phone_e164}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(phone_e164),
+        handler
+    )
\ No newline at end of file
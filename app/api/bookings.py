@@ -1,35 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-from app.schemas.booking import Booking, BookingCreate, BookingAvailability
+from app.schemas.booking import Booking, BookingAuditEvent, BookingCreate, BookingAvailability, FreeSlot, SlotHold, SlotHoldCreate
 from app.services.booking_service import (
     create_booking,
-    get_bookings_by_user,
+    get_upcoming_bookings,
     get_all_bookings,
     get_booking_by_id,
     delete_booking,
     filter_bookings,
+    get_availability as get_court_availability,
+    find_free_slots,
+    short_user_name,
 )
+from app.services.audit_service import AUDIT_ACTIONS, get_audit_events
+from app.services.hold_service import hold_store
+from app.services.idempotency_service import idempotency, request_fingerprint
 from app.db.session import get_db
 from app.dependencies import get_current_active_user, get_current_admin
 from app.db.models import User as UserModel, Court
 from app.db.models import Booking as BookingModel
-from datetime import datetime, time, timedelta
-from zoneinfo import ZoneInfo
+from app.utils.query_budget import query_budget
+from app.utils.fields import FIELDS_DESCRIPTION, parse_fields, sparse_response
+from app.utils.timezone import club_zone, day_bounds, local_now, to_local, utc_now
+from datetime import datetime, time
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
-def force_msk(dt: datetime) -> datetime:
-    """
-    Конвертирует время в MSK, сохраняя значение как наивное (без tzinfo).
-    Если dt не содержит tzinfo, предполагается, что оно уже в MSK.
-    """
-    msk_tz = ZoneInfo("Europe/Moscow")
-    if dt.tzinfo:
-        dt = dt.astimezone(msk_tz)
-    return dt.replace(tzinfo=None)
+FREE_SLOTS_MAX_DAYS = 31
+
+def _user_name_field(booking: BookingModel) -> dict:
+    return {"user_name": short_user_name(booking.user)}
 
 @router.get("/availability", response_model=List[BookingAvailability])
+@query_budget(5)
 def get_availability(
     court_id: int = Query(...),
     date: str = Query(...),
@@ -41,124 +45,125 @@ def get_availability(
     except ValueError:
         raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD")
 
-    msk_tz = ZoneInfo("Europe/Moscow")
-    start_of_day = datetime.combine(parsed_date, time(0, 0), tzinfo=msk_tz)
-    end_of_day = datetime.combine(parsed_date + timedelta(days=1), time(0, 0), tzinfo=msk_tz)
-
     try:
-        bookings = (
-            db.query(BookingModel)
-            .options(joinedload(BookingModel.user))
-            .filter(
-                BookingModel.court_id == court_id,
-                BookingModel.start_time < end_of_day,
-                BookingModel.end_time > start_of_day,
-                BookingModel.status == "active"
-            )
-            .all()
-        )
+        return get_court_availability(db, court_id, parsed_date, is_admin=bool(user and user.role == "admin"))
     except Exception as e:
         print(f"‼️ Ошибка при запросе к базе: {e}")
         raise HTTPException(status_code=500, detail=f"DB query failed: {str(e)}")
 
-    slots: List[BookingAvailability] = []
-    for hour in range(8, 23):
-        local_start = datetime.combine(parsed_date, time(hour, 0), tzinfo=msk_tz)
-        local_end = (
-            datetime.combine(parsed_date + timedelta(days=1), time(0, 0), tzinfo=msk_tz)
-            if hour == 23 else
-            datetime.combine(parsed_date, time(hour + 1, 0), tzinfo=msk_tz)
-        )
-
-        slot_booked = False
-        user_name = None
-
-        for booking in bookings:
-            booking_start = booking.start_time if booking.start_time.tzinfo else booking.start_time.replace(tzinfo=msk_tz)
-            booking_end = booking.end_time if booking.end_time.tzinfo else booking.end_time.replace(tzinfo=msk_tz)
-
-            if booking_start < local_end and booking_end > local_start:
-                slot_booked = True
-                if user.role == "admin" and booking.user:
-                    user_name = f"{booking.user.first_name.strip()} {booking.user.last_name[0] if booking.user.last_name else ''}.".strip()
-                break
-
-        slots.append(BookingAvailability(
-            start=local_start.strftime("%H:%M"),
-            end=local_end.strftime("%H:%M"),
-            is_booked=slot_booked,
-            name=user_name
-        ))
-
-    return slots
-
 @router.post("/", response_model=Booking)
 def create_new_booking(
     booking: BookingCreate,
     db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user)
+    current_user: UserModel = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    # Приводим входящие даты к МСК
-    booking.start_time = force_msk(booking.start_time)
-    booking.end_time = force_msk(booking.end_time)
+    # Приводим входящие даты к поясу клуба
+    zone = club_zone(db)
+    booking.start_time = to_local(booking.start_time, zone)
+    booking.end_time = to_local(booking.end_time, zone)
     
     # Используем booking.user_id для админов, иначе current_user.id
     user_id = booking.user_id if current_user.role == "admin" and booking.user_id else current_user.id
-    
-    try:
-        print(f"Создание бронирования: user_id={user_id}, current_user.id={current_user.id}, start_time={booking.start_time}, role={current_user.role}")
-        db_booking = create_booking(db, booking, user_id, current_user.role == "admin")
-        return Booking.from_orm(db_booking).dict() | {
-            "user_name": f"{db_booking.user.first_name.strip()} {db_booking.user.last_name[0] if db_booking.user.last_name else ''}.".strip()
-        }
-    except Exception as e:
-        print(f"Error creating booking: {str(e)}")
-        raise HTTPException(status_code=422, detail=f"Invalid booking data: {str(e)}")
+
+    def handler():
+        # Слот, удержанный другим пользователем, отклоняется до транзакции бронирования
+        hold_store.ensure_bookable(db, booking.court_id, booking.start_time, booking.end_time, current_user.id, booking.hold_id)
+
+        try:
+            print(f"Создание бронирования: user_id={user_id}, current_user.id={current_user.id}, start_time={booking.start_time}, role={current_user.role}")
+            db_booking = create_booking(db, booking, user_id, current_user.role == "admin", actor_id=current_user.id)
+            if booking.hold_id:
+                hold_store.release(db, booking.hold_id)
+            return Booking.from_orm(db_booking).dict() | {
+                "user_name": short_user_name(db_booking.user)
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Error creating booking: {str(e)}")
+            raise HTTPException(status_code=422, detail=f"Invalid booking data: {str(e)}")
+
+    # Повтор с тем же Idempotency-Key возвращает сохранённый ответ без create_booking
+    return idempotency.run(
+        f"booking:{current_user.club_id}:{current_user.id}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(booking.dict()),
+        handler
+    )
+
+@router.post("/holds", response_model=SlotHold)
+def create_hold(
+    hold: SlotHoldCreate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    zone = club_zone(db)
+    start_time = to_local(hold.start_time, zone)
+    end_time = to_local(hold.end_time, zone)
+    if end_time <= start_time:
+        raise HTTPException(status_code=422, detail="Время окончания должно быть позже времени начала")
+    if start_time <= local_now(zone):
+        raise HTTPException(status_code=422, detail="Время начала бронирования должно быть в будущем")
+    # Запрос идёт с фильтром клуба: корт чужого клуба не найдётся
+    if not db.query(Court.id).filter(Court.id == hold.court_id).first():
+        raise HTTPException(status_code=404, detail="Court not found")
+    return hold_store.acquire(db, hold.court_id, start_time, end_time, current_user.id)
+
+@router.delete("/holds/{hold_id}")
+def release_hold(
+    hold_id: str,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    if not hold_store.release(db, hold_id, None if current_user.role == "admin" else current_user.id):
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return {"status": "success", "message": "Hold released"}
 
 @router.get("/my", response_model=List[Booking])
+@query_budget(2)
 def get_my_bookings(
     user_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
+    selected = parse_fields(fields, Booking)
     target_user_id = user_id if user_id and current_user.role == "admin" else current_user.id
 
     if target_user_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions to view these bookings")
 
-    now = datetime.now(ZoneInfo("Europe/Moscow")).replace(tzinfo=None)
-    bookings = (
-        db.query(BookingModel)
-        .options(joinedload(BookingModel.user))
-        .filter(
-            BookingModel.user_id == target_user_id,
-            BookingModel.end_time > now,
-            BookingModel.status == "active"
-        )
-        .all()
-    )
+    bookings = get_upcoming_bookings(db, target_user_id, utc_now(), selected)
 
+    if selected is not None:
+        return sparse_response(bookings, selected, _user_name_field if "user_name" in selected else None)
     return [
         Booking.from_orm(b).dict() | {
-            "user_name": f"{b.user.first_name.strip()} {b.user.last_name[0] if b.user.last_name else ''}.".strip()
+            "user_name": short_user_name(b.user)
         }
         for b in bookings
     ]
 
 @router.get("/all", response_model=List[Booking])
+@query_budget(2)
 def get_all_bookings_admin(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_admin)
 ):
-    bookings = get_all_bookings(db)
+    selected = parse_fields(fields, Booking)
+    bookings = get_all_bookings(db, selected)
+    if selected is not None:
+        return sparse_response(bookings, selected, _user_name_field if "user_name" in selected else None)
     return [
         Booking.from_orm(b).dict() | {
-            "user_name": f"{b.user.first_name.strip()} {b.user.last_name[0] if b.user.last_name else ''}.".strip()
+            "user_name": short_user_name(b.user)
         }
         for b in bookings
     ]
 
 @router.get("/filter", response_model=List[Booking])
+@query_budget(2)
 def filter_bookings_endpoint(
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
@@ -169,18 +174,15 @@ def filter_bookings_endpoint(
 ):
     print(f"Получены параметры: date_from={date_from}, date_to={date_to}, court={court}, user_ids={user_ids}")
     
-    # Конвертируем date_from и date_to в datetime, если они переданы
+    # Даты — местные дни клуба: от полуночи date_from до полуночи после date_to
+    zone = club_zone(db)
     parsed_date_from = None
     parsed_date_to = None
     try:
         if date_from:
-            parsed_date_from = datetime.strptime(date_from, "%Y-%m-%d")
-            parsed_date_from = force_msk(parsed_date_from)
+            parsed_date_from = day_bounds(datetime.strptime(date_from, "%Y-%m-%d").date(), zone)[0]
         if date_to:
-            parsed_date_to = datetime.strptime(date_to, "%Y-%m-%d")
-            # Устанавливаем конец дня (23:59:59) для date_to
-            parsed_date_to = parsed_date_to.replace(hour=23, minute=59, second=59)
-            parsed_date_to = force_msk(parsed_date_to)
+            parsed_date_to = day_bounds(datetime.strptime(date_to, "%Y-%m-%d").date(), zone)[1]
     except ValueError:
         raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD")
 
@@ -189,7 +191,7 @@ def filter_bookings_endpoint(
         print(f"SQL query: {str(db.query(BookingModel).options(joinedload(BookingModel.user)))}")
         return [
             Booking.from_orm(b).dict() | {
-                "user_name": f"{b.user.first_name.strip()} {b.user.last_name[0] if b.user.last_name else ''}.".strip()
+                "user_name": short_user_name(b.user)
             }
             for b in bookings
         ]
@@ -197,7 +199,60 @@ def filter_bookings_endpoint(
         print(f"Error filtering bookings: {str(e)}")
         raise HTTPException(status_code=422, detail=f"Invalid filter data: {str(e)}")
 
+@router.get("/free-slots", response_model=List[FreeSlot])
+@query_budget(6)
+def find_free_slots_endpoint(
+    duration_minutes: int = Query(60, ge=15, le=24 * 60),
+    date_from: Optional[str] = Query(None),
+    days: int = Query(7, ge=1, le=FREE_SLOTS_MAX_DAYS),
+    window_start: Optional[time] = Query(None),
+    window_end: Optional[time] = Query(None),
+    court_ids: Optional[List[int]] = Query(default=None),
+    weekdays: Optional[List[int]] = Query(default=None),
+    limit: int = Query(5, ge=1, le=50),
+    user: UserModel = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        parsed_date_from = (
+            datetime.strptime(date_from, "%Y-%m-%d").date() if date_from
+            else local_now(club_zone(db)).date()
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD")
+    if window_start and window_end and window_end != time(0, 0) and window_end <= window_start:
+        raise HTTPException(status_code=422, detail="window_end must be later than window_start")
+    if weekdays and any(d < 0 or d > 6 for d in weekdays):
+        raise HTTPException(status_code=422, detail="weekdays must be between 0 and 6")
+
+    return find_free_slots(
+        db, duration_minutes, parsed_date_from, days,
+        window_start=window_start, window_end=window_end,
+        court_ids=court_ids, weekdays=weekdays, limit=limit
+    )
+
+@router.get("/audit", response_model=List[BookingAuditEvent])
+@query_budget(2)
+def get_audit_log(
+    court_id: Optional[int] = Query(None),
+    booking_id: Optional[int] = Query(None),
+    actor_id: Optional[int] = Query(None),
+    action: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="UTC"),
+    date_to: Optional[datetime] = Query(None, description="UTC, не включительно; для следующей страницы — created_at последнего события"),
+    before_id: Optional[int] = Query(None, description="Для следующей страницы — id последнего события, вместе с date_to"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    if action is not None and action not in AUDIT_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"action должен быть одним из: {', '.join(AUDIT_ACTIONS)}")
+    if before_id is not None and date_to is None:
+        raise HTTPException(status_code=400, detail="before_id передаётся вместе с date_to")
+    return get_audit_events(db, court_id, booking_id, actor_id, action, date_from, date_to, limit, before_id)
+
 @router.get("/{id}", response_model=Booking)
+@query_budget(2)
 def get_booking(
     id: int,
     db: Session = Depends(get_db),
@@ -208,7 +263,7 @@ def get_booking(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return (
         Booking.from_orm(booking).dict() | {
-            "user_name": f"{booking.user.first_name.strip()} {booking.user.last_name[0] if booking.user.last_name else ''}.".strip()
+            "user_name": short_user_name(booking.user)
         }
         if current_user.role == "admin"
         else Booking.from_orm(booking)
@@ -220,5 +275,5 @@ def delete_booking_endpoint(
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_admin)
 ):
-    delete_booking(db, id)
+    delete_booking(db, id, actor_id=current_user.id)
     return {"status": "success", "message": "Booking deleted"}
\ No newline at end of file
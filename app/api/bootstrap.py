@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from app.schemas.booking import Booking
+from app.schemas.bootstrap import Bootstrap
+from app.schemas.court import Court
+from app.schemas.user import User
+from app.db.session import get_db
+from app.dependencies import get_current_active_user
+from app.db.models import Court as CourtModel, User as UserModel
+from app.services.booking_service import get_availability_many, get_upcoming_bookings, short_user_name
+from app.utils.query_budget import query_budget
+from app.utils.timezone import club_zone, local_now
+import hashlib
+import json
+
+router = APIRouter(prefix="/bootstrap", tags=["bootstrap"])
+
+def _section(name: str, data, known_etags: set) -> dict:
+    """Секция ответа: ETag — хэш её содержимого, данные — только если у клиента другая версия."""
+    encoded = jsonable_encoder(data)
+    digest = hashlib.sha1(json.dumps(encoded, ensure_ascii=False, sort_keys=True).encode()).hexdigest()[:16]
+    etag = f'"{name}-{digest}"'
+    return {"etag": etag} if etag in known_etags else {"etag": etag, "data": encoded}
+
+@router.get("/", response_model=Bootstrap, response_model_exclude_none=True)
+@query_budget(7)
+def get_bootstrap(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Всё, что приложение запрашивает при запуске, одним ответом: профиль, корты, предстоящие
+    брони пользователя и сегодняшняя сетка слотов всех кортов. Одна авторизация и одна сессия;
+    сетки всех кортов строятся по одному запросу броней вместо запроса на корт.
+    В If-None-Match можно перечислить ETag секций через запятую — такие секции придут без data.
+    """
+    known_etags = {etag.strip() for etag in request.headers.get("if-none-match", "").split(",") if etag.strip()}
+    now = local_now(club_zone(db))
+    is_admin = current_user.role == "admin"
+
+    courts = db.query(CourtModel).order_by(CourtModel.id).all()
+    bookings = get_upcoming_bookings(db, current_user.id, now)
+    availability = get_availability_many(db, [court.id for court in courts], now.date(), is_admin)
+
+    sections = {
+        "profile": _section("profile", User.from_orm(current_user), known_etags),
+        "courts": _section("courts", [Court.from_orm(court) for court in courts], known_etags),
+        "bookings": _section("bookings", [
+            Booking.from_orm(b).dict() | {
+                "user_name": short_user_name(b.user)
+            }
+            for b in bookings
+        ], known_etags),
+        "availability": {"date": now.date().isoformat(), **_section(f"availability-{now.date():%Y%m%d}", availability, known_etags)},
+    }
+    if all("data" not in section for section in sections.values()):
+        return Response(status_code=304, headers={"Cache-Control": "private, no-cache"})
+    return JSONResponse(sections, headers={"Cache-Control": "private, no-cache"})
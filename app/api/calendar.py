@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.db.tenancy import current_club_id
+from app.dependencies import get_current_active_user
+from app.db.models import User as UserModel, Court
+from app.core.security import CALENDAR_TOKEN_AUDIENCE, create_access_token, decode_access_token
+from app.services.calendar_service import feed_cache, stream_feed
+from datetime import timedelta
+from typing import Optional
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+CALENDAR_TOKEN_EXPIRE_DAYS = 365
+CALENDAR_MEDIA_TYPE = "text/calendar; charset=utf-8"
+
+def _feed_response(request: Request, db: Session, key) -> Response:
+    etag, last_modified, body = feed_cache.get(key)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "private, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if body is not None:
+        return Response(content=body, media_type=CALENDAR_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(stream_feed(db, key, etag), media_type=CALENDAR_MEDIA_TYPE, headers=headers)
+
+@router.get("/token")
+def get_calendar_token(
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Выдаёт долгоживущую ссылку на .ics-ленту: календарные приложения не умеют передавать Bearer-токен.
+    Токен выписан на отдельный audience и открывает только ленту, но не API.
+    Администратор может получить ссылку для любого пользователя своего клуба.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    target_user_id = user_id if user_id and current_user.role == "admin" else current_user.id
+    if target_user_id != current_user.id and not db.query(UserModel.id).filter(UserModel.id == target_user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+    token = create_access_token(
+        data={"sub": str(target_user_id), "club": current_user.club_id},
+        expires_delta=timedelta(days=CALENDAR_TOKEN_EXPIRE_DAYS),
+        audience=CALENDAR_TOKEN_AUDIENCE
+    )
+    return {"url": f"/api/calendar/users/{target_user_id}.ics?token={token}"}
+
+@router.get("/users/{user_id}.ics")
+def get_user_feed(
+    user_id: int,
+    request: Request,
+    token: str = Query(...),
+    db: Session = Depends(get_db)
+):
+    payload = decode_access_token(token, audience=CALENDAR_TOKEN_AUDIENCE)
+    if not payload or payload.get("sub") != str(user_id):
+        raise HTTPException(status_code=403, detail="Invalid calendar token")
+    return _feed_response(request, db, (current_club_id(db), "user", user_id))
+
+@router.get("/courts/{court_id}.ics")
+def get_court_feed(court_id: int, request: Request, db: Session = Depends(get_db)):
+    # Лента корта показывает только занятость, без имён, как /bookings/availability для гостей
+    if not db.query(Court.id).filter(Court.id == court_id).first():
+        raise HTTPException(status_code=404, detail="Court not found")
+    return _feed_response(request, db, (current_club_id(db), "court", court_id))
@@ -1,9 +1,13 @@
 from typing import List  # Добавляем импорт
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.schemas.court import Court, CourtCreate
+from app.schemas.court import Court, CourtCreate, CourtScheduleDay, CourtScheduleUpdate
 from app.db.session import get_db
-from app.db.models import Court as CourtModel
+from app.db.models import Court as CourtModel, User as UserModel
+from app.dependencies import get_current_admin
+from app.services.schedule_service import get_court_schedule, set_court_schedule
+from app.services.cache_bus import cache_bus
+from app.utils.query_budget import query_budget
 
 router = APIRouter(prefix="/courts", tags=["courts"])
 
@@ -11,10 +15,28 @@ router = APIRouter(prefix="/courts", tags=["courts"])
 def create_court(court: CourtCreate, db: Session = Depends(get_db)):
     db_court = CourtModel(**court.dict())
     db.add(db_court)
+    cache_bus.publish(db, "courts")
     db.commit()
     db.refresh(db_court)
     return db_court
 
 @router.get("/", response_model=List[Court])
+@query_budget(1)
 def get_courts(db: Session = Depends(get_db)):
-    return db.query(CourtModel).all()
\ No newline at end of file
+    return db.query(CourtModel).all()
+
+@router.get("/{court_id}/schedule", response_model=List[CourtScheduleDay])
+@query_budget(1)
+def get_schedule(court_id: int, db: Session = Depends(get_db)):
+    return get_court_schedule(db, court_id)
+
+@router.put("/{court_id}/schedule", response_model=List[CourtScheduleDay])
+def update_schedule(
+    court_id: int,
+    schedule: CourtScheduleUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    if not db.query(CourtModel.id).filter(CourtModel.id == court_id).first():
+        raise HTTPException(status_code=404, detail="Court not found")
+    return set_court_schedule(db, court_id, [day.dict() for day in schedule.days])
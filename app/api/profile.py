@@ -1,26 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.schemas.user import User, UserBase, UserUpdate
 from app.db.session import get_db
 from app.dependencies import get_current_active_user
 from app.db.models import User as UserModel
+from app.services.cache_bus import cache_bus
+from app.utils.phone import normalize_phone
+from app.utils.query_budget import query_budget
+from app.utils.fields import FIELDS_DESCRIPTION, load_columns, parse_fields, sparse_response
+from typing import Optional
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
 @router.get("/me", response_model=User)
+@query_budget(1)
 def get_current_user_profile(current_user: UserModel = Depends(get_current_active_user)):
     return current_user
 
 @router.get("/{user_id}", response_model=User)
-def get_profile(user_id: int, db: Session = Depends(get_db), current_user: UserModel = Depends(get_current_active_user)):
+@query_budget(2)
+def get_profile(
+    user_id: int,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    selected = parse_fields(fields, User)
     if current_user.id != user_id and current_user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions to view this profile")
     
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    query = db.query(UserModel).filter(UserModel.id == user_id)
+    if selected is not None:
+        query = query.options(load_columns(UserModel, selected))
+    user = query.first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    return user
+    return user if selected is None else sparse_response(user, selected)
 
 @router.patch("/{user_id}", response_model=User)
 def update_profile(
@@ -38,7 +54,10 @@ def update_profile(
     
     for key, value in updated_data.dict(exclude_unset=True).items():
         setattr(user, key, value)
+    if "phone" in updated_data.__fields_set__ and updated_data.phone:
+        user.phone_e164 = normalize_phone(updated_data.phone)
 
+    cache_bus.publish(db, "users", user_id=user.id)
     db.commit()
     db.refresh(user)
     return user
\ No newline at end of file
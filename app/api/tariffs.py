@@ -0,0 +1,89 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.schemas.tariff import Tariff, TariffUpdate, Holiday, HolidaysUpdate, PriceQuote
+from app.db.session import get_db
+from app.db.models import Court as CourtModel, User as UserModel
+from app.dependencies import get_current_active_user, get_current_admin
+from app.services.tariff_service import tariff_engine, get_tariffs, set_tariffs, get_holidays, set_holidays
+from app.utils.query_budget import query_budget
+from app.utils.timezone import club_zone, to_local
+from datetime import datetime
+
+router = APIRouter(prefix="/tariffs", tags=["tariffs"])
+
+@router.get("/default", response_model=List[Tariff])
+@query_budget(2)
+def get_default_tariff(
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    return get_tariffs(db)
+
+@router.put("/default", response_model=List[Tariff])
+def update_default_tariff(
+    tariff: TariffUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    try:
+        return set_tariffs(db, None, [band.dict() for band in tariff.bands])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/courts/{court_id}", response_model=List[Tariff])
+@query_budget(2)
+def get_court_tariff(
+    court_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    return get_tariffs(db, court_id)
+
+@router.put("/courts/{court_id}", response_model=List[Tariff])
+def update_court_tariff(
+    court_id: int,
+    tariff: TariffUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    if not db.query(CourtModel.id).filter(CourtModel.id == court_id).first():
+        raise HTTPException(status_code=404, detail="Court not found")
+    try:
+        return set_tariffs(db, court_id, [band.dict() for band in tariff.bands])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/holidays", response_model=List[Holiday])
+@query_budget(1)
+def get_holiday_list(db: Session = Depends(get_db)):
+    return get_holidays(db)
+
+@router.put("/holidays", response_model=List[Holiday])
+def update_holidays(
+    update: HolidaysUpdate,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    return set_holidays(db, [holiday.dict() for holiday in update.holidays])
+
+@router.get("/quote", response_model=PriceQuote)
+@query_budget(3)
+def quote_price(
+    court_id: int = Query(...),
+    start_time: datetime = Query(...),
+    end_time: datetime = Query(...),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    zone = club_zone(db)
+    start_time = to_local(start_time, zone)
+    end_time = to_local(end_time, zone)
+    if end_time <= start_time or start_time.date() != end_time.date():
+        raise HTTPException(status_code=422, detail="Интервал должен быть внутри одного дня")
+    return PriceQuote(
+        court_id=court_id,
+        start_time=start_time,
+        end_time=end_time,
+        price=tariff_engine.price(db, court_id, start_time, end_time)
+    )
@@ -1,13 +1,35 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from app.schemas.user import User
+from app.schemas.user import User, UserSearchResult
 from app.db.session import get_db
 from app.dependencies import get_current_admin
 from app.db.models import User as UserModel
-from typing import List  # Добавляем импорт List
+from app.services.user_service import search_users, SEARCH_MAX_LIMIT
+from app.utils.query_budget import query_budget
+from app.utils.fields import FIELDS_DESCRIPTION, load_columns, parse_fields, sparse_response
+from typing import List, Optional  # Добавляем импорт List
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/", response_model=List[User])
-def get_all_users(db: Session = Depends(get_db), current_user: UserModel = Depends(get_current_admin)):
-    return db.query(UserModel).all()
\ No newline at end of file
+@query_budget(2)
+def get_all_users(
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    selected = parse_fields(fields, User)
+    if selected is None:
+        return db.query(UserModel).all()
+    # Без photo в fields base64-фото не читается из базы
+    return sparse_response(db.query(UserModel).options(load_columns(UserModel, selected)).all(), selected)
+
+@router.get("/search", response_model=List[UserSearchResult])
+@query_budget(2)
+def search_users_endpoint(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_admin)
+):
+    return search_users(db, q, limit)
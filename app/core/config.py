@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,5 +9,68 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+    # Массовая регистрация: размер пула для bcrypt и максимальный размер пачки
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    BULK_REGISTER_MAX_USERS: int = int(os.getenv("BULK_REGISTER_MAX_USERS", "1000"))
+    # Поиск пользователей: in-process префиксный индекс для typeahead (выключен по умолчанию)
+    USER_SEARCH_PREFIX_INDEX: bool = os.getenv("USER_SEARCH_PREFIX_INDEX", "false").lower() == "true"
+    USER_SEARCH_INDEX_TTL: int = int(os.getenv("USER_SEARCH_INDEX_TTL", "300"))
+    # Кэш шаблонов слотов по (корт, день недели)
+    SLOT_TEMPLATE_TTL: int = int(os.getenv("SLOT_TEMPLATE_TTL", "300"))
+    # Временные удержания слотов: "memory" — в процессе, "db" — таблица slot_holds для нескольких воркеров
+    SLOT_HOLD_BACKEND: str = os.getenv("SLOT_HOLD_BACKEND", "memory")
+    SLOT_HOLD_TTL_SECONDS: int = int(os.getenv("SLOT_HOLD_TTL_SECONDS", "300"))
+    # Idempotency-Key: "memory" — TTL-кэш в процессе, "db" — таблица idempotency_keys
+    IDEMPOTENCY_BACKEND: str = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    IDEMPOTENCY_WAIT_SECONDS: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+    # db: pending старше этого считается брошенным упавшим воркером; чистка устаревших ключей не чаще раза в PURGE_SECONDS
+    IDEMPOTENCY_PENDING_TIMEOUT: int = int(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT", "120"))
+    IDEMPOTENCY_PURGE_SECONDS: int = int(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "300"))
+    # Инвалидация кэшей между воркерами: "notify" (LISTEN/NOTIFY), "poll" (таблица cache_events) или "off"
+    CACHE_BUS_MODE: str = os.getenv("CACHE_BUS_MODE", "notify")
+    CACHE_BUS_POLL_SECONDS: float = float(os.getenv("CACHE_BUS_POLL_SECONDS", "1"))
+    # Бюджеты SQL-запросов на эндпоинт (dev): "off", "warn" или "raise"
+    QUERY_BUDGET_MODE: str = os.getenv("QUERY_BUDGET_MODE", "off")
+    # Профилирование отдельных запросов: заголовок X-Profile от админа или случайная выборка
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    # Кэш .ics-лент: сбрасывается при изменении броней и не реже, чем раз в TTL
+    CALENDAR_CACHE_TTL: int = int(os.getenv("CALENDAR_CACHE_TTL", "900"))
+    # Скомпилированные таблицы тарифов: сбрасываются при изменении тарифов и не реже, чем раз в TTL
+    TARIFF_CACHE_TTL: int = int(os.getenv("TARIFF_CACHE_TTL", "3600"))
+    # Очередь записи броней по корту: "memory" — в воркере, "advisory" — плюс pg_advisory_xact_lock, "off"
+    BOOKING_WRITE_LOCK: str = os.getenv("BOOKING_WRITE_LOCK", "memory")
+    BOOKING_QUEUE_MAX_WAITERS: int = int(os.getenv("BOOKING_QUEUE_MAX_WAITERS", "16"))
+    BOOKING_QUEUE_TIMEOUT: float = float(os.getenv("BOOKING_QUEUE_TIMEOUT", "10"))
+    # СМС-напоминания о бронях: фоновый сканер в каждом воркере, пачки разбираются через SKIP LOCKED
+    REMINDERS_ENABLED: bool = os.getenv("REMINDERS_ENABLED", "false").lower() == "true"
+    REMINDER_LEAD_MINUTES: int = int(os.getenv("REMINDER_LEAD_MINUTES", "120"))
+    REMINDER_SCAN_SECONDS: float = float(os.getenv("REMINDER_SCAN_SECONDS", "60"))
+    REMINDER_BATCH_SIZE: int = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+    REMINDER_MAX_ATTEMPTS: int = int(os.getenv("REMINDER_MAX_ATTEMPTS", "3"))
+    REMINDER_CLAIM_TIMEOUT: int = int(os.getenv("REMINDER_CLAIM_TIMEOUT", "600"))
+    # Журнал действий с бронями: буфер в памяти воркера, запись пачками раз в AUDIT_FLUSH_SECONDS или по AUDIT_BATCH_SIZE
+    AUDIT_FLUSH_SECONDS: float = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    AUDIT_MAX_BUFFER: int = int(os.getenv("AUDIT_MAX_BUFFER", "10000"))
+    # Снимки броней для аналитики: .npy по клубам в ANALYTICS_DIR, фоновая пересборка раз в ANALYTICS_SNAPSHOT_SECONDS
+    ANALYTICS_SNAPSHOTS_ENABLED: bool = os.getenv("ANALYTICS_SNAPSHOTS_ENABLED", "false").lower() == "true"
+    ANALYTICS_SNAPSHOT_SECONDS: float = float(os.getenv("ANALYTICS_SNAPSHOT_SECONDS", "3600"))
+    ANALYTICS_DIR: str = os.getenv("ANALYTICS_DIR", "analytics")
+    # Клубы: клуб без токена берётся по хосту (CLUB_HOSTS, JSON {"<host>": <club_id>}), из X-Club-Id,
+    # если клуб известен (CLUB_IDS, CLUB_SHARDS или CLUB_HOSTS), иначе по умолчанию; карта шардов —
+    # JSON {"<club_id>": "<url>"} или {"<club_id>": {"url": "<url>", "schema": "<схема>"}}, остальные клубы в DATABASE_URL
+    DEFAULT_CLUB_ID: int = int(os.getenv("DEFAULT_CLUB_ID", "1"))
+    CLUB_IDS: list = [int(club_id) for club_id in json.loads(os.getenv("CLUB_IDS", "[]"))]
+    CLUB_SHARDS: dict = json.loads(os.getenv("CLUB_SHARDS", "{}"))
+    CLUB_HOSTS: dict = {host.lower(): int(club_id) for host, club_id in json.loads(os.getenv("CLUB_HOSTS", "{}")).items()}
+    # Часовые пояса клубов (IANA): JSON {"<club_id>": "Asia/Yekaterinburg"}, остальные клубы — DEFAULT_TIMEZONE
+    DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "Europe/Moscow")
+    CLUB_TIMEZONES: dict = {int(club_id): zone for club_id, zone in json.loads(os.getenv("CLUB_TIMEZONES", "{}")).items()}
 
 settings = Settings()
\ No newline at end of file
@@ -1,28 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import List
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+CALENDAR_TOKEN_AUDIENCE = "calendar-feed"
+
+# bcrypt отпускает GIL, поэтому хэширование пачки паролей параллелится потоками
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="pwd-hash")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+def get_password_hashes(passwords: List[str]) -> List[str]:
+    """
+    Хэширует список паролей параллельно на пуле потоков.
+    Порядок результатов совпадает с порядком входных паролей.
+    """
+    return list(_hash_executor.map(get_password_hash, passwords))
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None, audience: str | None = None) -> str:
+    """
+    audience — для токенов с узким назначением (ссылка на календарь): такой токен
+    decode_access_token без того же audience не примет, то есть Bearer-авторизацией он не станет.
+    """
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    if audience:
+        to_encode["aud"] = audience
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def decode_access_token(token: str):
+def decode_access_token(token: str, audience: str | None = None):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # Без audience токены с aud отклоняются; с audience aud обязателен
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM],
+            audience=audience, options={"require_aud": audience is not None}
+        )
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
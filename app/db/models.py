@@ -1,17 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Date, DateTime, Time, ForeignKey, Boolean, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.db.types import UTCDateTime
 from datetime import datetime
 
+class Club(Base):
+    __tablename__ = "clubs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False, index=True)
+    email = Column(String, unique=True, nullable=False)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     birth_date = Column(String, nullable=True)  # Формат "ДД.ММ.ГГГГ"
     phone = Column(String, unique=True, nullable=False)  # Формат "+7(XXX)XXX-XX-XX"
+    phone_e164 = Column(String, unique=True, index=True, nullable=False)  # Канонический "7XXXXXXXXXX" для поиска
     hashed_password = Column(String, nullable=False)
     photo = Column(String, nullable=True)  # Base64 или URL
     role = Column(String, default="user")  # "user" или "admin"
@@ -22,23 +31,133 @@ class User(Base):
 
 class Court(Base):
     __tablename__ = "courts"
+    __table_args__ = (UniqueConstraint("club_id", "name", name="uq_courts_club_name"),)
     
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     
     bookings = relationship("Booking", back_populates="court")
+    schedules = relationship("CourtSchedule", back_populates="court", cascade="all, delete-orphan")
+
+class CourtSchedule(Base):
+    __tablename__ = "court_schedules"
+    __table_args__ = (UniqueConstraint("court_id", "weekday", name="uq_court_schedules_court_weekday"),)
+
+    id = Column(Integer, primary_key=True)
+    court_id = Column(Integer, ForeignKey("courts.id", ondelete="CASCADE"), nullable=False)
+    weekday = Column(Integer, nullable=False)  # 0 — понедельник, 6 — воскресенье
+    opens_at = Column(Time, nullable=False)
+    closes_at = Column(Time, nullable=False)  # 00:00 означает полночь (конец дня)
+    slot_minutes = Column(Integer, nullable=False, default=60)  # 15, 30 или 60
+
+    court = relationship("Court", back_populates="schedules")
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Занятость корта: availability, create_booking, free-slots, лента корта
+        Index(
+            "ix_bookings_court_active", "court_id", "start_time", "end_time",
+            postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")
+        ),
+        # Предстоящие брони пользователя: /bookings/my, лента пользователя
+        Index(
+            "ix_bookings_user_active", "user_id", "end_time",
+            postgresql_where=text("status = 'active'"), sqlite_where=text("status = 'active'")
+        ),
+        # Все брони клуба по времени: /bookings/all, /bookings/filter
+        Index("ix_bookings_club_id_start_time", "club_id", "start_time"),
+        # /bookings/filter по корту в любом статусе (частичный индекс выше берёт только активные); заодно внешний ключ
+        Index("ix_bookings_court_id_start_time", "court_id", "start_time"),
+        # Сканер напоминаний: активные брони, по которым напоминание ещё не взято в работу
+        Index(
+            "ix_bookings_reminder_due", "start_time",
+            postgresql_where=text("status = 'active' AND reminder_status IS NULL"),
+            sqlite_where=text("status = 'active' AND reminder_status IS NULL")
+        ),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     court_id = Column(Integer, ForeignKey("courts.id"), nullable=False)
-    start_time = Column(DateTime, nullable=False)
-    end_time = Column(DateTime, nullable=False)
+    start_time = Column(UTCDateTime, nullable=False, index=True)
+    end_time = Column(UTCDateTime, nullable=False)
     status = Column(String, default="active")  # "active" или "canceled"
     price = Column(Integer, nullable=False)  # Цена в копейках или рублях
+    reminder_status = Column(String, nullable=True)  # NULL — ждёт отправки, "claimed", "sent", "failed", "unknown" (отправка могла пройти) или "skipped"
+    reminder_attempts = Column(Integer, nullable=False, default=0)
+    reminder_claimed_at = Column(DateTime, nullable=True)  # UTC
+    reminder_sent_at = Column(DateTime, nullable=True)  # UTC
     
     user = relationship("User", back_populates="bookings")
-    court = relationship("Court", back_populates="bookings")
\ No newline at end of file
+    court = relationship("Court", back_populates="bookings")
+
+class SlotHold(Base):
+    __tablename__ = "slot_holds"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    court_id = Column(Integer, ForeignKey("courts.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    start_time = Column(UTCDateTime, nullable=False)
+    end_time = Column(UTCDateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # UTC
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # "<scope>:<Idempotency-Key>"
+    fingerprint = Column(String, nullable=False)  # sha256 параметров запроса
+    status = Column(String, nullable=False, default="pending")  # "pending" или "done"
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)  # Чистка по TTL
+
+
+class CacheEvent(Base):
+    __tablename__ = "cache_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON-сообщение шины инвалидации
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class Tariff(Base):
+    __tablename__ = "tariffs"
+
+    id = Column(Integer, primary_key=True)
+    club_id = Column(Integer, ForeignKey("clubs.id"), nullable=False, index=True)
+    court_id = Column(Integer, ForeignKey("courts.id", ondelete="CASCADE"), nullable=True, index=True)  # NULL — тариф клуба по умолчанию
+    day_type = Column(String, nullable=False)  # "weekday", "weekend" или "holiday"
+    starts_at = Column(Time, nullable=False)
+    ends_at = Column(Time, nullable=False)  # 00:00 означает полночь (конец дня)
+    price_per_hour = Column(Integer, nullable=False)  # В тех же единицах, что Booking.price
+
+class Holiday(Base):
+    __tablename__ = "holidays"
+
+    club_id = Column(Integer, ForeignKey("clubs.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    name = Column(String, nullable=True)
+
+
+class BookingAuditEvent(Base):
+    __tablename__ = "booking_audit_events"
+    __table_args__ = (
+        Index("ix_booking_audit_events_court_id_created_at", "court_id", "created_at"),
+        Index("ix_booking_audit_events_created_at_id", "created_at", "id"),  # Лента без фильтра по корту
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    club_id = Column(Integer, nullable=False)
+    booking_id = Column(Integer, nullable=False, index=True)  # Без внешнего ключа: бронь может быть удалена
+    court_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)  # Владелец брони
+    actor_id = Column(Integer, nullable=True)  # Кто выполнил действие; NULL — система
+    action = Column(String, nullable=False)  # "created", "deleted" или "modified"
+    payload = Column(Text, nullable=False)  # JSON-снимок брони
+    created_at = Column(DateTime, nullable=False)  # UTC
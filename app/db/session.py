@@ -1,13 +1,109 @@
+from fastapi import HTTPException, Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.security import CALENDAR_TOKEN_AUDIENCE, decode_access_token
+from app.db import tenancy  # noqa: F401 — регистрирует фильтр по club_id для всех сессий
+from app.utils import timezone  # noqa: F401 — время броней при загрузке переводится в пояс клуба
+from app.db.models import Club
+from typing import Dict, List
 
-engine = create_engine(settings.DATABASE_URL)
+def _create_engine(url) -> Engine:
+    url = make_url(url)
+    # Сессия PostgreSQL в UTC: timestamptz приходят в UTC, а AT TIME ZONE всегда указывается явно
+    connect_args = {"options": "-c timezone=utc"} if url.get_backend_name() == "postgresql" else {}
+    return create_engine(url, connect_args=connect_args)
+
+engine = _create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
+class ShardMap:
+    """
+    club_id -> engine. Клуб можно вынести в отдельную базу ("url") или схему ("schema",
+    через schema_translate_map) одной записью в CLUB_SHARDS, без изменений кода.
+    Клубы без записи живут в основной базе.
+    """
+
+    def __init__(self, default_engine: Engine, shards: dict):
+        self.default = default_engine
+        self._databases: Dict[URL, Engine] = {default_engine.url: default_engine}
+        self._clubs: Dict[int, Engine] = {}
+        for club_id, target in shards.items():
+            if isinstance(target, str):
+                target = {"url": target}
+            url = make_url(target["url"]) if target.get("url") else default_engine.url
+            database = self._databases.get(url)
+            if database is None:
+                # Один пул соединений на базу, сколько бы клубов в ней ни было
+                database = self._databases[url] = _create_engine(url)
+            schema = target.get("schema")
+            self._clubs[int(club_id)] = (
+                database.execution_options(schema_translate_map={None: schema}) if schema else database
+            )
+
+    def engine_for(self, club_id: int) -> Engine:
+        return self._clubs.get(club_id, self.default)
+
+    def clubs(self) -> Dict[int, Engine]:
+        """Известные клубы: по умолчанию, из CLUB_IDS и CLUB_HOSTS, плюс клубы с явным размещением."""
+        known = [settings.DEFAULT_CLUB_ID, *settings.CLUB_IDS, *settings.CLUB_HOSTS.values()]
+        return {**{club_id: self.engine_for(club_id) for club_id in known}, **self._clubs}
+
+    def databases(self) -> List[Engine]:
+        """Физические базы — для хуков на engine и LISTEN."""
+        return list(self._databases.values())
+
+    def engines(self) -> List[Engine]:
+        """Все места хранения клубов (база или схема) — для create_all и фоновых задач."""
+        engines = [self.default]
+        for shard_engine in self._clubs.values():
+            if shard_engine not in engines:
+                engines.append(shard_engine)
+        return engines
+
+shard_map = ShardMap(engine, settings.CLUB_SHARDS)
+
+def session_for_club(club_id: int) -> Session:
+    return SessionLocal(bind=shard_map.engine_for(club_id), info={"club_id": club_id})
+
+def ensure_clubs():
+    """Создаёт строки clubs для известных клубов в их шардах — на них ссылаются club_id."""
+    for club_id, club_engine in shard_map.clubs().items():
+        with SessionLocal(bind=club_engine) as db:
+            if db.get(Club, club_id) is None:
+                db.add(Club(id=club_id, name=f"Клуб {club_id}"))
+                db.commit()
+
+def club_from_request(request: Request) -> int:
+    """
+    Клуб запроса: из JWT (Bearer или ?token= у календарных ссылок), для анонимных
+    запросов — по хосту, затем из заголовка X-Club-Id, иначе клуб по умолчанию.
+    Заголовок принимается только для известных клубов: анонимный клиент не должен
+    попадать в произвольный club_id и плодить строки с ним (например, при регистрации).
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        payload = decode_access_token(authorization[7:])
+    elif request.query_params.get("token"):
+        payload = decode_access_token(request.query_params["token"], audience=CALENDAR_TOKEN_AUDIENCE)
+    else:
+        payload = None
+    if payload and payload.get("club") is not None:
+        return int(payload["club"])
+    host = request.headers.get("host", "").split(":")[0].lower()
+    if host in settings.CLUB_HOSTS:
+        return settings.CLUB_HOSTS[host]
+    club_header = request.headers.get("x-club-id")
+    if club_header:
+        if not club_header.isdigit() or int(club_header) not in shard_map.clubs():
+            raise HTTPException(status_code=400, detail="Unknown club")
+        return int(club_header)
+    return settings.DEFAULT_CLUB_ID
+
+def get_db(request: Request):
+    db = session_for_club(club_from_request(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
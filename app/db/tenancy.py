@@ -0,0 +1,33 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+from app.db.models import Booking, BookingAuditEvent, Court, Holiday, Tariff, User
+from app.core.config import settings
+
+# Модели с club_id: запросы сессии клуба видят только строки своего клуба
+TENANT_MODELS = (User, Court, Booking, Tariff, Holiday, BookingAuditEvent)
+
+def current_club_id(db: Session) -> int:
+    return db.info.get("club_id", settings.DEFAULT_CLUB_ID)
+
+@event.listens_for(Session, "do_orm_execute")
+def _apply_club_criteria(execute_state):
+    """
+    Добавляет club_id = :club ко всем ORM-запросам (SELECT, bulk UPDATE/DELETE) сессии клуба,
+    включая join и ленивые загрузки связей. Сессии без club_id (фоновые задачи) видят все клубы шарда.
+    """
+    club_id = execute_state.session.info.get("club_id")
+    if club_id is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+        return
+    execute_state.statement = execute_state.statement.options(*(
+        with_loader_criteria(model, lambda cls: cls.club_id == club_id, include_aliases=True)
+        for model in TENANT_MODELS
+    ))
+
+@event.listens_for(Session, "before_flush")
+def _assign_club(session: Session, flush_context, instances):
+    club_id = current_club_id(session)
+    for obj in session.new:
+        if isinstance(obj, TENANT_MODELS) and obj.club_id is None:
+            obj.club_id = club_id
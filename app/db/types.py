@@ -0,0 +1,25 @@
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+from datetime import timezone
+
+class UTCDateTime(TypeDecorator):
+    """
+    timestamptz: в базу пишется момент времени в UTC, из базы всегда приходит время с tzinfo.
+    Время без tzinfo не принимается — его пояс неизвестен. В SQLite (без timestamptz)
+    хранится UTC без смещения, и при чтении ему возвращается tzinfo=UTC.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            raise ValueError(f"Naive datetime {value!r} for a timestamptz column")
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
@@ -1,7 +1,14 @@
 from fastapi import FastAPI
-from app.api import auth, bookings, users, courts, profile, tables  # Добавляем tables
+from app.api import auth, bookings, users, courts, profile, tables, calendar, tariffs, bootstrap, analytics  # Добавляем tables
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import ensure_clubs, shard_map
+from app.services.cache_bus import start_cache_listeners, stop_cache_listener
+from app.services.reminder_service import start_reminder_scanner, stop_reminder_scanner
+from app.services.audit_service import start_audit_writer, stop_audit_writer
+from app.services.analytics_service import start_snapshot_exporter, stop_snapshot_exporter
+from app.core.config import settings
+from app.utils.query_budget import QueryBudgetMiddleware, install_query_counter
+from app.utils.profiler import ProfilingMiddleware, install_sql_timing
 from dotenv import load_dotenv
 import os
 
@@ -15,8 +22,28 @@ if not SMS_P1SMS_API_KEY:
 
 app = FastAPI(title="Tennis Project API")
 
-# Создаем таблицы в базе данных
-Base.metadata.create_all(bind=engine)
+# Dev-режим: предупреждение или ошибка, если эндпоинт превысил бюджет SQL-запросов
+if settings.QUERY_BUDGET_MODE != "off":
+    for shard_engine in shard_map.databases():
+        install_query_counter(shard_engine)
+    app.add_middleware(QueryBudgetMiddleware, mode=settings.QUERY_BUDGET_MODE)
+
+# Профилировщик по запросу; когда выключен, ни middleware, ни SQL-хуки не подключаются
+if settings.PROFILING_ENABLED:
+    for shard_engine in shard_map.databases():
+        install_sql_timing(shard_engine)
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=settings.PROFILE_DIR,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        interval=settings.PROFILE_INTERVAL_MS / 1000,
+        max_files=settings.PROFILE_MAX_FILES
+    )
+
+# Создаем таблицы в базе данных каждого шарда
+for shard_engine in shard_map.engines():
+    Base.metadata.create_all(bind=shard_engine)
+ensure_clubs()
 
 # Подключаем роутеры
 app.include_router(auth.router, prefix="/api")
@@ -24,4 +51,23 @@ app.include_router(bookings.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(courts.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
-app.include_router(tables.router, prefix="/api")  # Добавляем новый роутер
\ No newline at end of file
+app.include_router(tables.router, prefix="/api")  # Добавляем новый роутер
+app.include_router(calendar.router, prefix="/api")
+app.include_router(tariffs.router, prefix="/api")
+app.include_router(bootstrap.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+
+# Фоновые задачи воркера: слушатель инвалидации кэшей, сканер СМС-напоминаний, запись журнала броней и снимки для аналитики
+@app.on_event("startup")
+def start_background_tasks():
+    start_cache_listeners(shard_map)
+    start_reminder_scanner()
+    start_audit_writer()
+    start_snapshot_exporter()
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    stop_cache_listener()
+    stop_reminder_scanner()
+    stop_audit_writer()
+    stop_snapshot_exporter()
\ No newline at end of file
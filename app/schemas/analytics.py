@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Dict, List
+
+class AnalyticsRange(BaseModel):
+    date_from: date
+    date_to: date  # Включительно
+    snapshot_built_at: datetime  # UTC; данные актуальны на этот момент
+
+class CourtHeatmap(BaseModel):
+    court_id: int
+    occupancy: List[List[float]]  # [день недели 0..6][час 0..23], доля занятого времени
+
+class OccupancyHeatmap(AnalyticsRange):
+    courts: List[CourtHeatmap]
+
+class RevenuePoint(BaseModel):
+    period_start: date
+    revenue: int
+    bookings: int
+
+class RevenueCurve(AnalyticsRange):
+    bucket: str  # "day", "week" или "month"
+    points: List[RevenuePoint]
+
+class PeakHour(BaseModel):
+    hour: int  # 0..23, местное время клуба
+    booked_minutes: int
+    occupancy: float  # Доля от всех часов «корт × день» периода
+
+class PeakHours(AnalyticsRange):
+    hours: List[PeakHour]
+
+class SnapshotExport(BaseModel):
+    clubs: Dict[int, int]  # club_id -> число броней в снимке
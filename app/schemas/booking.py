@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Json
 from datetime import datetime
 from typing import List, Optional
 
@@ -9,7 +9,9 @@ class BookingBase(BaseModel):
     price: int
 
 class BookingCreate(BookingBase):
+    price: Optional[int] = None  # Если для корта задан тариф, цена считается на сервере
     user_id: Optional[int] = None  # Для администратора
+    hold_id: Optional[str] = None  # Удержание из POST /bookings/holds
 
 class Booking(BookingBase):
     id: int
@@ -24,4 +26,34 @@ class BookingAvailability(BaseModel):
     start: str  # "HH:MM"
     end: str    # "HH:MM"
     is_booked: bool
-    name: Optional[str] = None  # Только для администратора
\ No newline at end of file
+    name: Optional[str] = None  # Только для администратора
+    price: Optional[int] = None  # По тарифу корта; None — тариф не задан
+
+class FreeSlot(BaseModel):
+    court_id: int
+    court_name: str
+    start_time: datetime
+    end_time: datetime
+    price: Optional[int] = None
+
+class BookingAuditEvent(BaseModel):
+    id: int
+    booking_id: int
+    court_id: int
+    user_id: Optional[int] = None
+    actor_id: Optional[int] = None  # None — действие системы
+    action: str  # "created", "deleted" или "modified"
+    payload: Json  # Снимок брони на момент события
+    created_at: datetime  # UTC
+
+    class Config:
+        orm_mode = True
+
+class SlotHoldCreate(BaseModel):
+    court_id: int
+    start_time: datetime
+    end_time: datetime
+
+class SlotHold(SlotHoldCreate):
+    hold_id: str
+    expires_at: datetime  # UTC
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from app.schemas.booking import Booking, BookingAvailability
+from app.schemas.court import Court
+from app.schemas.user import User
+
+# У каждой секции свой ETag; секция, чей ETag клиент прислал в If-None-Match, приходит без data
+
+class ProfileSection(BaseModel):
+    etag: str
+    data: Optional[User] = None
+
+class CourtsSection(BaseModel):
+    etag: str
+    data: Optional[List[Court]] = None
+
+class BookingsSection(BaseModel):
+    etag: str
+    data: Optional[List[Booking]] = None
+
+class AvailabilitySection(BaseModel):
+    etag: str
+    date: str  # "YYYY-MM-DD", сегодня в часовом поясе клуба
+    data: Optional[Dict[int, List[BookingAvailability]]] = None  # court_id -> сетка слотов
+
+class Bootstrap(BaseModel):
+    profile: ProfileSection
+    courts: CourtsSection
+    bookings: BookingsSection
+    availability: AvailabilitySection
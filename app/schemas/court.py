@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional  # Добавляем импорт Optional
+from pydantic import BaseModel, Field, validator
+from datetime import time
+from typing import List, Optional  # Добавляем импорт Optional
 
 class CourtBase(BaseModel):
     name: str
@@ -12,4 +13,36 @@ class Court(CourtBase):
     id: int
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class CourtScheduleDay(BaseModel):
+    weekday: int = Field(..., ge=0, le=6)  # 0 — понедельник
+    opens_at: time
+    closes_at: time  # 00:00 — работа до полуночи
+    slot_minutes: int = 60
+
+    @validator("slot_minutes")
+    def check_slot_minutes(cls, value):
+        if value not in (15, 30, 60):
+            raise ValueError("slot_minutes must be 15, 30 or 60")
+        return value
+
+    @validator("closes_at")
+    def check_hours(cls, value, values):
+        opens_at = values.get("opens_at")
+        if opens_at and value != time(0, 0) and value <= opens_at:
+            raise ValueError("closes_at must be later than opens_at")
+        return value
+
+    class Config:
+        orm_mode = True
+
+class CourtScheduleUpdate(BaseModel):
+    days: List[CourtScheduleDay]
+
+    @validator("days")
+    def check_unique_weekdays(cls, value):
+        weekdays = [day.weekday for day in value]
+        if len(weekdays) != len(set(weekdays)):
+            raise ValueError("Each weekday can be set only once")
+        return value
@@ -0,0 +1,57 @@
+from pydantic import BaseModel, Field, validator
+from datetime import date, datetime, time
+from typing import List, Optional
+
+DAY_TYPES = ("weekday", "weekend", "holiday")
+
+class TariffBand(BaseModel):
+    day_type: str  # "weekday", "weekend" или "holiday"
+    starts_at: time
+    ends_at: time  # 00:00 — до полуночи
+    price_per_hour: int = Field(..., ge=0)
+
+    @validator("day_type")
+    def check_day_type(cls, value):
+        if value not in DAY_TYPES:
+            raise ValueError("day_type must be weekday, weekend or holiday")
+        return value
+
+    @validator("ends_at")
+    def check_band(cls, value, values):
+        starts_at = values.get("starts_at")
+        if starts_at and value != time(0, 0) and value <= starts_at:
+            raise ValueError("ends_at must be later than starts_at")
+        return value
+
+    class Config:
+        orm_mode = True
+
+class TariffUpdate(BaseModel):
+    bands: List[TariffBand]
+
+class Tariff(TariffBand):
+    id: int
+    court_id: Optional[int] = None  # None — тариф по умолчанию
+
+class Holiday(BaseModel):
+    date: date
+    name: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class HolidaysUpdate(BaseModel):
+    holidays: List[Holiday]
+
+    @validator("holidays")
+    def check_unique_dates(cls, value):
+        dates = [holiday.date for holiday in value]
+        if len(dates) != len(set(dates)):
+            raise ValueError("Each date can be set only once")
+        return value
+
+class PriceQuote(BaseModel):
+    court_id: int
+    start_time: datetime
+    end_time: datetime
+    price: Optional[int] = None  # None — для этого дня тариф не задан
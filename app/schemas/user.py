@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -35,4 +35,29 @@ class UserUpdate(BaseModel):
     last_name: Optional[str] = None
     birth_date: Optional[str] = Field(None, pattern=r"^\d{2}\.\d{2}\.\d{4}$")
     phone: Optional[str] = None
-    photo: Optional[str] = None
\ No newline at end of file
+    photo: Optional[str] = None
+
+class UserSearchResult(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    phone: str
+    email: str
+
+    class Config:
+        orm_mode = True
+
+class UserBulkCreate(BaseModel):
+    users: List[UserCreate]
+
+class UserBulkRowResult(BaseModel):
+    index: int  # Позиция строки во входной пачке
+    status: str  # "created" или "error"
+    user_id: Optional[int] = None
+    error: Optional[str] = None
+    sms_sent: Optional[bool] = None  # None, если СМС не требовалась (админ)
+
+class UserBulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[UserBulkRowResult]
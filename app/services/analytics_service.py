@@ -0,0 +1,332 @@
+from sqlalchemy import BigInteger, case, cast, func, select
+from app.db.models import Booking as BookingModel, Club
+from app.db.session import shard_map
+from app.core.config import settings
+from app.utils.timezone import UTC
+from datetime import date, datetime, timedelta
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
+import logging
+import os
+import shutil
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Колонки снимка: имя файла .npy -> dtype. Время — минуты от эпохи Unix в UTC
+SNAPSHOT_COLUMNS = {
+    "court_id": np.int32,
+    "start": np.int32,
+    "end": np.int32,
+    "price": np.int64,
+    "active": np.int8,  # 1 — status="active"
+}
+EXPORT_CHUNK = 50_000
+HOURS_IN_WEEK = 7 * 24
+EPOCH_WEEKDAY = 3  # 1970-01-01 — четверг
+# pg_try_advisory_xact_lock(namespace, 0): выгрузку делает один воркер на развёртывание; 31–32 заняты бронями
+EXPORT_LOCK_NAMESPACE = 33
+
+class BookingSnapshot:
+    """
+    Колоночный снимок броней одного клуба: по массиву NumPy на колонку,
+    открытые через mmap — страницы читаются с диска по мере обращения, база не нужна.
+    """
+
+    def __init__(self, club_id: int, generation: str, columns: Dict[str, np.ndarray]):
+        self.club_id = club_id
+        self.generation = generation
+        self.court_id = columns["court_id"]
+        self.start = columns["start"]
+        self.end = columns["end"]
+        self.price = columns["price"]
+        self.active = columns["active"]
+
+    @property
+    def built_at(self) -> datetime:
+        # Поколение — "<time_ns>-<pid>"
+        return datetime.fromtimestamp(int(self.generation.split("-")[0]) / 1e9, UTC)
+
+    def __len__(self) -> int:
+        return len(self.court_id)
+
+def _club_dir(club_id: int) -> str:
+    return os.path.join(settings.ANALYTICS_DIR, f"club_{club_id}")
+
+def _new_generation() -> str:
+    """Имя поколения уникально и между процессами: два экспорта в одну секунду не пишут в один каталог."""
+    return f"{time.time_ns()}-{os.getpid()}"
+
+def _write_snapshot(club_id: int, columns: Dict[str, np.ndarray], generation: str):
+    """
+    Каждое поколение пишется в свой каталог, после чего файл current атомарно переключается на него:
+    читатели видят либо старый, либо новый снимок целиком. Предыдущее поколение остаётся —
+    его мог только что прочитать из current читатель, ещё не открывший файлы; удаляются более старые.
+    """
+    club_dir = _club_dir(club_id)
+    target = os.path.join(club_dir, generation)
+    os.makedirs(target, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(target, f"{name}.npy"), values)
+    current = os.path.join(club_dir, "current")
+    try:
+        with open(current) as f:
+            previous = f.read().strip()
+    except FileNotFoundError:
+        previous = None
+    pointer = os.path.join(club_dir, f"current.{generation}.tmp")
+    with open(pointer, "w") as f:
+        f.write(generation)
+    os.replace(pointer, current)
+    for entry in os.listdir(club_dir):
+        path = os.path.join(club_dir, entry)
+        if entry not in (generation, previous) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+def export_snapshots(engine) -> Dict[int, int]:
+    """
+    Выгружает брони всех клубов шарда в снимки. Перевод в минуты эпохи и статуса в флаг
+    делается в SQL, в Python приходят только числа, которые пачками складываются в массивы.
+    Клубы шарда без броней получают пустой снимок, иначе после удаления последних броней
+    остался бы старый. Возвращает {club_id: число броней}.
+    """
+    query = (
+        select(
+            BookingModel.club_id,
+            BookingModel.court_id,
+            cast(func.extract("epoch", BookingModel.start_time), BigInteger),
+            cast(func.extract("epoch", BookingModel.end_time), BigInteger),
+            BookingModel.price,
+            case((BookingModel.status == "active", 1), else_=0)
+        )
+        .order_by(BookingModel.club_id, BookingModel.start_time)
+        .execution_options(yield_per=EXPORT_CHUNK)
+    )
+    chunks = []
+    with engine.connect() as conn:
+        for partition in conn.execute(query).partitions():
+            chunks.append(np.array(partition, dtype=np.int64).reshape(-1, 6))
+        # Клубы, которые живут в этом шарде: строка clubs могла остаться и в базе, откуда клуб переехал
+        shard_clubs = [
+            club_id for club_id in conn.execute(select(Club.id)).scalars()
+            if shard_map.engine_for(club_id) is engine
+        ]
+    rows = np.concatenate(chunks) if chunks else np.empty((0, 6), dtype=np.int64)
+
+    generation = _new_generation()
+    counts = {}
+    club_ids, starts = np.unique(rows[:, 0], return_index=True)
+    bounds = {int(club_id): (lo, hi) for club_id, lo, hi in zip(club_ids, starts, [*starts[1:], len(rows)])}
+    for club_id in sorted({*bounds, *shard_clubs}):
+        lo, hi = bounds.get(club_id, (0, 0))
+        club_rows = rows[lo:hi]
+        columns = {
+            "court_id": club_rows[:, 1],
+            "start": club_rows[:, 2] // 60,
+            "end": club_rows[:, 3] // 60,
+            "price": club_rows[:, 4],
+            "active": club_rows[:, 5],
+        }
+        _write_snapshot(club_id, {name: columns[name].astype(dtype) for name, dtype in SNAPSHOT_COLUMNS.items()}, generation)
+        counts[club_id] = int(hi - lo)
+    return counts
+
+class SnapshotStore:
+    """Открытые снимки по клубам; новое поколение подхватывается при следующем обращении."""
+
+    def __init__(self):
+        self._snapshots: Dict[int, BookingSnapshot] = {}
+        self._lock = Lock()
+
+    def get(self, club_id: int) -> Optional[BookingSnapshot]:
+        club_dir = _club_dir(club_id)
+        try:
+            with open(os.path.join(club_dir, "current")) as f:
+                generation = f.read().strip()
+        except FileNotFoundError:
+            return None
+        snapshot = self._snapshots.get(club_id)
+        if snapshot is None or snapshot.generation != generation:
+            columns = {
+                name: np.load(os.path.join(club_dir, generation, f"{name}.npy"), mmap_mode="r")
+                for name in SNAPSHOT_COLUMNS
+            }
+            snapshot = BookingSnapshot(club_id, generation, columns)
+            with self._lock:
+                self._snapshots[club_id] = snapshot
+        return snapshot
+
+snapshot_store = SnapshotStore()
+
+# ---------- Аналитика: только операции над массивами ----------
+
+def _epoch_minutes(moment: datetime) -> int:
+    return int(moment.timestamp()) // 60
+
+def _range_minutes(date_from: date, date_to: date, zone: ZoneInfo) -> Tuple[int, int]:
+    """[местная полночь date_from, местная полночь после date_to) в минутах эпохи."""
+    return (
+        _epoch_minutes(datetime.combine(date_from, datetime.min.time(), tzinfo=zone)),
+        _epoch_minutes(datetime.combine(date_to + timedelta(days=1), datetime.min.time(), tzinfo=zone))
+    )
+
+def _to_local(minutes: np.ndarray, zone: ZoneInfo) -> np.ndarray:
+    """
+    UTC-минуты -> местные минуты пояса клуба. Смещение считается один раз на каждый час
+    диапазона (переходы на летнее время происходят на границе часа) и применяется индексом.
+    """
+    if minutes.size == 0:
+        return minutes.astype(np.int64)
+    first_hour = int(minutes.min()) // 60
+    last_hour = int(minutes.max()) // 60
+    offsets = np.fromiter(
+        (
+            datetime.fromtimestamp(hour * 3600, zone).utcoffset().total_seconds() // 60
+            for hour in range(first_hour, last_hour + 1)
+        ),
+        dtype=np.int64,
+        count=last_hour - first_hour + 1
+    )
+    return minutes.astype(np.int64) + offsets[minutes // 60 - first_hour]
+
+def _select(snapshot: BookingSnapshot, zone: ZoneInfo, date_from: date, date_to: date, court_ids: Optional[List[int]]):
+    """Активные брони диапазона (и кортов) в местных минутах: (court_id, start, end, price)."""
+    range_start, range_end = _range_minutes(date_from, date_to, zone)
+    mask = (snapshot.active == 1) & (snapshot.start >= range_start) & (snapshot.start < range_end)
+    if court_ids:
+        mask &= np.isin(snapshot.court_id, court_ids)
+    start = np.asarray(snapshot.start[mask])
+    # Бронь не пересекает полночь, поэтому смещение пояса на начало годится и для конца
+    local_start = _to_local(start, zone)
+    local_end = local_start + (np.asarray(snapshot.end[mask]) - start)
+    return np.asarray(snapshot.court_id[mask]), local_start, local_end, np.asarray(snapshot.price[mask])
+
+def _hour_pieces(local_start: np.ndarray, local_end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Разрезает брони по границам часов: (индекс брони, местный час от эпохи, занятые минуты часа).
+    Бронь 10:30–12:00 даёт куски (10, 30) и (11, 60).
+    """
+    first_hour = local_start // 60
+    counts = (local_end - 1) // 60 - first_hour + 1
+    owner = np.repeat(np.arange(len(local_start)), counts)
+    hour = first_hour[owner] + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    minutes = np.minimum(local_end[owner], (hour + 1) * 60) - np.maximum(local_start[owner], hour * 60)
+    return owner, hour, minutes
+
+def _weekday_counts(date_from: date, date_to: date) -> np.ndarray:
+    """Сколько раз каждый день недели встречается в [date_from, date_to]."""
+    days = np.arange(date_from.toordinal(), date_to.toordinal() + 1)
+    # date.toordinal() == 1 — понедельник
+    return np.bincount((days - 1) % 7, minlength=7)
+
+def occupancy_heatmap(
+    snapshot: BookingSnapshot, zone: ZoneInfo, date_from: date, date_to: date, court_ids: Optional[List[int]] = None
+) -> Tuple[List[int], np.ndarray]:
+    """
+    Загрузка корт × день недели × час: доля часа, занятая бронями, усреднённая по всем
+    таким часам диапазона. Возвращает (корты, массив [корт, 0..6, 0..23]).
+    """
+    courts, local_start, local_end, _ = _select(snapshot, zone, date_from, date_to, court_ids)
+    court_list = sorted(court_ids) if court_ids else np.unique(snapshot.court_id).tolist()
+    owner, hour, minutes = _hour_pieces(local_start, local_end)
+    court_pos = np.searchsorted(court_list, courts[owner])
+    weekday = (hour // 24 + EPOCH_WEEKDAY) % 7
+    cell = court_pos * HOURS_IN_WEEK + weekday * 24 + hour % 24
+    booked = np.bincount(cell, weights=minutes, minlength=len(court_list) * HOURS_IN_WEEK)
+    booked = booked.reshape(len(court_list), 7, 24)
+    occurrences = _weekday_counts(date_from, date_to)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        heatmap = np.nan_to_num(booked / (60 * occurrences[None, :, None]))
+    return court_list, heatmap
+
+def revenue_curve(
+    snapshot: BookingSnapshot, zone: ZoneInfo, date_from: date, date_to: date,
+    bucket: str = "day", court_ids: Optional[List[int]] = None
+) -> List[Tuple[date, int, int]]:
+    """Выручка и число броней по местному дню, неделе (с понедельника) или месяцу начала брони."""
+    _, local_start, _, price = _select(snapshot, zone, date_from, date_to, court_ids)
+    days = (local_start // (24 * 60)).astype("datetime64[D]")
+    if bucket == "week":
+        days = days - ((days.astype(np.int64) + EPOCH_WEEKDAY) % 7).astype("timedelta64[D]")
+    elif bucket == "month":
+        days = days.astype("datetime64[M]").astype("datetime64[D]")
+    keys, inverse = np.unique(days, return_inverse=True)
+    revenue = np.bincount(inverse, weights=price, minlength=len(keys))
+    bookings = np.bincount(inverse, minlength=len(keys))
+    return [(key.item(), int(total), int(count)) for key, total, count in zip(keys, revenue, bookings)]
+
+def peak_hours(
+    snapshot: BookingSnapshot, zone: ZoneInfo, date_from: date, date_to: date,
+    limit: int = 5, court_ids: Optional[List[int]] = None
+) -> List[Tuple[int, int, float]]:
+    """
+    Самые загруженные часы суток по всем кортам: (час, занятые минуты за период, средняя загрузка).
+    Загрузка — доля от всех часов «корт × день» периода.
+    """
+    courts, local_start, local_end, _ = _select(snapshot, zone, date_from, date_to, court_ids)
+    _, hour, minutes = _hour_pieces(local_start, local_end)
+    booked = np.bincount(hour % 24, weights=minutes, minlength=24)
+    court_count = len(court_ids) if court_ids else len(np.unique(snapshot.court_id))
+    capacity = 60 * ((date_to - date_from).days + 1) * max(court_count, 1)
+    order = np.argsort(-booked, kind="stable")[:limit]
+    return [(int(h), int(booked[h]), float(booked[h] / capacity)) for h in order if booked[h] > 0]
+
+# ---------- Периодическая выгрузка ----------
+
+class SnapshotExporter(Thread):
+    """
+    Фоновый поток: раз в interval пересобирает снимки всех клубов каждой базы.
+    Поток запущен в каждом воркере, но выгружает только тот, кто взял advisory-блокировку
+    в основной базе: остальные пропускают круг, а не пишут те же снимки параллельно.
+    """
+
+    def __init__(self, engines, interval: float, lock_engine=None):
+        super().__init__(name="analytics-snapshots", daemon=True)
+        self.engines = engines
+        self.interval = interval
+        self.lock_engine = lock_engine or engines[0]
+        self._stop_event = Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.export_round()
+            except Exception as e:
+                logger.error(f"Analytics export round failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def export_round(self) -> bool:
+        """Один круг выгрузки; False — блокировку держит другой воркер."""
+        with self.lock_engine.connect() as lock_conn:
+            if lock_conn.dialect.name == "postgresql":
+                # Снимается сам в конце транзакции — в том числе если воркер упал посреди выгрузки
+                if not lock_conn.execute(select(func.pg_try_advisory_xact_lock(EXPORT_LOCK_NAMESPACE, 0))).scalar():
+                    return False
+            for engine in self.engines:
+                try:
+                    started = time.perf_counter()
+                    counts = export_snapshots(engine)
+                    logger.info(f"Analytics snapshots: {counts} bookings in {time.perf_counter() - started:.2f}s")
+                except Exception as e:
+                    logger.error(f"Analytics export failed on {engine.url!r}: {e}")
+            lock_conn.rollback()
+        return True
+
+_exporter: Optional[SnapshotExporter] = None
+
+def start_snapshot_exporter():
+    global _exporter
+    if not settings.ANALYTICS_SNAPSHOTS_ENABLED:
+        return
+    _exporter = SnapshotExporter(shard_map.engines(), settings.ANALYTICS_SNAPSHOT_SECONDS, lock_engine=shard_map.default)
+    _exporter.start()
+
+def stop_snapshot_exporter():
+    if _exporter:
+        _exporter.stop()
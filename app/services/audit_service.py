@@ -0,0 +1,163 @@
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session
+from app.db.models import Booking as BookingModel, BookingAuditEvent
+from app.db.tenancy import current_club_id
+from app.core.config import settings
+from collections import defaultdict
+from datetime import date, datetime
+from threading import Event, Lock, Thread
+from typing import List, Optional
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIT_ACTIONS = ("created", "deleted", "modified")
+
+def booking_snapshot(booking: BookingModel) -> dict:
+    """Состояние брони на момент события — строка журнала не зависит от того, что потом станет с бронью."""
+    return {
+        column.key: getattr(booking, column.key)
+        for column in BookingModel.__table__.columns
+        if not column.key.startswith("reminder_")
+    }
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class AuditWriter(Thread):
+    """
+    Буферизованная запись журнала броней: события копятся в памяти воркера и раз в
+    flush_seconds (или сразу по набору batch_size) уходят в booking_audit_events одним
+    INSERT на базу. Запрос бронирования не ждёт записи журнала и не делает лишнего commit.
+    Если база журнала недоступна дольше, чем помещается в max_buffer, старые события теряются с предупреждением.
+    """
+
+    def __init__(self, flush_seconds: float, batch_size: int, max_buffer: int):
+        super().__init__(name="booking-audit", daemon=True)
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._buffer: List[tuple] = []  # (engine, строка booking_audit_events)
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stop_event = Event()
+        self.dropped = 0
+
+    def record(self, db: Session, action: str, snapshot: dict, actor_id: Optional[int], changes: Optional[dict] = None):
+        """
+        Вызывается после commit: откатившиеся изменения в журнал не попадают.
+        snapshot — booking_snapshot(); для "modified" в changes — {поле: [было, стало]}.
+        """
+        if action not in AUDIT_ACTIONS:
+            raise ValueError(f"Unknown audit action: {action}")
+        payload = snapshot if changes is None else {**snapshot, "changes": changes}
+        row = {
+            "club_id": snapshot.get("club_id") or current_club_id(db),
+            "booking_id": snapshot["id"],
+            "court_id": snapshot["court_id"],
+            "user_id": snapshot.get("user_id"),
+            "actor_id": actor_id,
+            "action": action,
+            "payload": json.dumps(payload, default=_json_default, ensure_ascii=False),
+            "created_at": datetime.utcnow()
+        }
+        with self._lock:
+            self._append([(db.get_bind(), row)])
+            size = len(self._buffer)
+        if size >= self.batch_size:
+            self._wakeup.set()
+
+    def _append(self, items: List[tuple]):
+        # Вызывается под self._lock
+        self._buffer.extend(items)
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            logger.warning(f"Audit buffer is full, {overflow} oldest events dropped")
+
+    def flush(self) -> int:
+        with self._lock:
+            items, self._buffer = self._buffer, []
+        if not items:
+            return 0
+        by_engine = defaultdict(list)
+        for engine, row in items:
+            by_engine[engine].append(row)
+        written = 0
+        for engine, rows in by_engine.items():
+            try:
+                with engine.begin() as conn:
+                    # executemany: одна вставка на пачку, без ORM и хуков сессии
+                    conn.execute(insert(BookingAuditEvent), rows)
+                written += len(rows)
+            except Exception as e:
+                logger.error(f"Audit flush failed on {engine.url!r}: {e}")
+                # Возвращаем в начало буфера — повторим на следующем тике
+                with self._lock:
+                    pending, self._buffer = self._buffer, []
+                    self._append([(engine, row) for row in rows] + pending)
+        return written
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+        # Последняя запись при остановке воркера
+        self.flush()
+
+audit_writer = AuditWriter(
+    flush_seconds=settings.AUDIT_FLUSH_SECONDS,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    max_buffer=settings.AUDIT_MAX_BUFFER
+)
+
+def start_audit_writer():
+    audit_writer.start()
+
+def stop_audit_writer():
+    audit_writer.stop()
+    audit_writer.join(timeout=settings.AUDIT_FLUSH_SECONDS + 5)
+
+def get_audit_events(
+    db: Session,
+    court_id: Optional[int] = None,
+    booking_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    action: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100,
+    before_id: Optional[int] = None
+) -> List[BookingAuditEvent]:
+    """
+    События журнала от новых к старым, по индексу (court_id, created_at) или (created_at, id).
+    Следующая страница — курсор (created_at, id) последнего события: date_to = created_at и
+    before_id = id, без OFFSET по всему журналу. Только date_to без before_id потерял бы
+    события пачки с тем же created_at, что у последнего на странице.
+    """
+    query = db.query(BookingAuditEvent)
+    if court_id is not None:
+        query = query.filter(BookingAuditEvent.court_id == court_id)
+    if booking_id is not None:
+        query = query.filter(BookingAuditEvent.booking_id == booking_id)
+    if actor_id is not None:
+        query = query.filter(BookingAuditEvent.actor_id == actor_id)
+    if action is not None:
+        query = query.filter(BookingAuditEvent.action == action)
+    if date_from is not None:
+        query = query.filter(BookingAuditEvent.created_at >= date_from)
+    if date_to is not None and before_id is not None:
+        query = query.filter(tuple_(BookingAuditEvent.created_at, BookingAuditEvent.id) < tuple_(date_to, before_id))
+    elif date_to is not None:
+        query = query.filter(BookingAuditEvent.created_at < date_to)
+    return query.order_by(BookingAuditEvent.created_at.desc(), BookingAuditEvent.id.desc()).limit(limit).all()
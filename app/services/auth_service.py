@@ -1,10 +1,16 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from app.db.models import User
-from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password, create_access_token, decode_access_token
+from app.schemas.user import UserCreate, UserBulkResult, UserBulkRowResult
+from app.core.config import settings
+from app.core.security import get_password_hash, get_password_hashes, verify_password, create_access_token, decode_access_token
 from random import randint
 from fastapi import HTTPException
-from app.utils.sms import send_sms
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, List
+from app.utils.sms import send_sms, send_sms_batch
+from app.utils.phone import normalize_phone
+from app.services.cache_bus import cache_bus
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -14,7 +20,8 @@ async def create_user(db: Session, user: UserCreate, is_admin_creator: bool = Fa
     if user.is_admin and not is_admin_creator:
         raise HTTPException(status_code=403, detail="Only admin can create admins")
     
-    existing_user = db.query(User).filter((User.email == user.email) | (User.phone == user.phone)).first()
+    phone_e164 = normalize_phone(user.phone)
+    existing_user = db.query(User).filter((User.email == user.email) | (User.phone_e164 == phone_e164)).first()
     if existing_user:
         raise HTTPException(status_code=409, detail="Email or phone already registered")
     
@@ -26,19 +33,21 @@ async def create_user(db: Session, user: UserCreate, is_admin_creator: bool = Fa
         last_name=user.last_name,
         birth_date=user.birth_date,
         phone=user.phone,
+        phone_e164=phone_e164,
         hashed_password=hashed_password,
         photo=user.photo,
         role="admin" if user.is_admin else "user",
         verification_code=verification_code
     )
     db.add(db_user)
+    cache_bus.publish(db, "users")
     db.commit()
     db.refresh(db_user)
 
     # Отправляем СМС с кодом верификации, если пользователь не администратор
     if verification_code:
         try:
-            await send_sms(db_user.phone, verification_code)
+            await send_sms(db_user.phone_e164, verification_code)
             logger.info(f"SMS sent to {db_user.phone} with code: {verification_code}")
         except HTTPException as e:
             logger.error(f"Failed to send SMS to {db_user.phone}: {e.detail}")
@@ -47,16 +56,130 @@ async def create_user(db: Session, user: UserCreate, is_admin_creator: bool = Fa
 
     return db_user
 
-def authenticate_user(db: Session, phone: str, code: str):
-    user = db.query(User).filter(User.phone == phone).first()
+async def create_users_bulk(db: Session, users: List[UserCreate], is_admin_creator: bool = False) -> UserBulkResult:
+    """
+    Массовая регистрация: одна проверка дублей на всю пачку, параллельное хэширование паролей,
+    одна вставка и пакетная отправка СМС. Ошибки возвращаются построчно, валидные строки создаются.
+    """
+    if len(users) > settings.BULK_REGISTER_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"Too many users in one batch (max {settings.BULK_REGISTER_MAX_USERS})")
+
+    results: Dict[int, UserBulkRowResult] = {}
+
+    def fail(index: int, error: str):
+        results[index] = UserBulkRowResult(index=index, status="error", error=error)
+
+    # Дубли внутри самой пачки: первая строка выигрывает
+    seen_emails: Dict[str, int] = {}
+    seen_phones: Dict[str, int] = {}
+    phones: Dict[int, str] = {}
+    candidates: List[int] = []
+    for i, user in enumerate(users):
+        if user.is_admin and not is_admin_creator:
+            fail(i, "Only admin can create admins")
+            continue
+        try:
+            phone_e164 = normalize_phone(user.phone)
+        except HTTPException as e:
+            fail(i, e.detail)
+            continue
+        email = user.email.lower()
+        if email in seen_emails:
+            fail(i, f"Email duplicates row {seen_emails[email]}")
+            continue
+        if phone_e164 in seen_phones:
+            fail(i, f"Phone duplicates row {seen_phones[phone_e164]}")
+            continue
+        seen_emails[email] = i
+        seen_phones[phone_e164] = i
+        phones[i] = phone_e164
+        candidates.append(i)
+
+    # Дубли в базе: один запрос с IN по всем email и телефонам
+    if candidates:
+        existing = db.query(User.email, User.phone_e164).filter(
+            User.email.in_([users[i].email for i in candidates]) |
+            User.phone_e164.in_([phones[i] for i in candidates])
+        ).all()
+        taken_emails = {email.lower() for email, _ in existing}
+        taken_phones = {phone for _, phone in existing}
+        remaining = []
+        for i in candidates:
+            if users[i].email.lower() in taken_emails or phones[i] in taken_phones:
+                fail(i, "Email or phone already registered")
+            else:
+                remaining.append(i)
+        candidates = remaining
+
+    if candidates:
+        hashed_passwords = await run_in_threadpool(get_password_hashes, [users[i].password for i in candidates])
+        db_users = []
+        for i, hashed_password in zip(candidates, hashed_passwords):
+            user = users[i]
+            db_users.append(User(
+                email=user.email,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                birth_date=user.birth_date,
+                phone=user.phone,
+                phone_e164=phones[i],
+                hashed_password=hashed_password,
+                photo=user.photo,
+                role="admin" if user.is_admin else "user",
+                verification_code=str(randint(1000, 9999)) if not user.is_admin else None
+            ))
+
+        # add_all + flush: SQLAlchemy отправляет пачку одним INSERT ... RETURNING.
+        # Всё нужное после commit читаем до него: commit сбрасывает атрибуты,
+        # и каждое обращение к ним стало бы отдельным SELECT на пользователя
+        db.add_all(db_users)
+        cache_bus.publish(db, "users")
+        try:
+            db.flush()
+            created_rows = [
+                (i, db_user.id, db_user.phone, db_user.phone_e164, db_user.verification_code)
+                for i, db_user in zip(candidates, db_users)
+            ]
+            db.commit()
+        except IntegrityError as e:
+            # Гонка с параллельной регистрацией: пачка откатывается целиком
+            db.rollback()
+            logger.error(f"Bulk user insert failed: {e}")
+            for i in candidates:
+                fail(i, "Email or phone already registered")
+            created_rows = []
+
+        for i, user_id, _, _, _ in created_rows:
+            results[i] = UserBulkRowResult(index=i, status="created", user_id=user_id)
+
+        # Коды верификации отправляем одной пачкой, неудачи СМС не отменяют регистрацию
+        to_notify = [row for row in created_rows if row[4]]
+        if to_notify:
+            try:
+                sms_results = await send_sms_batch([(phone_e164, code) for _, _, _, phone_e164, code in to_notify])
+            except HTTPException as e:
+                logger.error(f"Failed to send bulk SMS: {e.detail}")
+                sms_results = [(False, e.detail)] * len(to_notify)
+            for (i, _, phone, _, _), (sent, status) in zip(to_notify, sms_results):
+                # Неизвестный исход (None) — тоже «не отправлено»: клиент запросит код повторно
+                results[i].sms_sent = sent is True
+                if not sent:
+                    logger.error(f"Failed to send SMS to {phone}: {status}")
+
+    ordered = [results[i] for i in sorted(results)]
+    created = sum(1 for r in ordered if r.status == "created")
+    return UserBulkResult(created=created, failed=len(ordered) - created, results=ordered)
+
+def authenticate_user(db: Session, phone_e164: str, code: str):
+    user = db.query(User).filter(User.phone_e164 == phone_e164).first()
     if not user or user.verification_code != code:
         return None
     user.verification_code = None  # Сбрасываем код после верификации
     db.commit()
     return user
 
-async def resend_verification_code(db: Session, phone: str):
-    user = db.query(User).filter(User.phone == phone).first()
+async def resend_verification_code(db: Session, phone_e164: str):
+    user = db.query(User).filter(User.phone_e164 == phone_e164).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.verification_code = str(randint(1000, 9999))
@@ -64,7 +187,7 @@ async def resend_verification_code(db: Session, phone: str):
 
     # Отправляем СМС с новым кодом
     try:
-        await send_sms(user.phone, user.verification_code)
+        await send_sms(user.phone_e164, user.verification_code)
         logger.info(f"SMS sent to {user.phone} with code: {user.verification_code}")
     except HTTPException as e:
         logger.error(f"Failed to send SMS to {user.phone}: {e.detail}")
@@ -74,7 +197,8 @@ async def resend_verification_code(db: Session, phone: str):
 
 def get_current_user(db: Session, token: str):
     payload = decode_access_token(token)
-    if not payload:
+    # Токены с scope (старые ссылки на календарь) — не учётные данные для API
+    if not payload or "scope" in payload:
         return None
     user_id = payload.get("sub")
     if not user_id:
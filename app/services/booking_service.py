@@ -1,91 +1,142 @@
 from sqlalchemy.orm import Session
 from app.db.models import Booking as BookingModel, Court, User
 from app.schemas.booking import BookingCreate, BookingAvailability
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from fastapi import HTTPException
-from typing import Optional, List
+from typing import Dict, Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
-from zoneinfo import ZoneInfo
+from app.services.schedule_service import slot_templates, time_to_minutes, MINUTES_IN_DAY
+from app.services.cache_bus import cache_bus
+from app.services.tariff_service import tariff_engine
+from app.services.court_queue_service import court_writers
+from app.services.audit_service import audit_writer, booking_snapshot
+from app.utils.fields import load_columns
+from app.utils.timezone import club_zone, day_bounds, local_now, to_local
+from collections import defaultdict
+from itertools import islice
+import heapq
 
-def force_msk(dt: datetime) -> datetime:
-    """
-    Конвертирует время в MSK, сохраняя значение как наивное (без tzinfo).
-    Если dt не содержит tzinfo, предполагается, что оно уже в MSK.
-    """
-    msk_tz = ZoneInfo("Europe/Moscow")
-    if dt.tzinfo:
-        dt = dt.astimezone(msk_tz)
-    return dt.replace(tzinfo=None)
+def short_user_name(user: User) -> str:
+    """Имя для списков броней: «Иван П.»."""
+    return f"{user.first_name.strip()} {user.last_name[0] if user.last_name else ''}.".strip()
 
-def create_booking(db: Session, booking: BookingCreate, user_id: int, is_admin: bool) -> BookingModel:
+def create_booking(db: Session, booking: BookingCreate, user_id: int, is_admin: bool, actor_id: Optional[int] = None) -> BookingModel:
     print(f"Полученные данные бронирования: {booking.dict()}")
-    # Приводим входящие даты к МСК, игнорируя tzinfo
-    booking.start_time = force_msk(booking.start_time)
-    booking.end_time = force_msk(booking.end_time)
+    # Время без пояса — местное время клуба; дальше работаем со временем в поясе клуба
+    zone = club_zone(db)
+    start = booking.start_time = to_local(booking.start_time, zone)
+    end = booking.end_time = to_local(booking.end_time, zone)
 
-    start_naive = booking.start_time
-    end_naive = booking.end_time
-
-    if start_naive.date() != end_naive.date():
+    if start.date() != end.date():
         raise ValueError("Бронирование не может пересекать полночь. Начало и конец должны быть в одном дне")
 
-    # Текущее время в МСК как наивное значение
-    now_msk = datetime.now(ZoneInfo("Europe/Moscow")).replace(tzinfo=None)
-    if start_naive <= now_msk:
+    now = local_now(zone)
+    if start <= now:
         raise ValueError("Время начала бронирования должно быть в будущем")
-    if end_naive <= start_naive:
+    if end <= start:
         raise ValueError("Время окончания должно быть позже времени начала")
 
-    # Проверка существующих бронирований
-    existing_bookings = (
-        db.query(BookingModel)
-        .filter(
-            BookingModel.court_id == booking.court_id,
-            BookingModel.status == "active",
-            BookingModel.start_time < end_naive,
-            BookingModel.end_time > start_naive
+    # Корт должен принадлежать клубу сессии (запрос фильтруется по club_id)
+    if not db.query(Court.id).filter(Court.id == booking.court_id).first():
+        raise ValueError("Корт не найден")
+
+    # Цена по тарифу корта; цена клиента используется, только если тариф на этот день не задан
+    tariffs = tariff_engine.table(db)
+    if tariffs.for_day(booking.court_id, start.date()) is not None:
+        price = tariffs.price(booking.court_id, start, end)
+        if price is None:
+            raise ValueError("Для выбранного времени не задан тариф")
+    elif booking.price is not None:
+        price = booking.price
+    else:
+        raise ValueError("Для корта не задан тариф, укажите цену")
+
+    # При наплыве на один слот проигравшие отсекаются в памяти, не занимая очередь корта
+    court_writers.check(db, booking.court_id, start, end)
+
+    # Запись по корту — строго по одной; проверка и вставка внутри очереди не гонятся между собой
+    with court_writers.writer(db, booking.court_id):
+        court_writers.check(db, booking.court_id, start, end)
+
+        # Проверка существующих бронирований
+        existing_bookings = (
+            db.query(BookingModel)
+            .filter(
+                BookingModel.court_id == booking.court_id,
+                BookingModel.status == "active",
+                BookingModel.start_time < end,
+                BookingModel.end_time > start
+            )
+            .all()
         )
-        .all()
-    )
-    existing_bookings_naive = [
-        (b.start_time.replace(tzinfo=None), b.end_time.replace(tzinfo=None))
-        for b in existing_bookings
-    ]
-    print(f"Проверка доступности для court_id={booking.court_id}, start_time={start_naive}, end_time={end_naive}")
-    print(f"Существующие бронирования: {existing_bookings_naive}")
-
-    if any(s < end_naive and e > start_naive for s, e in existing_bookings_naive):
-        raise ValueError("Выбранный слот уже занят")
-
-    db_booking = BookingModel(
-        court_id=booking.court_id,
-        user_id=user_id,
-        start_time=start_naive,
-        end_time=end_naive,
-        price=booking.price,
-        status="active"
-    )
-    db.add(db_booking)
-    db.commit()
+        print(f"Проверка доступности для court_id={booking.court_id}, start_time={start}, end_time={end}")
+        print(f"Существующие бронирования: {[(b.start_time, b.end_time) for b in existing_bookings]}")
+
+        # Пересечение уже проверено в SQL по timestamptz
+        if existing_bookings:
+            raise ValueError("Выбранный слот уже занят")
+
+        db_booking = BookingModel(
+            court_id=booking.court_id,
+            user_id=user_id,
+            start_time=start,
+            end_time=end,
+            price=price,
+            status="active"
+        )
+        db.add(db_booking)
+        cache_bus.publish(db, "bookings", court_id=booking.court_id, user_id=user_id, action="created")
+        db.commit()
+        court_writers.remember(db, booking.court_id, start, end, now)
     db.refresh(db_booking)
+    audit_writer.record(db, "created", booking_snapshot(db_booking), actor_id)
     return db_booking
 
 def get_bookings_by_user(db: Session, user_id: int) -> List[BookingModel]:
     return db.query(BookingModel).filter(BookingModel.user_id == user_id).all()
 
-def get_all_bookings(db: Session) -> List[BookingModel]:
-    return db.query(BookingModel).options(joinedload(BookingModel.user)).all()
+def booking_load_options(fields: Optional[List[str]] = None) -> list:
+    """
+    Опции загрузки броней под ?fields=: только запрошенные колонки, а владелец
+    подгружается join-ом лишь для user_name. None — полная бронь с владельцем.
+    """
+    if fields is None:
+        return [joinedload(BookingModel.user)]
+    options = [load_columns(BookingModel, fields)]
+    if "user_name" in fields:
+        options.append(joinedload(BookingModel.user).load_only(User.first_name, User.last_name))
+    return options
+
+def get_upcoming_bookings(db: Session, user_id: int, now: datetime, fields: Optional[List[str]] = None) -> List[BookingModel]:
+    """Активные брони пользователя, которые ещё не закончились."""
+    return (
+        db.query(BookingModel)
+        .options(*booking_load_options(fields))
+        .filter(
+            BookingModel.user_id == user_id,
+            BookingModel.end_time > now,
+            BookingModel.status == "active"
+        )
+        .all()
+    )
+
+def get_all_bookings(db: Session, fields: Optional[List[str]] = None) -> List[BookingModel]:
+    return db.query(BookingModel).options(*booking_load_options(fields)).all()
 
 def get_booking_by_id(db: Session, booking_id: int) -> Optional[BookingModel]:
     return db.query(BookingModel).options(joinedload(BookingModel.user)).filter(BookingModel.id == booking_id).first()
 
-def delete_booking(db: Session, booking_id: int):
+def delete_booking(db: Session, booking_id: int, actor_id: Optional[int] = None):
     booking = get_booking_by_id(db, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
+    # Строка удаляется целиком — её последнее состояние остаётся только в журнале
+    snapshot = booking_snapshot(booking)
     db.delete(booking)
+    cache_bus.publish(db, "bookings", court_id=booking.court_id, user_id=booking.user_id)
     db.commit()
+    audit_writer.record(db, "deleted", snapshot, actor_id)
 
 def filter_bookings(
     db: Session,
@@ -110,40 +161,157 @@ def filter_bookings(
     print(f"SQL query: {str(query)}")
     return bookings
 
-def get_availability(db: Session, court_id: int, date: str, is_admin: bool = False) -> List[BookingAvailability]:
-    try:
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-    
-    start_of_day = date_obj.replace(hour=0, minute=0)
-    end_of_day = date_obj.replace(hour=23, minute=59)
-    bookings = db.query(BookingModel).options(joinedload(BookingModel.user)).filter(
-        BookingModel.court_id == court_id,
-        BookingModel.start_time >= start_of_day,
-        BookingModel.end_time <= end_of_day,
-        BookingModel.status == "active"
-    ).all()
-    
+def _wall_minutes(moment: datetime, day_start: datetime) -> int:
+    """Минуты от полуночи по часам клуба (пояс — из day_start); до дня — 0, после — конец дня."""
+    local = moment.astimezone(day_start.tzinfo)
+    if local.date() < day_start.date():
+        return 0
+    if local.date() > day_start.date():
+        return MINUTES_IN_DAY
+    return local.hour * 60 + local.minute
+
+def _overlay_bookings(template, prices, bookings: List[BookingModel], day_start: datetime, is_admin: bool) -> List[BookingAvailability]:
+    """Наложение отсортированных по началу броней на шаблон дня — один проход двумя указателями."""
+    # Границы броней в минутах по местным часам, обрезанные по границам дня. Не разность с полуночью:
+    # в день перевода часов она расходится с подписями слотов на час
+    intervals = [(_wall_minutes(b.start_time, day_start), _wall_minutes(b.end_time, day_start), b) for b in bookings]
+
     slots = []
-    current_time = start_of_day
-    while current_time < end_of_day:
-        slot_end = current_time + timedelta(hours=1)
-        booked = any(
-            b.start_time.replace(tzinfo=None) < slot_end and b.end_time.replace(tzinfo=None) > current_time 
-            for b in bookings
+    pos = 0
+    for slot_start, slot_end, start_label, end_label in template:
+        while pos < len(intervals) and intervals[pos][1] <= slot_start:
+            pos += 1
+        booking = intervals[pos][2] if pos < len(intervals) and intervals[pos][0] < slot_end else None
+        name = None
+        if booking and is_admin and booking.user:
+            name = short_user_name(booking.user)
+        slots.append(BookingAvailability(
+            start=start_label,
+            end=end_label,
+            is_booked=booking is not None,
+            name=name,
+            price=prices.price(slot_start, slot_end) if prices else None
+        ))
+    return slots
+
+def _day_bookings_query(db: Session, day_start: datetime, day_end: datetime, is_admin: bool):
+    query = db.query(BookingModel).filter(
+        BookingModel.start_time < day_end,
+        BookingModel.end_time > day_start,
+        BookingModel.status == "active"
+    ).order_by(BookingModel.start_time)
+    if is_admin:
+        query = query.options(joinedload(BookingModel.user))
+    return query
+
+def get_availability(db: Session, court_id: int, day: date, is_admin: bool = False) -> List[BookingAvailability]:
+    """
+    Сетка слотов на день: кэшированный шаблон (корт, день недели) плюс наложение броней.
+    Брони отсортированы по началу, поэтому наложение — один проход двумя указателями.
+    """
+    template = slot_templates.get(db, court_id, day.weekday())
+    prices = tariff_engine.table(db).for_day(court_id, day)
+    day_start, day_end = day_bounds(day, club_zone(db))
+    bookings = _day_bookings_query(db, day_start, day_end, is_admin).filter(BookingModel.court_id == court_id).all()
+    return _overlay_bookings(template, prices, bookings, day_start, is_admin)
+
+def get_availability_many(db: Session, court_ids: List[int], day: date, is_admin: bool = False) -> Dict[int, List[BookingAvailability]]:
+    """Сетки слотов нескольких кортов на день: брони всех кортов одним запросом, шаблоны — одним при промахе кэша."""
+    slot_templates.warm(db, court_ids)
+    table = tariff_engine.table(db)
+    day_start, day_end = day_bounds(day, club_zone(db))
+    by_court = defaultdict(list)
+    for b in _day_bookings_query(db, day_start, day_end, is_admin).filter(BookingModel.court_id.in_(court_ids)).all():
+        by_court[b.court_id].append(b)
+    return {
+        court_id: _overlay_bookings(
+            slot_templates.get(db, court_id, day.weekday()), table.for_day(court_id, day), by_court[court_id], day_start, is_admin
         )
-        slot = BookingAvailability(
-            start=current_time.strftime("%H:%M"),
-            end=slot_end.strftime("%H:%M"),
-            is_booked=booked,
-            name=next(
-                (f"{b.user.first_name.strip()} {b.user.last_name[0] if b.user.last_name else ''}.".strip()
-                 for b in bookings
-                 if b.start_time.replace(tzinfo=None) < slot_end and b.end_time.replace(tzinfo=None) > current_time),
-                None
-            ) if booked and is_admin else None
+        for court_id in court_ids
+    }
+
+def find_free_slots(
+    db: Session,
+    duration_minutes: int,
+    date_from: date,
+    days: int,
+    window_start: Optional[time] = None,
+    window_end: Optional[time] = None,
+    court_ids: Optional[List[int]] = None,
+    weekdays: Optional[List[int]] = None,
+    limit: int = 5
+) -> List[dict]:
+    """
+    Ищет ближайшие свободные окна заданной длительности по всем (или выбранным) кортам.
+    Активные брони за весь горизонт берутся одним запросом, отсортированными по (корт, начало);
+    для каждого корта ленивый генератор отдаёт окна по возрастанию времени, а heapq.merge
+    сливает их, так что перебирается ровно столько кандидатов, сколько нужно для limit.
+    Кандидаты выровнены по сетке слотов корта и не выходят за часы работы и окно времени суток.
+    """
+    courts_query = db.query(Court.id, Court.name)
+    if court_ids:
+        courts_query = courts_query.filter(Court.id.in_(court_ids))
+    courts = courts_query.order_by(Court.id).all()
+    if not courts:
+        return []
+    court_names = {court_id: name for court_id, name in courts}
+    ids = list(court_names)
+
+    zone = club_zone(db)
+    now = local_now(zone)
+    range_start = day_bounds(date_from, zone)[0]
+    range_end = day_bounds(date_from + timedelta(days=days - 1), zone)[1]
+    rows = (
+        db.query(BookingModel.court_id, BookingModel.start_time, BookingModel.end_time)
+        .filter(
+            BookingModel.court_id.in_(ids),
+            BookingModel.status == "active",
+            BookingModel.start_time < range_end,
+            BookingModel.end_time > max(range_start, now)
         )
-        slots.append(slot)
-        current_time = slot_end
-    return slots
\ No newline at end of file
+        .order_by(BookingModel.court_id, BookingModel.start_time)
+        .all()
+    )
+    busy_by_court = defaultdict(list)
+    for court_id, start_time, end_time in rows:
+        busy_by_court[court_id].append((start_time, end_time))
+
+    slot_templates.warm(db, ids)
+    window_from = time_to_minutes(window_start) if window_start else 0
+    window_to = time_to_minutes(window_end, is_end=True) if window_end else MINUTES_IN_DAY
+
+    def court_windows(court_id: int):
+        busy = busy_by_court[court_id]
+        pos = 0
+        for offset in range(days):
+            day = date_from + timedelta(days=offset)
+            if weekdays and day.weekday() not in weekdays:
+                continue
+            template = slot_templates.get(db, court_id, day.weekday())
+            if not template:
+                continue
+            day_start = day_bounds(day, zone)[0]
+            close = min(template[-1][1], window_to)
+            for slot_start, _, _, _ in template:
+                slot_end = slot_start + duration_minutes
+                if slot_start < window_from:
+                    continue
+                if slot_end > close:
+                    break
+                start = day_start + timedelta(minutes=slot_start)
+                if start <= now:
+                    continue
+                end = day_start + timedelta(minutes=slot_end)
+                # Кандидаты идут по возрастанию, поэтому указатель по броням только растёт
+                while pos < len(busy) and busy[pos][1] <= start:
+                    pos += 1
+                if pos < len(busy) and busy[pos][0] < end:
+                    continue
+                yield start, court_id, end
+
+    merged = list(islice(heapq.merge(*(court_windows(court_id) for court_id in ids)), limit))
+    prices = tariff_engine.price_many(db, [(court_id, start, end) for start, court_id, end in merged])
+    return [
+        {"court_id": court_id, "court_name": court_names[court_id], "start_time": start, "end_time": end, "price": price}
+        for (start, court_id, end), price in zip(merged, prices)
+    ]
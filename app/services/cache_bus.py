@@ -0,0 +1,197 @@
+from sqlalchemy import event, func, insert, or_, select
+from sqlalchemy.orm import Session
+from app.db.models import CacheEvent
+from app.core.config import settings
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Callable, Dict, List, Optional
+import json
+import select as select_module
+import time
+import uuid
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidation"
+RECONNECT_DELAY_SECONDS = 5
+POLL_EVENTS_RETENTION = timedelta(hours=1)
+POLL_GAP_TIMEOUT_SECONDS = 300  # Дольше любой пишущей транзакции
+POLL_MAX_GAPS = 1000
+
+# Обработчик получает payload события или None — «сбросить всё» (после переподключения)
+Handler = Callable[[Optional[dict]], None]
+
+class CacheBus:
+    """
+    Шина инвалидации in-process кэшей между воркерами.
+    publish() вызывается до commit: в режиме "notify" это pg_notify в той же транзакции
+    (Postgres доставит его только после commit), в режиме "poll" — строка в cache_events.
+    Свой воркер сбрасывает кэш сразу после commit, остальные — из фонового слушателя.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+    def subscribe(self, topic: str, handler: Handler):
+        self._handlers[topic].append(handler)
+
+    def dispatch(self, topic: str, payload: Optional[dict]):
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler for {topic} failed: {e}")
+
+    def dispatch_all(self):
+        for topic in list(self._handlers):
+            self.dispatch(topic, None)
+
+    def handle_message(self, raw: str):
+        message = json.loads(raw)
+        if message.get("origin") == self.origin:
+            return  # Свои события уже обработаны после commit
+        self.dispatch(message["topic"], message.get("payload"))
+
+    def publish(self, db: Session, topic: str, **payload):
+        # Кэши разделены по клубам: событие сбрасывает только записи клуба сессии
+        payload.setdefault("club_id", db.info.get("club_id"))
+        message = {"topic": topic, "payload": payload, "origin": self.origin}
+        if self.mode == "notify" and db.bind.dialect.name == "postgresql":
+            db.execute(select(func.pg_notify(CHANNEL, json.dumps(message))))
+        elif self.mode == "poll":
+            db.execute(insert(CacheEvent).values(topic=topic, payload=json.dumps(message), created_at=datetime.utcnow()))
+        db.info.setdefault("cache_bus_pending", []).append((topic, payload))
+
+cache_bus = CacheBus(mode=settings.CACHE_BUS_MODE)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session: Session):
+    for topic, payload in session.info.pop("cache_bus_pending", []):
+        cache_bus.dispatch(topic, payload)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session: Session):
+    session.info.pop("cache_bus_pending", None)
+
+class CacheInvalidationListener(Thread):
+    """
+    Фоновый поток воркера: LISTEN на канале (режим "notify") или опрос cache_events (режим "poll").
+    После любого обрыва соединения сбрасывает все кэши — события за время простоя могли потеряться.
+    """
+
+    def __init__(self, bus: CacheBus, engine, poll_interval: float):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.bus = bus
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self._stop_event = Event()
+        self._last_id = 0
+        self._gaps: Dict[int, float] = {}  # Пропущенный id -> time.monotonic(), когда замечена дыра
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.bus.mode == "notify":
+                    self._listen()
+                else:
+                    self._poll()
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+                self.bus.dispatch_all()
+                self._stop_event.wait(RECONNECT_DELAY_SECONDS)
+
+    def _listen(self):
+        # Отдельное соединение вне пула: в режиме LISTEN его нельзя отдавать другим запросам
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # События до подписки не получены — начинаем с чистых кэшей
+            self.bus.dispatch_all()
+            logger.info(f"Listening for cache invalidations on {CHANNEL}")
+            while not self._stop_event.is_set():
+                readable, _, _ = select_module.select([dbapi_connection], [], [], self.poll_interval)
+                if not readable:
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    self.bus.handle_message(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def _poll(self):
+        with self.engine.connect() as connection:
+            self._last_id = connection.execute(select(func.coalesce(func.max(CacheEvent.id), 0))).scalar()
+            self._gaps = {}
+            connection.commit()
+            self.bus.dispatch_all()
+            while not self._stop_event.wait(self.poll_interval):
+                self._poll_once(connection)
+                connection.execute(
+                    CacheEvent.__table__.delete().where(CacheEvent.created_at < datetime.utcnow() - POLL_EVENTS_RETENTION)
+                )
+                connection.commit()
+
+    def _poll_once(self, connection):
+        """
+        Курсор по id не годится сам по себе: id выдаётся при INSERT, а виден после commit,
+        и транзакция с меньшим id может закоммититься позже большей. Пропущенные id запоминаются
+        как «дыры» и перечитываются, пока не появятся или не устареют (откаченная транзакция дыру не закроет).
+        """
+        now = time.monotonic()
+        condition = CacheEvent.id > self._last_id
+        if self._gaps:
+            condition = or_(condition, CacheEvent.id.in_(list(self._gaps)))
+        rows = connection.execute(
+            select(CacheEvent.id, CacheEvent.payload).where(condition).order_by(CacheEvent.id)
+        ).all()
+        for event_id, payload in rows:
+            if event_id > self._last_id:
+                for missing in range(self._last_id + 1, event_id):
+                    self._gaps[missing] = now
+                self._last_id = event_id
+            else:
+                self._gaps.pop(event_id, None)
+            self.bus.handle_message(payload)
+        for missing, noticed_at in list(self._gaps.items()):
+            if now - noticed_at > POLL_GAP_TIMEOUT_SECONDS:
+                del self._gaps[missing]
+        if len(self._gaps) > POLL_MAX_GAPS:
+            # Слишком много дыр (скачок последовательности) — проще сбросить кэши целиком
+            logger.warning(f"Too many cache event gaps ({len(self._gaps)}), flushing all caches")
+            self._gaps.clear()
+            self.bus.dispatch_all()
+
+_listeners: List[CacheInvalidationListener] = []
+
+def start_cache_listener(engine):
+    if cache_bus.mode not in ("notify", "poll"):
+        return
+    if cache_bus.mode == "notify" and engine.dialect.name != "postgresql":
+        return
+    listener = CacheInvalidationListener(cache_bus, engine, poll_interval=settings.CACHE_BUS_POLL_SECONDS)
+    listener.start()
+    _listeners.append(listener)
+
+def start_cache_listeners(shard_map):
+    """
+    Слушатель на каждый шард: NOTIFY общий для базы, а таблица cache_events своя в каждой схеме.
+    """
+    engines = shard_map.databases() if cache_bus.mode == "notify" else shard_map.engines()
+    for engine in engines:
+        start_cache_listener(engine)
+
+def stop_cache_listener():
+    for listener in _listeners:
+        listener.stop()
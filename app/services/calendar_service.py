@@ -0,0 +1,139 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.models import Booking as BookingModel, Court
+from app.core.config import settings
+from app.services.cache_bus import cache_bus
+from app.utils.timezone import UTC, utc_now
+from datetime import datetime
+from email.utils import format_datetime
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+import time
+
+YIELD_PER = 500
+PRODID = "-//Panoramic Tennis//Bookings//RU"
+
+FeedKey = Tuple[int, str, int]  # (club_id, "user", user_id) или (club_id, "court", court_id)
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _format_utc(value: datetime) -> str:
+    # Сессия базы в UTC, поэтому перевод пояса обычно не нужен; в календарь отдаём UTC, чтобы не описывать VTIMEZONE
+    return value.astimezone(UTC).strftime("%Y%m%dT%H%M%SZ")
+
+class CalendarFeedCache:
+    """
+    Готовые .ics в памяти процесса. Каждая лента имеет версию, которая растёт при изменении
+    брони этого пользователя или корта; ETag строится из id воркера и версии, поэтому
+    проверка If-None-Match не требует ни генерации, ни запроса к базе.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._feeds: Dict[FeedKey, dict] = {}
+        self._lock = Lock()
+
+    def _entry(self, key: FeedKey) -> dict:
+        entry = self._feeds.get(key)
+        now = time.monotonic()
+        if entry is None or now - entry["created_at"] >= self.ttl:
+            # Лента «до текущего момента» устаревает сама по себе, поэтому TTL тоже меняет версию
+            version = entry["version"] + 1 if entry else 1
+            entry = {"version": version, "created_at": now, "last_modified": utc_now(), "body": None}
+            with self._lock:
+                self._feeds[key] = entry
+        return entry
+
+    def get(self, key: FeedKey) -> Tuple[str, str, Optional[bytes]]:
+        """Возвращает (ETag, Last-Modified, готовое тело или None)."""
+        entry = self._entry(key)
+        etag = f'"{cache_bus.origin[:8]}-c{key[0]}-{key[1]}{key[2]}-{entry["version"]}"'
+        return etag, format_datetime(entry["last_modified"].replace(microsecond=0), usegmt=True), entry["body"]
+
+    def store(self, key: FeedKey, etag: str, body: bytes):
+        with self._lock:
+            entry = self._feeds.get(key)
+            # Пока лента генерировалась, её могли инвалидировать — тогда не кэшируем
+            if entry and etag.endswith(f'-{entry["version"]}"'):
+                entry["body"] = body
+
+    def invalidate(self, club_id: Optional[int] = None, kind: Optional[str] = None, object_id: Optional[int] = None):
+        with self._lock:
+            keys = [
+                key for key in self._feeds
+                if (club_id is None or key[0] == club_id) and (kind is None or (key[1], key[2]) == (kind, object_id))
+            ]
+            for item in keys:
+                entry = self._feeds.get(item)
+                if entry:
+                    entry.update(
+                        version=entry["version"] + 1,
+                        created_at=time.monotonic(),
+                        last_modified=utc_now(),
+                        body=None
+                    )
+
+feed_cache = CalendarFeedCache(ttl=settings.CALENDAR_CACHE_TTL)
+
+def _on_booking_changed(payload: Optional[dict]):
+    if not payload:
+        feed_cache.invalidate()
+        return
+    club_id = payload.get("club_id")
+    if payload.get("user_id") is None and payload.get("court_id") is None:
+        feed_cache.invalidate(club_id)
+    if payload.get("user_id") is not None:
+        feed_cache.invalidate(club_id, "user", payload["user_id"])
+    if payload.get("court_id") is not None:
+        feed_cache.invalidate(club_id, "court", payload["court_id"])
+
+cache_bus.subscribe("bookings", _on_booking_changed)
+
+def _calendar_lines(name: str, rows, with_court: bool) -> Iterator[str]:
+    stamp = utc_now().strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield f"PRODID:{PRODID}"
+    yield "CALSCALE:GREGORIAN"
+    yield "METHOD:PUBLISH"
+    yield f"X-WR-CALNAME:{_escape(name)}"
+    for booking_id, start_time, end_time, court_name in rows:
+        yield "BEGIN:VEVENT"
+        yield f"UID:booking-{booking_id}@panoramic-tennis"
+        yield f"DTSTAMP:{stamp}"
+        yield f"DTSTART:{_format_utc(start_time)}"
+        yield f"DTEND:{_format_utc(end_time)}"
+        yield f"SUMMARY:{_escape(f'Теннис: {court_name}' if with_court else 'Корт занят')}"
+        yield f"LOCATION:{_escape(court_name)}"
+        yield "END:VEVENT"
+    yield "END:VCALENDAR"
+
+def stream_feed(db: Session, key: FeedKey, etag: str) -> Iterator[bytes]:
+    """
+    Генерирует .ics потоком из одного диапазонного запроса (yield_per), попутно собирая
+    тело для кэша. Пользовательская лента совпадает с /bookings/my: активные брони, ещё не закончившиеся.
+    """
+    _, kind, object_id = key
+    now = utc_now()
+    query = (
+        select(BookingModel.id, BookingModel.start_time, BookingModel.end_time, Court.name)
+        .join(Court, Court.id == BookingModel.court_id)
+        .where(BookingModel.status == "active", BookingModel.end_time > now)
+        .order_by(BookingModel.start_time)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    if kind == "user":
+        query = query.where(BookingModel.user_id == object_id)
+        name = "Мои бронирования"
+    else:
+        query = query.where(BookingModel.court_id == object_id)
+        court_name = db.query(Court.name).filter(Court.id == object_id).scalar()
+        name = f"Корт {court_name}" if court_name else "Корт"
+
+    chunks = []
+    for line in _calendar_lines(name, db.execute(query), with_court=kind == "user"):
+        chunk = (line + "\r\n").encode()
+        chunks.append(chunk)
+        yield chunk
+    feed_cache.store(key, etag, b"".join(chunks))
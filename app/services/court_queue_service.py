@@ -0,0 +1,112 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.tenancy import current_club_id
+from app.services.cache_bus import cache_bus
+from contextlib import contextmanager
+from datetime import datetime
+from fastapi import HTTPException
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+# Пространство имён для pg_advisory_xact_lock(namespace, court_id); 31 занято удержаниями слотов
+BOOKING_LOCK_NAMESPACE = 32
+
+class _CourtState:
+    __slots__ = ("lock", "waiters", "booked")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.waiters = 0
+        self.booked: List[Tuple[datetime, datetime]] = []  # Брони, созданные этим воркером
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return any(s < end and e > start for s, e in self.booked)
+
+class CourtWriteQueue:
+    """
+    Сериализует создание броней по корту: в воркере одновременно пишет не больше одного
+    запроса на корт, остальные ждут в очереди, разные корты идут параллельно.
+    Брони, созданные этим воркером, запоминаются, поэтому при наплыве на один слот проигравшие
+    отклоняются в памяти, не дожидаясь очереди и не обращаясь к базе. Очередь — на (клуб, корт).
+    mode="advisory" дополнительно берёт pg_advisory_xact_lock на корт — очередь общая для всех воркеров.
+    """
+
+    def __init__(self, mode: str, max_waiters: int, timeout: float):
+        self.mode = mode
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+        self._courts: Dict[Tuple[int, int], _CourtState] = {}
+        self._lock = Lock()
+
+    def _state(self, db: Session, court_id: int) -> _CourtState:
+        key = (current_club_id(db), court_id)
+        state = self._courts.get(key)
+        if state is None:
+            with self._lock:
+                state = self._courts.setdefault(key, _CourtState())
+        return state
+
+    def check(self, db: Session, court_id: int, start: datetime, end: datetime):
+        """Быстрый отказ без очереди, если слот уже забронирован через этот воркер."""
+        if self.mode != "off" and self._state(db, court_id).overlaps(start, end):
+            raise ValueError("Выбранный слот уже занят")
+
+    @contextmanager
+    def writer(self, db: Session, court_id: int):
+        if self.mode == "off":
+            yield
+            return
+        state = self._state(db, court_id)
+        with self._lock:
+            if state.waiters >= self.max_waiters:
+                # Не даём одному корту занять весь threadpool
+                raise HTTPException(status_code=503, detail="Слишком много одновременных бронирований корта, попробуйте ещё раз")
+            state.waiters += 1
+        try:
+            if not state.lock.acquire(timeout=self.timeout):
+                raise HTTPException(status_code=503, detail="Слишком много одновременных бронирований корта, попробуйте ещё раз")
+        finally:
+            with self._lock:
+                state.waiters -= 1
+        advisory = self.mode == "advisory" and db.bind.dialect.name == "postgresql"
+        try:
+            if advisory:
+                # Снимается сам при commit/rollback транзакции бронирования
+                db.execute(select(func.pg_advisory_xact_lock(BOOKING_LOCK_NAMESPACE, court_id)))
+            yield
+        except Exception:
+            if advisory:
+                # Отказ не должен держать блокировку корта до закрытия сессии
+                db.rollback()
+            raise
+        finally:
+            state.lock.release()
+
+    def remember(self, db: Session, court_id: int, start: datetime, end: datetime, now: datetime):
+        """Вызывается после commit, пока очередь корта ещё удерживается."""
+        state = self._state(db, court_id)
+        state.booked = [(s, e) for s, e in state.booked if e > now] + [(start, end)]
+
+    def forget(self, club_id: Optional[int] = None, court_id: Optional[int] = None):
+        with self._lock:
+            states = [
+                state for (state_club, state_court), state in self._courts.items()
+                if (club_id is None or state_club == club_id) and (court_id is None or state_court == court_id)
+            ]
+        for state in states:
+            state.booked = []
+
+court_writers = CourtWriteQueue(
+    mode=settings.BOOKING_WRITE_LOCK,
+    max_waiters=settings.BOOKING_QUEUE_MAX_WAITERS,
+    timeout=settings.BOOKING_QUEUE_TIMEOUT
+)
+
+def _on_booking_changed(payload: Optional[dict]):
+    # Новая бронь слот не освобождает; удаление (или сброс шины) — освобождает
+    if payload and payload.get("action") == "created":
+        return
+    court_writers.forget((payload or {}).get("club_id"), (payload or {}).get("court_id"))
+
+cache_bus.subscribe("bookings", _on_booking_changed)
@@ -0,0 +1,180 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from app.db.models import Booking as BookingModel, SlotHold
+from app.core.config import settings
+from app.db.tenancy import current_club_id
+from collections import defaultdict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import uuid
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Пространство имён для pg_advisory_xact_lock(namespace, court_id)
+HOLD_LOCK_NAMESPACE = 31
+
+def _slot_is_booked(db: Session, court_id: int, start: datetime, end: datetime) -> bool:
+    return db.query(BookingModel.id).filter(
+        BookingModel.court_id == court_id,
+        BookingModel.status == "active",
+        BookingModel.start_time < end,
+        BookingModel.end_time > start
+    ).first() is not None
+
+def _conflict():
+    return HTTPException(status_code=409, detail="Slot is held by another user")
+
+def _check_own_hold(hold: Optional[dict], court_id: int, start: datetime, end: datetime, user_id: int):
+    if not hold or hold["user_id"] != user_id:
+        raise HTTPException(status_code=410, detail="Hold expired or not found")
+    if hold["court_id"] != court_id or start < hold["start_time"] or end > hold["end_time"]:
+        raise HTTPException(status_code=409, detail="Booking does not match the hold")
+
+class MemorySlotHoldStore:
+    """
+    Удержания слотов в памяти процесса: {(club_id, court_id): {hold_id: hold}}.
+    Конфликтующие удержания отклоняются под локом без обращения к базе.
+    Подходит для одного воркера; для нескольких используйте DatabaseSlotHoldStore.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._holds: Dict[Tuple[int, int], Dict[str, dict]] = defaultdict(dict)
+        self._lock = Lock()
+
+    def _live_holds(self, db: Session, court_id: int, now: datetime) -> Dict[str, dict]:
+        holds = self._holds[(current_club_id(db), court_id)]
+        for hold_id in [h for h, hold in holds.items() if hold["expires_at"] <= now]:
+            del holds[hold_id]
+        return holds
+
+    def _find_conflict(self, db: Session, court_id: int, start: datetime, end: datetime, user_id: int, now: datetime) -> Optional[dict]:
+        for hold in self._live_holds(db, court_id, now).values():
+            if hold["user_id"] != user_id and hold["start_time"] < end and hold["end_time"] > start:
+                return hold
+        return None
+
+    def acquire(self, db: Session, court_id: int, start: datetime, end: datetime, user_id: int) -> dict:
+        now = datetime.utcnow()
+        hold = {
+            "hold_id": uuid.uuid4().hex,
+            "court_id": court_id,
+            "user_id": user_id,
+            "start_time": start,
+            "end_time": end,
+            "expires_at": now + timedelta(seconds=self.ttl)
+        }
+        with self._lock:
+            if self._find_conflict(db, court_id, start, end, user_id, now):
+                raise _conflict()
+            self._live_holds(db, court_id, now)[hold["hold_id"]] = hold
+
+        # Проверка по базе только для победителя, проигравшие до неё не доходят
+        if _slot_is_booked(db, court_id, start, end):
+            self.release(db, hold["hold_id"])
+            raise HTTPException(status_code=409, detail="Выбранный слот уже занят")
+        return hold
+
+    def ensure_bookable(self, db: Session, court_id: int, start: datetime, end: datetime, user_id: int, hold_id: Optional[str] = None):
+        now = datetime.utcnow()
+        with self._lock:
+            if hold_id:
+                _check_own_hold(self._live_holds(db, court_id, now).get(hold_id), court_id, start, end, user_id)
+            if self._find_conflict(db, court_id, start, end, user_id, now):
+                raise _conflict()
+
+    def release(self, db: Session, hold_id: str, user_id: Optional[int] = None) -> bool:
+        club_id = current_club_id(db)
+        with self._lock:
+            for (hold_club, _), holds in self._holds.items():
+                hold = holds.get(hold_id) if hold_club == club_id else None
+                if hold and (user_id is None or hold["user_id"] == user_id):
+                    del holds[hold_id]
+                    return True
+        return False
+
+class DatabaseSlotHoldStore:
+    """
+    Удержания слотов в таблице slot_holds — общие для всех воркеров.
+    Захват сериализуется по корту через pg_advisory_xact_lock.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _as_dict(hold: SlotHold) -> dict:
+        return {
+            "hold_id": hold.id,
+            "court_id": hold.court_id,
+            "user_id": hold.user_id,
+            "start_time": hold.start_time,
+            "end_time": hold.end_time,
+            "expires_at": hold.expires_at
+        }
+
+    @staticmethod
+    def _lock_court(db: Session, court_id: int):
+        if db.bind.dialect.name == "postgresql":
+            db.execute(func.pg_advisory_xact_lock(HOLD_LOCK_NAMESPACE, court_id).select())
+
+    @staticmethod
+    def _find_conflict(db: Session, court_id: int, start: datetime, end: datetime, user_id: int, now: datetime) -> Optional[SlotHold]:
+        return db.query(SlotHold).filter(
+            SlotHold.court_id == court_id,
+            SlotHold.user_id != user_id,
+            SlotHold.expires_at > now,
+            SlotHold.start_time < end,
+            SlotHold.end_time > start
+        ).first()
+
+    def acquire(self, db: Session, court_id: int, start: datetime, end: datetime, user_id: int) -> dict:
+        now = datetime.utcnow()
+        try:
+            self._lock_court(db, court_id)
+            db.query(SlotHold).filter(SlotHold.court_id == court_id, SlotHold.expires_at <= now).delete(synchronize_session=False)
+            if self._find_conflict(db, court_id, start, end, user_id, now):
+                raise _conflict()
+            if _slot_is_booked(db, court_id, start, end):
+                raise HTTPException(status_code=409, detail="Выбранный слот уже занят")
+            hold = SlotHold(
+                id=uuid.uuid4().hex,
+                court_id=court_id,
+                user_id=user_id,
+                start_time=start,
+                end_time=end,
+                expires_at=now + timedelta(seconds=self.ttl)
+            )
+            db.add(hold)
+            db.commit()
+        except HTTPException:
+            db.rollback()
+            raise
+        return self._as_dict(hold)
+
+    def ensure_bookable(self, db: Session, court_id: int, start: datetime, end: datetime, user_id: int, hold_id: Optional[str] = None):
+        now = datetime.utcnow()
+        if hold_id:
+            hold = db.query(SlotHold).filter(SlotHold.id == hold_id, SlotHold.expires_at > now).first()
+            _check_own_hold(self._as_dict(hold) if hold else None, court_id, start, end, user_id)
+        if self._find_conflict(db, court_id, start, end, user_id, now):
+            raise _conflict()
+
+    def release(self, db: Session, hold_id: str, user_id: Optional[int] = None) -> bool:
+        query = db.query(SlotHold).filter(SlotHold.id == hold_id)
+        if user_id is not None:
+            query = query.filter(SlotHold.user_id == user_id)
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        return deleted > 0
+
+def _create_store():
+    if settings.SLOT_HOLD_BACKEND == "db":
+        return DatabaseSlotHoldStore(ttl=settings.SLOT_HOLD_TTL_SECONDS)
+    return MemorySlotHoldStore(ttl=settings.SLOT_HOLD_TTL_SECONDS)
+
+hold_store = _create_store()
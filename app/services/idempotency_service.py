@@ -0,0 +1,289 @@
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from app.db.models import IdempotencyKey
+from app.db.session import SessionLocal
+from app.core.config import settings
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import hashlib
+import json
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_SECONDS = 0.1
+
+def request_fingerprint(*parts: Any) -> str:
+    """Хэш параметров запроса: повтор ключа с другим телом отклоняется."""
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class MemoryIdempotencyStore:
+    """
+    Ограниченный TTL-кэш ответов в памяти процесса. Записи хранятся в порядке создания,
+    поэтому устаревшие и лишние вычищаются с начала OrderedDict.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = Lock()
+
+    def _purge(self, now: float):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["created_at"] < self.ttl and (
+                len(self._entries) <= self.max_entries or entry["status"] == "pending"
+            ):
+                # Выполняющиеся запросы не вытесняются: их ждут дубликаты
+                break
+            self._entries.popitem(last=False)
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[dict]]:
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry:
+                if entry["fingerprint"] != fingerprint:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key reused with different request")
+                return entry["status"], entry
+            entry = {
+                "fingerprint": fingerprint,
+                "status": "pending",
+                "status_code": None,
+                "body": None,
+                "created_at": now,
+                "event": Event()
+            }
+            self._entries[key] = entry
+            return "new", entry
+
+    def complete(self, key: str, claim: dict, status_code: int, body: Any):
+        with self._lock:
+            if self._entries.get(key) is claim:
+                claim.update(status="done", status_code=status_code, body=body)
+        claim["event"].set()
+
+    def abort(self, key: str, claim: dict):
+        with self._lock:
+            if self._entries.get(key) is claim:
+                del self._entries[key]
+        claim["status"] = "aborted"
+        claim["event"].set()
+
+    def wait(self, key: str, entry: dict, timeout: float) -> Optional[dict]:
+        if not entry["event"].wait(timeout):
+            return None
+        return entry
+
+class DatabaseIdempotencyStore:
+    """
+    Ответы в таблице idempotency_keys — общие для всех воркеров. Первый запрос вставляет
+    строку в статусе pending, дубликаты ждут её завершения опросом.
+    Работает в отдельной сессии, чтобы не зависеть от транзакции обработчика.
+
+    Строка pending старше pending_timeout считается брошенной (воркер упал посреди обработчика)
+    и перехватывается следующим запросом. Завершение сверяется с created_at своей строки,
+    поэтому опоздавший первый обработчик не перезапишет и не удалит перехваченную строку.
+    Устаревшие ключи удаляются не чаще раза в purge_interval попутно с begin.
+    """
+
+    def __init__(self, ttl: int, pending_timeout: int, purge_interval: int):
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._purge_lock = Lock()
+
+    def purge(self) -> int:
+        """Удаляет ключи старше TTL (индекс ix_idempotency_keys_created_at)."""
+        with SessionLocal() as db:
+            count = db.query(IdempotencyKey).filter(
+                IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=self.ttl)
+            ).delete(synchronize_session=False)
+            db.commit()
+        return count
+
+    def _purge_if_due(self):
+        now = time.monotonic()
+        with self._purge_lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        try:
+            purged = self.purge()
+        except Exception as e:
+            # Чистка не должна ронять запрос: попробуем в следующий раз
+            logger.error(f"Idempotency keys purge failed: {e}")
+            return
+        if purged:
+            logger.info(f"Purged {purged} expired idempotency keys")
+
+    @staticmethod
+    def _as_record(row: IdempotencyKey) -> dict:
+        return {
+            "fingerprint": row.fingerprint,
+            "status": row.status,
+            "status_code": row.status_code,
+            "body": json.loads(row.response_body) if row.response_body is not None else None
+        }
+
+    def begin(self, key: str, fingerprint: str) -> Tuple[str, Optional[dict]]:
+        self._purge_if_due()
+        with SessionLocal() as db:
+            now = datetime.utcnow()
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.created_at < now - timedelta(seconds=self.ttl),
+                    (IdempotencyKey.status == "pending") & (IdempotencyKey.created_at < now - timedelta(seconds=self.pending_timeout))
+                )
+            ).delete(synchronize_session=False)
+            db.add(IdempotencyKey(key=key, fingerprint=fingerprint, status="pending", created_at=now))
+            try:
+                db.commit()
+                return "new", {"created_at": now}
+            except IntegrityError:
+                db.rollback()
+            row = db.get(IdempotencyKey, key)
+            if row is None:
+                # Строку успели удалить (abort) — пусть вызывающий попробует ещё раз
+                return "aborted", None
+            if row.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key reused with different request")
+            return row.status, self._as_record(row)
+
+    @staticmethod
+    def _own_row(key: str, claim: dict):
+        return (
+            IdempotencyKey.key == key,
+            IdempotencyKey.status == "pending",
+            IdempotencyKey.created_at == claim["created_at"]
+        )
+
+    def complete(self, key: str, claim: dict, status_code: int, body: Any):
+        with SessionLocal() as db:
+            db.query(IdempotencyKey).filter(*self._own_row(key, claim)).update(
+                {"status": "done", "status_code": status_code, "response_body": json.dumps(body, ensure_ascii=False)},
+                synchronize_session=False
+            )
+            db.commit()
+
+    def abort(self, key: str, claim: dict):
+        with SessionLocal() as db:
+            db.query(IdempotencyKey).filter(*self._own_row(key, claim)).delete(synchronize_session=False)
+            db.commit()
+
+    def wait(self, key: str, entry: dict, timeout: float) -> Optional[dict]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            with SessionLocal() as db:
+                row = db.get(IdempotencyKey, key)
+                if row is None:
+                    return {"status": "aborted"}
+                if row.status == "done":
+                    return self._as_record(row)
+        return None
+
+class Idempotency:
+    """
+    Выполняет обработчик не более одного раза на Idempotency-Key.
+    Повтор возвращает сохранённый ответ, параллельный дубликат ждёт первый запрос.
+    Ошибки 4xx сохраняются как ответ, 5xx и прочие исключения освобождают ключ для повтора.
+    """
+
+    def __init__(self, store, wait_timeout: float):
+        self.store = store
+        self.wait_timeout = wait_timeout
+
+    @staticmethod
+    def _check_key(key: str):
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=422, detail="Idempotency-Key is too long")
+
+    @staticmethod
+    def _replay(record: dict):
+        if record["status_code"] >= 400:
+            raise HTTPException(status_code=record["status_code"], detail=record["body"].get("detail"))
+        return JSONResponse(
+            content=record["body"],
+            status_code=record["status_code"],
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    def _on_error(self, key: str, claim: dict, error: Exception):
+        if isinstance(error, HTTPException) and error.status_code < 500:
+            self.store.complete(key, claim, error.status_code, {"detail": jsonable_encoder(error.detail)})
+        else:
+            self.store.abort(key, claim)
+
+    def run(self, key: Optional[str], fingerprint: str, handler: Callable[[], Any]):
+        if not key:
+            return handler()
+        self._check_key(key)
+        for _ in range(2):
+            state, record = self.store.begin(key, fingerprint)
+            if state == "aborted":
+                continue
+            if state == "new":
+                try:
+                    result = handler()
+                except Exception as e:
+                    self._on_error(key, record, e)
+                    raise
+                self.store.complete(key, record, 200, jsonable_encoder(result))
+                return result
+            if state == "pending":
+                record = self.store.wait(key, record, self.wait_timeout)
+            if record is None:
+                break
+            if record["status"] == "done":
+                return self._replay(record)
+        raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is still in progress")
+
+    async def run_async(self, key: Optional[str], fingerprint: str, handler: Callable[[], Awaitable[Any]]):
+        if not key:
+            return await handler()
+        self._check_key(key)
+        for _ in range(2):
+            state, record = await run_in_threadpool(self.store.begin, key, fingerprint)
+            if state == "aborted":
+                continue
+            if state == "new":
+                try:
+                    result = await handler()
+                except Exception as e:
+                    await run_in_threadpool(self._on_error, key, record, e)
+                    raise
+                await run_in_threadpool(self.store.complete, key, record, 200, jsonable_encoder(result))
+                return result
+            if state == "pending":
+                record = await run_in_threadpool(self.store.wait, key, record, self.wait_timeout)
+            if record is None:
+                break
+            if record["status"] == "done":
+                return self._replay(record)
+        raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is still in progress")
+
+def _create_store():
+    if settings.IDEMPOTENCY_BACKEND == "db":
+        return DatabaseIdempotencyStore(
+            ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+            pending_timeout=settings.IDEMPOTENCY_PENDING_TIMEOUT,
+            purge_interval=settings.IDEMPOTENCY_PURGE_SECONDS
+        )
+    return MemoryIdempotencyStore(ttl=settings.IDEMPOTENCY_TTL_SECONDS, max_entries=settings.IDEMPOTENCY_MAX_ENTRIES)
+
+idempotency = Idempotency(_create_store(), wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS)
@@ -0,0 +1,189 @@
+from sqlalchemy import case, or_
+from sqlalchemy.orm import Session
+from app.db.models import Booking as BookingModel, Court, User
+from app.db.session import SessionLocal, shard_map
+from app.core.config import settings
+from app.utils.sms import send_text_batch
+from app.utils.timezone import utc_now, zone_for_club
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Напоминание, взятое воркером: (booking_id, телефон 7XXXXXXXXXX, текст)
+Reminder = Tuple[int, str, str]
+
+def reminder_text(court_name: str, start_time: datetime) -> str:
+    """start_time — в поясе клуба."""
+    return f"Напоминаем о бронировании корта {court_name} в {start_time:%H:%M} ({start_time:%d.%m}). PANORAMIC TENIS"
+
+def claim_due_reminders(db: Session, now: datetime, lead: timedelta, limit: int, retry_delay: timedelta) -> List[Reminder]:
+    """
+    Забирает пачку напоминаний, чьи брони начинаются в ближайшие lead.
+    FOR UPDATE SKIP LOCKED: строки, которые прямо сейчас забирает другой воркер, пропускаются,
+    а после commit взятые строки уже не попадают под условие reminder_status IS NULL.
+    Неудачная попытка повторяется не раньше чем через retry_delay.
+    """
+    rows = (
+        db.query(BookingModel.id, BookingModel.club_id, BookingModel.start_time, Court.name, User.phone_e164)
+        .join(Court, Court.id == BookingModel.court_id)
+        .join(User, User.id == BookingModel.user_id)
+        .filter(
+            BookingModel.status == "active",
+            BookingModel.reminder_status.is_(None),
+            BookingModel.start_time > now,
+            BookingModel.start_time <= now + lead,
+            or_(
+                BookingModel.reminder_claimed_at.is_(None),
+                BookingModel.reminder_claimed_at <= datetime.utcnow() - retry_delay
+            )
+        )
+        .order_by(BookingModel.start_time)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=BookingModel)
+        .all()
+    )
+    if rows:
+        db.query(BookingModel).filter(BookingModel.id.in_([row[0] for row in rows])).update(
+            {"reminder_status": "claimed", "reminder_claimed_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+    db.commit()
+    # Текст СМС — в местном времени клуба брони
+    return [
+        (booking_id, phone, reminder_text(court_name, start_time.astimezone(zone_for_club(club_id))))
+        for booking_id, club_id, start_time, court_name, phone in rows
+    ]
+
+def complete_reminders(db: Session, results: List[Tuple[int, Optional[bool]]], max_attempts: int):
+    """
+    Записывает итог отправки: True — отправлено, False — P1SMS точно не принял сообщение,
+    None — исход неизвестен (таймаут, 5xx). Точно неотправленные возвращаются в очередь, пока
+    не исчерпаны попытки; неизвестные не повторяются, чтобы не прислать два одинаковых СМС.
+    Условие reminder_status = 'claimed' не даёт перезаписать строку, которую уже списали по таймауту.
+    """
+    sent_ids = [booking_id for booking_id, sent in results if sent is True]
+    failed_ids = [booking_id for booking_id, sent in results if sent is False]
+    unknown_ids = [booking_id for booking_id, sent in results if sent is None]
+    claimed = BookingModel.reminder_status == "claimed"
+    if sent_ids:
+        db.query(BookingModel).filter(BookingModel.id.in_(sent_ids), claimed).update(
+            {"reminder_status": "sent", "reminder_sent_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+    if failed_ids:
+        db.query(BookingModel).filter(BookingModel.id.in_(failed_ids), claimed).update(
+            {
+                "reminder_status": case((BookingModel.reminder_attempts + 1 >= max_attempts, "failed"), else_=None),
+                "reminder_attempts": BookingModel.reminder_attempts + 1
+            },
+            synchronize_session=False
+        )
+    if unknown_ids:
+        db.query(BookingModel).filter(BookingModel.id.in_(unknown_ids), claimed).update(
+            {"reminder_status": "unknown", "reminder_attempts": BookingModel.reminder_attempts + 1},
+            synchronize_session=False
+        )
+    db.commit()
+
+def release_reminders(db: Session, booking_ids: List[int]):
+    """
+    Возвращает взятые напоминания в очередь без попытки: отправка не начиналась
+    (например, не настроен ключ P1SMS). Повтор — не раньше retry_delay от времени взятия.
+    """
+    db.query(BookingModel).filter(BookingModel.id.in_(booking_ids), BookingModel.reminder_status == "claimed").update(
+        {"reminder_status": None},
+        synchronize_session=False
+    )
+    db.commit()
+
+def expire_stale_claims(db: Session, timeout: timedelta) -> int:
+    """
+    Напоминания, взятые упавшим воркером. Было ли СМС отправлено, неизвестно,
+    поэтому повторно их не шлём: лучше без напоминания, чем два одинаковых.
+    """
+    count = db.query(BookingModel).filter(
+        BookingModel.reminder_status == "claimed",
+        BookingModel.reminder_claimed_at < datetime.utcnow() - timeout
+    ).update({"reminder_status": "unknown"}, synchronize_session=False)
+    db.commit()
+    return count
+
+class ReminderScanner(Thread):
+    """
+    Фоновый поток воркера: раз в interval разбирает подошедшие напоминания пачками по batch_size
+    и отправляет каждую пачку одним запросом к P1SMS. Несколько воркеров делят очередь через SKIP LOCKED.
+    Обходит все шарды; сессии без club_id видят брони всех клубов шарда.
+    """
+
+    def __init__(self, engines, interval: float, lead: timedelta, batch_size: int, max_attempts: int, claim_timeout: timedelta):
+        super().__init__(name="booking-reminders", daemon=True)
+        self.engines = engines
+        self.interval = interval
+        self.lead = lead
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+        self._stop_event = Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            for engine in self.engines:
+                try:
+                    self.scan(engine)
+                except Exception as e:
+                    logger.error(f"Reminder scan failed on {engine.url!r}: {e}")
+            self._stop_event.wait(self.interval)
+
+    def scan(self, engine) -> int:
+        total = 0
+        with SessionLocal(bind=engine) as db:
+            expired = expire_stale_claims(db, self.claim_timeout)
+            if expired:
+                logger.warning(f"{expired} reminders were claimed but never completed, marked as unknown")
+            while not self._stop_event.is_set():
+                now = utc_now()
+                reminders = claim_due_reminders(db, now, self.lead, self.batch_size, timedelta(seconds=self.interval))
+                if not reminders:
+                    break
+                try:
+                    results = asyncio.run(send_text_batch([(phone, text) for _, phone, text in reminders]))
+                except Exception:
+                    # send_text_batch не бросает после начала отправки: ошибки запросов — в results
+                    release_reminders(db, [booking_id for booking_id, _, _ in reminders])
+                    raise
+                complete_reminders(db, [(booking_id, sent) for (booking_id, _, _), (sent, _) in zip(reminders, results)], self.max_attempts)
+                sent = sum(1 for ok, _ in results if ok is True)
+                unknown = sum(1 for ok, _ in results if ok is None)
+                logger.info(f"Booking reminders: {sent} sent, {len(reminders) - sent - unknown} failed, {unknown} unknown")
+                total += len(reminders)
+                if len(reminders) < self.batch_size:
+                    break
+        return total
+
+_scanner: Optional[ReminderScanner] = None
+
+def start_reminder_scanner():
+    global _scanner
+    if not settings.REMINDERS_ENABLED:
+        return
+    _scanner = ReminderScanner(
+        shard_map.engines(),
+        interval=settings.REMINDER_SCAN_SECONDS,
+        lead=timedelta(minutes=settings.REMINDER_LEAD_MINUTES),
+        batch_size=settings.REMINDER_BATCH_SIZE,
+        max_attempts=settings.REMINDER_MAX_ATTEMPTS,
+        claim_timeout=timedelta(seconds=settings.REMINDER_CLAIM_TIMEOUT)
+    )
+    _scanner.start()
+
+def stop_reminder_scanner():
+    if _scanner:
+        _scanner.stop()
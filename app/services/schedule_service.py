@@ -0,0 +1,121 @@
+from sqlalchemy.orm import Session
+from app.db.models import Court, CourtSchedule
+from app.db.tenancy import current_club_id
+from app.core.config import settings
+from app.services.cache_bus import cache_bus
+from datetime import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import time as time_module
+
+DEFAULT_OPENS_AT = time(8, 0)
+DEFAULT_CLOSES_AT = time(23, 0)
+DEFAULT_SLOT_MINUTES = 60
+ALLOWED_SLOT_MINUTES = (15, 30, 60)
+MINUTES_IN_DAY = 24 * 60
+
+# Слот шаблона: (начало в минутах от полуночи, конец в минутах, "HH:MM", "HH:MM")
+Slot = Tuple[int, int, str, str]
+SlotTemplate = Tuple[Slot, ...]
+
+def time_to_minutes(value: time, is_end: bool = False) -> int:
+    minutes = value.hour * 60 + value.minute
+    # 00:00 в качестве времени закрытия — это конец суток
+    return MINUTES_IN_DAY if is_end and minutes == 0 else minutes
+
+def format_minutes(minutes: int) -> str:
+    return f"{(minutes // 60) % 24:02d}:{minutes % 60:02d}"
+
+def build_slot_template(opens_at: time, closes_at: time, slot_minutes: int) -> SlotTemplate:
+    start = time_to_minutes(opens_at)
+    end = time_to_minutes(closes_at, is_end=True)
+    slots = []
+    for slot_start in range(start, end, slot_minutes):
+        slot_end = min(slot_start + slot_minutes, end)
+        slots.append((slot_start, slot_end, format_minutes(slot_start), format_minutes(slot_end)))
+    return tuple(slots)
+
+DEFAULT_TEMPLATE = build_slot_template(DEFAULT_OPENS_AT, DEFAULT_CLOSES_AT, DEFAULT_SLOT_MINUTES)
+
+class SlotTemplateCache:
+    """
+    Кэш шаблонов слотов по (корт, день недели). Шаблон строится один раз из расписания корта
+    и переиспользуется между запросами; при промахе загружаются сразу все 7 дней корта.
+    Ключ — (клуб, корт): id кортов в разных шардах могут совпадать.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._templates: Dict[Tuple[int, int], Tuple[float, List[SlotTemplate]]] = {}
+        self._lock = Lock()
+
+    def invalidate(self, club_id: Optional[int] = None, court_id: Optional[int] = None):
+        with self._lock:
+            for key in [
+                key for key in self._templates
+                if (club_id is None or key[0] == club_id) and (court_id is None or key[1] == court_id)
+            ]:
+                del self._templates[key]
+
+    def _load(self, db: Session, court_id: int) -> List[SlotTemplate]:
+        week = [DEFAULT_TEMPLATE] * 7
+        rows = db.query(CourtSchedule).filter(CourtSchedule.court_id == court_id).all()
+        for row in rows:
+            week[row.weekday] = build_slot_template(row.opens_at, row.closes_at, row.slot_minutes)
+        return week
+
+    def warm(self, db: Session, court_ids: List[int]):
+        """Загружает шаблоны всех отсутствующих в кэше кортов одним запросом."""
+        now = time_module.monotonic()
+        club_id = current_club_id(db)
+        missing = [
+            court_id for court_id in court_ids
+            if (club_id, court_id) not in self._templates or now - self._templates[(club_id, court_id)][0] >= self.ttl
+        ]
+        if not missing:
+            return
+        weeks = {court_id: [DEFAULT_TEMPLATE] * 7 for court_id in missing}
+        rows = db.query(CourtSchedule).filter(CourtSchedule.court_id.in_(missing)).all()
+        for row in rows:
+            weeks[row.court_id][row.weekday] = build_slot_template(row.opens_at, row.closes_at, row.slot_minutes)
+        with self._lock:
+            for court_id, week in weeks.items():
+                self._templates[(club_id, court_id)] = (now, week)
+
+    def get(self, db: Session, court_id: int, weekday: int) -> SlotTemplate:
+        key = (current_club_id(db), court_id)
+        entry = self._templates.get(key)
+        now = time_module.monotonic()
+        if entry is None or now - entry[0] >= self.ttl:
+            week = self._load(db, court_id)
+            with self._lock:
+                self._templates[key] = (now, week)
+            return week[weekday]
+        return entry[1][weekday]
+
+slot_templates = SlotTemplateCache(ttl=settings.SLOT_TEMPLATE_TTL)
+cache_bus.subscribe(
+    "courts",
+    lambda payload: slot_templates.invalidate((payload or {}).get("club_id"), (payload or {}).get("court_id"))
+)
+
+def get_court_schedule(db: Session, court_id: int) -> List[CourtSchedule]:
+    # join с courts ограничивает расписание кортами своего клуба
+    return (
+        db.query(CourtSchedule)
+        .join(Court, Court.id == CourtSchedule.court_id)
+        .filter(CourtSchedule.court_id == court_id)
+        .order_by(CourtSchedule.weekday)
+        .all()
+    )
+
+def set_court_schedule(db: Session, court_id: int, days: List[dict]) -> List[CourtSchedule]:
+    """
+    Полностью заменяет расписание корта. Дни, которых нет в days, работают по умолчанию.
+    """
+    db.query(CourtSchedule).filter(CourtSchedule.court_id == court_id).delete(synchronize_session=False)
+    db.add_all([CourtSchedule(court_id=court_id, **day) for day in days])
+    # Кэш шаблонов сбрасывается после commit в этом воркере и через шину — в остальных
+    cache_bus.publish(db, "courts", court_id=court_id)
+    db.commit()
+    return get_court_schedule(db, court_id)
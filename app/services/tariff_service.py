@@ -0,0 +1,165 @@
+from sqlalchemy.orm import Session
+from app.db.models import Tariff, Holiday
+from app.db.tenancy import current_club_id
+from app.core.config import settings
+from app.services.cache_bus import cache_bus
+from app.services.schedule_service import time_to_minutes, MINUTES_IN_DAY
+from array import array
+from collections import defaultdict
+from datetime import date, datetime
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import time as time_module
+
+DayKey = Tuple[Optional[int], str]  # (корт или None для тарифа по умолчанию, тип дня)
+
+class DayPrices:
+    """
+    Цены одного типа дня в виде префиксных сумм по минутам: стоимость любого интервала —
+    разность двух элементов массива, без перебора полос. Непокрытые тарифом минуты
+    считаются отдельным префиксным счётчиком, чтобы отличать бесплатное время от неизвестного.
+    """
+
+    __slots__ = ("_cost", "_gaps")
+
+    def __init__(self, bands: Iterable[Tuple[int, int, int]]):
+        per_minute = [None] * MINUTES_IN_DAY
+        # Полосы применяются по возрастанию начала: при пересечении действует более поздняя
+        for start, end, price_per_hour in sorted(bands):
+            per_minute[start:end] = [price_per_hour] * (end - start)
+        cost = array("q", [0]) * (MINUTES_IN_DAY + 1)
+        gaps = array("l", [0]) * (MINUTES_IN_DAY + 1)
+        for minute, price in enumerate(per_minute):
+            cost[minute + 1] = cost[minute] + (price or 0)
+            gaps[minute + 1] = gaps[minute] + (price is None)
+        self._cost = cost
+        self._gaps = gaps
+
+    def price(self, start_minute: int, end_minute: int) -> Optional[int]:
+        """Стоимость [start, end) в минутах от полуночи; None, если часть интервала без тарифа."""
+        if self._gaps[end_minute] - self._gaps[start_minute]:
+            return None
+        # В массиве сумма «цен за час» по минутам — переводим в цену с округлением
+        return (self._cost[end_minute] - self._cost[start_minute] + 30) // 60
+
+class TariffTable:
+    """Скомпилированные тарифы всех кортов и список праздников."""
+
+    def __init__(self, rows: List[Tariff], holidays: Iterable[date]):
+        bands: Dict[DayKey, list] = defaultdict(list)
+        for row in rows:
+            bands[(row.court_id, row.day_type)].append(
+                (time_to_minutes(row.starts_at), time_to_minutes(row.ends_at, is_end=True), row.price_per_hour)
+            )
+        self.days: Dict[DayKey, DayPrices] = {key: DayPrices(items) for key, items in bands.items()}
+        self.holidays = frozenset(holidays)
+
+    def for_day(self, court_id: int, day: date) -> Optional[DayPrices]:
+        """
+        Тариф корта на дату. Праздник берёт полосы "holiday", а если их нет — выходные;
+        тариф корта важнее тарифа по умолчанию.
+        """
+        if day in self.holidays:
+            day_types = ("holiday", "weekend")
+        else:
+            day_types = ("weekend",) if day.weekday() >= 5 else ("weekday",)
+        for day_type in day_types:
+            prices = self.days.get((court_id, day_type)) or self.days.get((None, day_type))
+            if prices is not None:
+                return prices
+        return None
+
+    def price(self, court_id: int, start: datetime, end: datetime) -> Optional[int]:
+        prices = self.for_day(court_id, start.date())
+        if prices is None:
+            return None
+        start_minute = start.hour * 60 + start.minute
+        end_minute = MINUTES_IN_DAY if end.date() > start.date() else end.hour * 60 + end.minute
+        return prices.price(start_minute, end_minute)
+
+class TariffEngine:
+    """
+    Таблицы тарифов в памяти процесса, по одной на клуб: грузятся целиком двумя запросами
+    и компилируются в префиксные суммы, после чего расчёт цены не обращается к базе.
+    Сбрасываются через шину кэшей при изменении тарифов и праздников.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._tables: Dict[int, Tuple[float, TariffTable]] = {}
+        self._lock = Lock()
+
+    def invalidate(self, payload: Optional[dict] = None):
+        club_id = (payload or {}).get("club_id")
+        with self._lock:
+            if club_id is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(club_id, None)
+
+    def table(self, db: Session) -> TariffTable:
+        club_id = current_club_id(db)
+        entry = self._tables.get(club_id)
+        now = time_module.monotonic()
+        if entry is None or now - entry[0] >= self.ttl:
+            table = TariffTable(
+                db.query(Tariff).all(),
+                [day for (day,) in db.query(Holiday.date).all()]
+            )
+            with self._lock:
+                self._tables[club_id] = (now, table)
+            return table
+        return entry[1]
+
+    def price(self, db: Session, court_id: int, start: datetime, end: datetime) -> Optional[int]:
+        return self.table(db).price(court_id, start, end)
+
+    def price_many(self, db: Session, items: Iterable[Tuple[int, datetime, datetime]]) -> List[Optional[int]]:
+        """Цены для пачки интервалов (court_id, start, end) по одной таблице."""
+        table = self.table(db)
+        return [table.price(court_id, start, end) for court_id, start, end in items]
+
+tariff_engine = TariffEngine(ttl=settings.TARIFF_CACHE_TTL)
+cache_bus.subscribe("tariffs", tariff_engine.invalidate)
+
+def get_tariffs(db: Session, court_id: Optional[int] = None) -> List[Tariff]:
+    query = db.query(Tariff)
+    query = query.filter(Tariff.court_id.is_(None) if court_id is None else Tariff.court_id == court_id)
+    return query.order_by(Tariff.day_type, Tariff.starts_at).all()
+
+def _check_overlaps(bands: List[dict]):
+    by_day_type = defaultdict(list)
+    for band in bands:
+        by_day_type[band["day_type"]].append(
+            (time_to_minutes(band["starts_at"]), time_to_minutes(band["ends_at"], is_end=True))
+        )
+    for day_type, intervals in by_day_type.items():
+        intervals.sort()
+        for (_, prev_end), (start, _) in zip(intervals, intervals[1:]):
+            if start < prev_end:
+                raise ValueError(f"Полосы тарифа {day_type} пересекаются")
+
+def set_tariffs(db: Session, court_id: Optional[int], bands: List[dict]) -> List[Tariff]:
+    """
+    Полностью заменяет тариф корта (или тариф по умолчанию при court_id=None).
+    Типы дней, которых нет в bands, берутся из тарифа по умолчанию.
+    """
+    _check_overlaps(bands)
+    query = db.query(Tariff)
+    query = query.filter(Tariff.court_id.is_(None) if court_id is None else Tariff.court_id == court_id)
+    query.delete(synchronize_session=False)
+    db.add_all([Tariff(court_id=court_id, **band) for band in bands])
+    cache_bus.publish(db, "tariffs")
+    db.commit()
+    return get_tariffs(db, court_id)
+
+def get_holidays(db: Session) -> List[Holiday]:
+    return db.query(Holiday).order_by(Holiday.date).all()
+
+def set_holidays(db: Session, holidays: List[dict]) -> List[Holiday]:
+    # Удаление и вставка — только праздники клуба сессии (Holiday в TENANT_MODELS)
+    db.query(Holiday).delete(synchronize_session=False)
+    db.add_all([Holiday(**holiday) for holiday in holidays])
+    cache_bus.publish(db, "tariffs")
+    db.commit()
+    return get_holidays(db)
@@ -0,0 +1,135 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal_column
+from app.db.models import User
+from app.db.tenancy import current_club_id
+from app.core.config import settings
+from app.services.cache_bus import cache_bus
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_MAX_LIMIT = 50
+
+# Выражения совпадают с индексами из миграции 3f1b7c2e9d40, иначе планировщик их не использует
+full_name_expr = func.lower(User.first_name + literal_column("' '") + User.last_name)
+email_expr = func.lower(User.email)
+
+SLIM_COLUMNS = (User.id, User.first_name, User.last_name, User.phone, User.email)
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _is_phone_query(term: str) -> bool:
+    return any(c.isdigit() for c in term) and all(c.isdigit() or c in "+()- " for c in term)
+
+def _slim(row) -> dict:
+    return {"id": row.id, "first_name": row.first_name, "last_name": row.last_name, "phone": row.phone, "email": row.email}
+
+class UserPrefixIndex:
+    """
+    Отсортированный список (ключ, id) в памяти процесса для typeahead, свой на каждый клуб.
+    Ключи: имя, фамилия, "имя фамилия", email и phone_e164 (с 7 и без неё).
+    Префиксный поиск — бинарный поиск по списку, без обращения к базе.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        # club_id -> (время сборки, ключи, строки)
+        self._indexes: Dict[int, Tuple[float, List[Tuple[str, int]], Dict[int, dict]]] = {}
+        self._lock = Lock()
+
+    def invalidate(self, club_id: Optional[int] = None):
+        if club_id is None:
+            self._indexes = {}
+        else:
+            self._indexes.pop(club_id, None)
+
+    def _fresh(self, club_id: int):
+        index = self._indexes.get(club_id)
+        if index is not None and time.monotonic() - index[0] < self.ttl:
+            return index
+        return None
+
+    def _build(self, db: Session, club_id: int):
+        rows = db.query(*SLIM_COLUMNS, User.phone_e164).filter(User.is_active.is_(True)).all()
+        keys = []
+        row_map = {}
+        for row in rows:
+            row_map[row.id] = _slim(row)
+            first, last = row.first_name.strip().lower(), row.last_name.strip().lower()
+            digits = row.phone_e164
+            for key in (first, last, f"{first} {last}", row.email.lower(), digits, digits[1:]):
+                if key:
+                    keys.append((key, row.id))
+        keys.sort()
+        index = (time.monotonic(), keys, row_map)
+        self._indexes[club_id] = index
+        logger.info(f"User prefix index rebuilt for club {club_id}: {len(row_map)} users, {len(keys)} keys")
+        return index
+
+    def search(self, db: Session, prefix: str, limit: int) -> List[dict]:
+        club_id = current_club_id(db)
+        index = self._fresh(club_id)
+        if index is None:
+            with self._lock:
+                index = self._fresh(club_id) or self._build(db, club_id)
+        _, keys, rows = index
+        found: List[int] = []
+        pos = bisect_left(keys, (prefix, -1))
+        while pos < len(keys) and len(found) < limit:
+            key, user_id = keys[pos]
+            if not key.startswith(prefix):
+                break
+            if user_id not in found:
+                found.append(user_id)
+            pos += 1
+        return [rows[user_id] for user_id in found]
+
+user_prefix_index = UserPrefixIndex(ttl=settings.USER_SEARCH_INDEX_TTL)
+# Индекс клуба пересобирается после любых изменений его пользователей, в том числе в других воркерах
+cache_bus.subscribe("users", lambda payload: user_prefix_index.invalidate((payload or {}).get("club_id")))
+
+def search_users(db: Session, q: str, limit: int = 20) -> List[dict]:
+    """
+    Поиск пользователей для админского UI: префикс и нечёткое совпадение по имени,
+    цифрам телефона и email. Возвращает только лёгкие колонки, не более limit строк.
+    """
+    term = " ".join(q.strip().lower().split())
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    if not term:
+        return []
+
+    if _is_phone_query(term):
+        term = "".join(filter(str.isdigit, term))
+        if term.startswith("8"):
+            term = "7" + term[1:]
+
+    if settings.USER_SEARCH_PREFIX_INDEX:
+        rows = user_prefix_index.search(db, term, limit)
+        if rows:
+            return rows
+
+    pattern = _escape_like(term)
+    query = db.query(*SLIM_COLUMNS).filter(User.is_active.is_(True))
+    if term.isdigit():
+        query = query.filter(User.phone_e164.like(f"%{pattern}%")).order_by(
+            case((User.phone_e164.like(f"{pattern}%"), 0), (User.phone_e164.like(f"7{pattern}%"), 0), else_=1),
+            User.id,
+        )
+    else:
+        # Оператор % из pg_trgm ловит опечатки, LIKE — подстроки; оба идут через GIN-индексы
+        query = query.filter(
+            full_name_expr.like(f"%{pattern}%")
+            | email_expr.like(f"{pattern}%")
+            | full_name_expr.op("%")(term)
+        ).order_by(
+            case((full_name_expr.like(f"{pattern}%"), 0), (email_expr.like(f"{pattern}%"), 0), else_=1),
+            func.similarity(full_name_expr, term).desc(),
+            User.id,
+        )
+    return [_slim(row) for row in query.limit(limit).all()]
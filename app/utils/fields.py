@@ -0,0 +1,52 @@
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import load_only
+from typing import Callable, Iterable, List, Optional, Type
+
+FIELDS_DESCRIPTION = "Поля ответа через запятую, например id,start_time,end_time; по умолчанию — все"
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Разбирает ?fields=a,b по полям схемы ответа: неизвестное поле — 400.
+    None — параметр не передан, отдаётся полный объект.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.__fields__)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {', '.join(sorted(unknown))}. Доступны: {', '.join(schema.__fields__)}"
+        )
+    if not requested:
+        raise HTTPException(status_code=400, detail="fields не может быть пустым")
+    # Порядок полей — как в схеме, чтобы ответ не зависел от порядка в запросе
+    return [name for name in schema.__fields__ if name in requested]
+
+def load_columns(model, fields: Iterable[str], *required):
+    """
+    load_only по запрошенным полям, которые являются колонками модели (вычисляемые поля
+    схемы пропускаются). required — колонки, нужные самому эндпоинту помимо ответа.
+    Первичный ключ грузится всегда: без него identity map не работает, а при запросе
+    одних вычисляемых полей load_only остался бы без аргументов.
+    """
+    columns = model.__table__.columns
+    primary_key = [column.key for column in model.__table__.primary_key]
+    names = dict.fromkeys([*primary_key, *fields, *required])
+    return load_only(*(getattr(model, name) for name in names if name in columns))
+
+def sparse_response(objects, fields: List[str], extra: Optional[Callable[[object], dict]] = None) -> JSONResponse:
+    """
+    Ответ только с запрошенными полями. Собирается напрямую из загруженных атрибутов,
+    минуя response_model: полная схема потребовала бы незапрошенные поля и догрузила бы их из базы.
+    objects — объект или список; extra(obj) возвращает вычисляемые поля.
+    """
+    def pick(obj) -> dict:
+        computed = extra(obj) if extra else {}
+        return {name: computed[name] if name in computed else getattr(obj, name) for name in fields}
+
+    content = [pick(obj) for obj in objects] if isinstance(objects, list) else pick(objects)
+    return JSONResponse(jsonable_encoder(content))
@@ -0,0 +1,20 @@
+from fastapi import HTTPException
+
+def is_normalized_phone(phone: str) -> bool:
+    return len(phone) == 11 and phone.isdigit() and phone.startswith('7')
+
+def normalize_phone(phone: str) -> str:
+    """
+    Приводит номер телефона к каноническому виду E.164 без плюса: 7XXXXXXXXXX.
+    :param phone: Номер телефона в любом формате (+7(XXX)XXX-XX-XX, 8XXXXXXXXXX и т.д.)
+    :return: 11 цифр, начиная с 7
+    """
+    if is_normalized_phone(phone):
+        return phone
+    # Удаляем все нечисловые символы из номера телефона
+    clean_phone = ''.join(filter(str.isdigit, phone))
+    if clean_phone.startswith('8'):
+        clean_phone = '7' + clean_phone[1:]
+    if not is_normalized_phone(clean_phone):
+        raise HTTPException(status_code=400, detail="Invalid phone number format")
+    return clean_phone
@@ -0,0 +1,246 @@
+from sqlalchemy import event
+from fastapi.concurrency import run_in_threadpool
+from app.core.security import decode_access_token
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+from threading import Event, Lock, Thread, get_ident
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import random
+import sys
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+MAX_STACK_DEPTH = 128
+SQL_FRAME_LENGTH = 120
+
+# Профиль текущего запроса; None — запрос не профилируется
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+FrameKey = Tuple[str, str, int]
+
+class RequestProfile:
+    """
+    Семплы стеков одного запроса плюс время SQL по каждому запросу.
+    Потоки попадают в профиль сами: поток event loop — при старте, потоки threadpool —
+    при первом SQL-запросе из контекста профилируемого запроса.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.threads = {get_ident()}
+        self.samples: Dict[int, List[Tuple[Tuple[FrameKey, ...], float]]] = defaultdict(list)
+        self.sql: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # sql -> [count, seconds]
+        self.sql_in_flight: Dict[int, Tuple[str, float]] = {}
+        self._lock = Lock()
+
+    def sql_started(self, statement: str):
+        thread_id = get_ident()
+        self.threads.add(thread_id)
+        self.sql_in_flight[thread_id] = (statement, time.perf_counter())
+
+    def sql_finished(self):
+        entry = self.sql_in_flight.pop(get_ident(), None)
+        if entry:
+            statement, started = entry
+            with self._lock:
+                stats = self.sql[statement]
+                stats[0] += 1
+                stats[1] += time.perf_counter() - started
+
+class _Sampler(Thread):
+    def __init__(self, profile: RequestProfile, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stop_event = Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight = now - last
+            last = now
+            frames = sys._current_frames()
+            for thread_id in list(self.profile.threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _extract_stack(frame)
+                in_flight = self.profile.sql_in_flight.get(thread_id)
+                if in_flight:
+                    # Синтетический кадр: время ожидания базы видно прямо на flame graph
+                    stack += ((f"[SQL] {in_flight[0][:SQL_FRAME_LENGTH]}", "<database>", 0),)
+                self.profile.samples[thread_id].append((stack, weight))
+
+def _extract_stack(frame) -> Tuple[FrameKey, ...]:
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.sql_started(statement)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.sql_finished()
+
+def _handle_error(exception_context):
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.sql_finished()
+
+def install_sql_timing(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+def to_speedscope(profile: RequestProfile) -> dict:
+    """Формат https://www.speedscope.app/file-format-schema.json: по профилю на поток."""
+    frame_index: Dict[FrameKey, int] = {}
+    frames = []
+    profiles = []
+    for thread_id, samples in profile.samples.items():
+        stacks, weights = [], []
+        for stack, weight in samples:
+            indexes = []
+            for key in stack:
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                indexes.append(frame_index[key])
+            stacks.append(indexes)
+            weights.append(round(weight * 1000, 3))
+        profiles.append({
+            "type": "sampled",
+            "name": f"{profile.name} (thread {thread_id})",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 3),
+            "samples": stacks,
+            "weights": weights
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": profile.name,
+        "exporter": "tennis-project-backend"
+    }
+
+def sql_breakdown(profile: RequestProfile, total_seconds: float) -> dict:
+    statements = sorted(
+        ({"sql": sql, "count": int(count), "total_ms": round(seconds * 1000, 3)} for sql, (count, seconds) in profile.sql.items()),
+        key=lambda item: item["total_ms"],
+        reverse=True
+    )
+    return {
+        "name": profile.name,
+        "total_ms": round(total_seconds * 1000, 3),
+        "sql_ms": round(sum(item["total_ms"] for item in statements), 3),
+        "sql_count": sum(item["count"] for item in statements),
+        "statements": statements
+    }
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware семплирующего профилировщика. Подключается только при PROFILING_ENABLED,
+    иначе не стоит ничего. Запрос профилируется, если пришёл заголовок X-Profile от администратора
+    или выпал случайный семпл с вероятностью sample_rate. Результат — <id>.speedscope.json
+    и <id>.sql.json в output_dir, хранятся последние max_files профилей.
+    """
+
+    def __init__(self, app, output_dir: str, sample_rate: float = 0.0, interval: float = 0.005, max_files: int = 50):
+        self.app = app
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_files = max_files
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}{scope['path'].replace('/', '_')}"
+        profile = RequestProfile(f"{scope['method']} {scope['path']}")
+        token = _active_profile.set(profile)
+        sampler = _Sampler(profile, self.interval)
+        sampler.start()
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-profile-id", profile_id.encode()))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            total_seconds = time.perf_counter() - profile.started_at
+            sampler.stop()
+            _active_profile.reset(token)
+            await run_in_threadpool(self._write, profile_id, profile, total_seconds)
+
+    async def _should_profile(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        headers = dict(scope.get("headers") or [])
+        if PROFILE_HEADER not in headers:
+            return False
+        authorization = headers.get(b"authorization", b"").decode()
+        if not authorization.lower().startswith("bearer "):
+            return False
+        return await run_in_threadpool(_is_admin_token, authorization[7:])
+
+    def _write(self, profile_id: str, profile: RequestProfile, total_seconds: float):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, profile_id)
+            with open(f"{base}.speedscope.json", "w") as f:
+                json.dump(to_speedscope(profile), f)
+            with open(f"{base}.sql.json", "w") as f:
+                json.dump(sql_breakdown(profile, total_seconds), f, ensure_ascii=False, indent=2)
+            logger.info(f"Profile written: {base}.speedscope.json ({total_seconds * 1000:.1f} ms)")
+            self._rotate()
+        except OSError as e:
+            logger.error(f"Failed to write profile {profile_id}: {e}")
+
+    def _rotate(self):
+        profiles = sorted(name for name in os.listdir(self.output_dir) if name.endswith(".speedscope.json"))
+        for name in profiles[:max(0, len(profiles) - self.max_files)]:
+            base = name[:-len(".speedscope.json")]
+            for suffix in (".speedscope.json", ".sql.json"):
+                path = os.path.join(self.output_dir, base + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+def _is_admin_token(token: str) -> bool:
+    from app.core.config import settings
+    from app.db.session import session_for_club
+    from app.db.models import User
+
+    payload = decode_access_token(token)
+    # Как в get_current_user: токены с scope (ссылки на календарь) не дают прав администратора
+    if not payload or "scope" in payload or not payload.get("sub"):
+        return False
+    with session_for_club(int(payload.get("club", settings.DEFAULT_CLUB_ID))) as db:
+        role = db.query(User.role).filter(User.id == int(payload["sub"])).scalar()
+    return role == "admin"
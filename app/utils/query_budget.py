@@ -0,0 +1,103 @@
+from sqlalchemy import event
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Список SQL текущего запроса; None — подсчёт выключен
+_current_queries: ContextVar[Optional[List[str]]] = ContextVar("current_queries", default=None)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    queries = _current_queries.get()
+    if queries is not None:
+        queries.append(statement)
+
+def install_query_counter(engine):
+    """Подключает подсчёт SQL-запросов к engine. Повторный вызов ничего не делает."""
+    if not event.contains(engine, "before_cursor_execute", _record_statement):
+        event.listen(engine, "before_cursor_execute", _record_statement)
+
+def query_budget(max_queries: int):
+    """
+    Объявляет бюджет SQL-запросов для эндпоинта. Ставится под декоратором роутера:
+
+        @router.get("/availability")
+        @query_budget(3)
+        def get_availability(...): ...
+    """
+    def decorator(func):
+        func.__query_budget__ = max_queries
+        return func
+    return decorator
+
+def format_budget_error(label: str, budget: int, queries: List[str]) -> str:
+    statements = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(queries))
+    return f"{label}: {len(queries)} SQL queries, budget is {budget}:\n{statements}"
+
+@contextmanager
+def count_queries(engine=None):
+    """
+    Считает SQL-запросы внутри блока (включая эндпоинты, выполняемые в threadpool):
+
+        with count_queries() as queries:
+            client.get("/api/bookings/my")
+        assert len(queries) <= 2
+    """
+    if engine is None:
+        from app.db.session import engine
+    install_query_counter(engine)
+    queries: List[str] = []
+    token = _current_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _current_queries.reset(token)
+
+@contextmanager
+def assert_max_queries(budget: int, label: str = "block", engine=None):
+    """Падает с QueryBudgetExceeded и списком SQL, если блок выполнил больше budget запросов."""
+    with count_queries(engine) as queries:
+        yield queries
+    if len(queries) > budget:
+        raise QueryBudgetExceeded(format_budget_error(label, budget, queries))
+
+class QueryBudgetMiddleware:
+    """
+    ASGI-middleware для dev-режима: считает запросы к базе на каждый HTTP-запрос и сверяет
+    с бюджетом эндпоинта из @query_budget. mode="warn" пишет предупреждение с SQL,
+    mode="raise" бросает QueryBudgetExceeded (в тестах это роняет тест).
+    """
+
+    def __init__(self, app, mode: str = "warn"):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        outer = _current_queries.get()
+        queries: List[str] = []
+        token = _current_queries.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_queries.reset(token)
+            # Внешний count_queries() в тесте тоже должен увидеть эти запросы
+            if outer is not None:
+                outer.extend(queries)
+
+        # Роутер Starlette кладёт найденный эндпоинт в scope
+        budget = getattr(scope.get("endpoint"), "__query_budget__", None)
+        if budget is None or len(queries) <= budget:
+            return
+        message = format_budget_error(f"{scope['method']} {scope['path']}", budget, queries)
+        if self.mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
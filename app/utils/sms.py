@@ -1,5 +1,7 @@
 import httpx
+from app.utils.phone import normalize_phone
 from fastapi import HTTPException
+from typing import List, Optional, Tuple
 import os
 import logging
 
@@ -9,69 +11,135 @@ logger = logging.getLogger(__name__)
 P1SMS_API_URL = "https://admin.p1sms.ru/apiSms/create"
 P1SMS_API_KEY = os.getenv("SMS_P1SMS_API_KEY")
 P1SMS_SENDER = os.getenv("P1SMS_SENDER", "PANORAMIC")  # Имя отправителя
+P1SMS_BATCH_SIZE = int(os.getenv("P1SMS_BATCH_SIZE", "100"))  # Максимум сообщений в одном запросе
 
-async def send_sms(phone: str, code: str):
+class SmsOutcomeUnknown(HTTPException):
     """
-    Отправляет СМС с кодом верификации через P1SMS, используя шаблон.
-    :param phone: Номер телефона в формате +7XXXXXXXXXX или 7XXXXXXXXXX
-    :param code: Код верификации (например, '6807')
-    :return: Ответ от P1SMS в формате JSON
+    Запрос мог дойти до P1SMS, но подтверждения нет: таймаут чтения, обрыв соединения, 5xx.
+    Повтор такой отправки может доставить СМС дважды.
     """
-    if not P1SMS_API_KEY:
-        raise HTTPException(status_code=500, detail="P1SMS API key not configured")
 
-    # Удаляем все нечисловые символы из номера телефона
-    clean_phone = ''.join(filter(str.isdigit, phone))
-    if clean_phone.startswith('8'):
-        clean_phone = '7' + clean_phone[1:]
-    if len(clean_phone) != 11 or not clean_phone.startswith('7'):
-        raise HTTPException(status_code=400, detail="Invalid phone number format")
+    def __init__(self, detail: str):
+        super().__init__(status_code=500, detail=detail)
 
-    # Формируем текст сообщения, соответствующий шаблону
-    message_text = f"Ваш код верификации из приложения PANORAMIC TENIS: {code}"
+def _verification_text(code: str) -> str:
+    # Текст сообщения, соответствующий шаблону
+    return f"Ваш код верификации из приложения PANORAMIC TENIS: {code}"
 
-    # Формируем тело запроса
-    sms_item = {
+def _build_sms_item(clean_phone: str, text: str) -> dict:
+    return {
         "channel": "char",  # Буквенный канал
         "phone": clean_phone,
         "sender": P1SMS_SENDER,  # Отправитель PANORAMIC
-        "text": message_text  # Текст, соответствующий шаблону
+        "text": text
     }
 
+async def _post_sms(client: httpx.AsyncClient, sms_items: List[dict]) -> dict:
     payload = {
         "apiKey": P1SMS_API_KEY,
-        "sms": [sms_item]
+        "sms": sms_items
     }
 
-    logger.info(f"Sending SMS to {clean_phone} with payload: {payload}")
+    logger.info(f"Sending {len(sms_items)} SMS with payload: {payload}")
+
+    try:
+        response = await client.post(P1SMS_API_URL, json=payload)
+        response.raise_for_status()
+        json_response = response.json()
+        logger.info(f"P1SMS response: {json_response}")
+    except httpx.HTTPStatusError as e:
+        logger.error(f"P1SMS HTTP error: {e}")
+        logger.error(f"Response content: {e.response.text}")
+        if e.response.status_code >= 500:
+            raise SmsOutcomeUnknown(detail=f"P1SMS request failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"P1SMS request failed: {str(e)}")
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # Соединение не установлено — запрос точно не отправлен
+        logger.error(f"P1SMS connection error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to send SMS: {str(e)}")
+    except Exception as e:
+        logger.error(f"P1SMS unexpected error: {e}")
+        raise SmsOutcomeUnknown(detail=f"Failed to send SMS: {str(e)}")
+
+    if json_response.get("status") != "success":
+        error_message = json_response.get("message", "Unknown error")
+        raise HTTPException(
+            status_code=500,
+            detail=f"P1SMS error: {error_message}"
+        )
+    return json_response
+
+async def send_sms(phone: str, code: str):
+    """
+    Отправляет СМС с кодом верификации через P1SMS, используя шаблон.
+    :param phone: Номер телефона, канонический 7XXXXXXXXXX (users.phone_e164); другие форматы нормализуются
+    :param code: Код верификации (например, '6807')
+    :return: Ответ от P1SMS в формате JSON
+    """
+    if not P1SMS_API_KEY:
+        raise HTTPException(status_code=500, detail="P1SMS API key not configured")
+
+    clean_phone = normalize_phone(phone)
 
     async with httpx.AsyncClient() as client:
+        json_response = await _post_sms(client, [_build_sms_item(clean_phone, _verification_text(code))])
+
+    sms_data = json_response.get("data", [])
+    if not sms_data or sms_data[0].get("status") not in ["sent", "queued"]:
+        status = sms_data[0].get("status", "Unknown status") if sms_data else "No data"
+        raise HTTPException(
+            status_code=500,
+            detail=f"P1SMS failed to send SMS: {status}"
+        )
+
+    return json_response
+
+async def send_sms_batch(messages: List[Tuple[str, str]]) -> List[Tuple[Optional[bool], str]]:
+    """
+    Отправляет коды верификации пачкой через массив `sms` API P1SMS.
+    :param messages: Список пар (телефон 7XXXXXXXXXX, код)
+    :return: Список (отправлено, статус/ошибка) в том же порядке, что и messages; см. send_text_batch
+    """
+    return await send_text_batch([(phone, _verification_text(code)) for phone, code in messages])
+
+async def send_text_batch(messages: List[Tuple[str, str]]) -> List[Tuple[Optional[bool], str]]:
+    """
+    Отправляет произвольные тексты пачкой через массив `sms` API P1SMS.
+    Сообщения режутся на чанки по P1SMS_BATCH_SIZE, все чанки идут через один HTTP-клиент.
+    :param messages: Список пар (телефон 7XXXXXXXXXX, текст)
+    :return: Список (отправлено, статус/ошибка) в том же порядке, что и messages:
+        True — принято P1SMS, False — точно не отправлено (отказ, неверный номер, нет соединения),
+        None — исход неизвестен (SmsOutcomeUnknown или нет статуса в ответе), повтор может дать дубль
+    """
+    if not P1SMS_API_KEY:
+        raise HTTPException(status_code=500, detail="P1SMS API key not configured")
+
+    results: List[Tuple[Optional[bool], str]] = [(False, "Not sent")] * len(messages)
+    pending: List[Tuple[int, dict]] = []
+    for i, (phone, text) in enumerate(messages):
         try:
-            response = await client.post(P1SMS_API_URL, json=payload)
-            response.raise_for_status()
-            json_response = response.json()
-            logger.info(f"P1SMS response: {json_response}")
-
-            if json_response.get("status") != "success":
-                error_message = json_response.get("message", "Unknown error")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"P1SMS error: {error_message}"
-                )
+            pending.append((i, _build_sms_item(normalize_phone(phone), text)))
+        except HTTPException as e:
+            results[i] = (False, e.detail)
+
+    async with httpx.AsyncClient() as client:
+        for chunk_start in range(0, len(pending), P1SMS_BATCH_SIZE):
+            chunk = pending[chunk_start:chunk_start + P1SMS_BATCH_SIZE]
+            try:
+                json_response = await _post_sms(client, [item for _, item in chunk])
+            except HTTPException as e:
+                sent = None if isinstance(e, SmsOutcomeUnknown) else False
+                for i, _ in chunk:
+                    results[i] = (sent, e.detail)
+                continue
 
+            # P1SMS возвращает статусы в порядке сообщений в запросе
             sms_data = json_response.get("data", [])
-            if not sms_data or sms_data[0].get("status") not in ["sent", "queued"]:
-                status = sms_data[0].get("status", "Unknown status") if sms_data else "No data"
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"P1SMS failed to send SMS: {status}"
-                )
-
-            return json_response
-        except httpx.HTTPStatusError as e:
-            logger.error(f"P1SMS HTTP error: {e}")
-            logger.error(f"Response content: {e.response.text}")
-            raise HTTPException(status_code=500, detail=f"P1SMS request failed: {str(e)}")
-        except Exception as e:
-            logger.error(f"P1SMS unexpected error: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to send SMS: {str(e)}")
\ No newline at end of file
+            for pos, (i, _) in enumerate(chunk):
+                if pos >= len(sms_data):
+                    results[i] = (None, "No data")
+                    continue
+                status = sms_data[pos].get("status", "Unknown status")
+                results[i] = (status in ["sent", "queued"], status)
+
+    return results
@@ -0,0 +1,82 @@
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.base import Base
+from app.db.tenancy import current_club_id
+from app.db.types import UTCDateTime
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import List, Tuple
+from zoneinfo import ZoneInfo
+
+UTC = timezone.utc
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    """ZoneInfo создаётся один раз на имя пояса."""
+    return ZoneInfo(name)
+
+def zone_for_club(club_id: int) -> ZoneInfo:
+    return get_zone(settings.CLUB_TIMEZONES.get(club_id, settings.DEFAULT_TIMEZONE))
+
+def club_zone(db: Session) -> ZoneInfo:
+    """Часовой пояс клуба сессии: часы работы, тарифы и сетка слотов задаются в местном времени."""
+    return zone_for_club(current_club_id(db))
+
+def to_local(dt: datetime, zone: ZoneInfo) -> datetime:
+    """
+    Приводит время из запроса к поясу клуба. Время без tzinfo считается местным временем клуба —
+    так его присылают клиенты; время с tzinfo переводится в пояс клуба.
+    """
+    return dt.replace(tzinfo=zone) if dt.tzinfo is None else dt.astimezone(zone)
+
+def local_now(zone: ZoneInfo) -> datetime:
+    return datetime.now(zone)
+
+def utc_now() -> datetime:
+    return datetime.now(UTC)
+
+def day_bounds(day: date, zone: ZoneInfo) -> Tuple[datetime, datetime]:
+    """[местная полночь дня, местная полночь следующего дня) — границы для диапазонного запроса."""
+    return (
+        datetime.combine(day, time.min, tzinfo=zone),
+        datetime.combine(day + timedelta(days=1), time.min, tzinfo=zone)
+    )
+
+def local_day(column, zone: ZoneInfo):
+    """
+    SQL-выражение «местный день» для timestamptz: date_trunc('day', column AT TIME ZONE zone).
+    Группировка по дням делается в базе, без перевода каждой строки в Python.
+    """
+    return func.date_trunc("day", func.timezone(zone.key, column))
+
+@lru_cache(maxsize=None)
+def _utc_columns(cls) -> List[str]:
+    return [
+        attr.key for attr in cls.__mapper__.column_attrs
+        if isinstance(attr.columns[0].type, UTCDateTime)
+    ]
+
+def _localize(target, session: Session):
+    """
+    Время из timestamptz-колонок загруженного объекта — в поясе клуба сессии, чтобы брони
+    в ответах API шли с тем же смещением, что и сетка слотов. Момент времени не меняется;
+    запись в __dict__ минует историю атрибутов, и объект не становится изменённым.
+    Сессии без клуба (фоновые задачи) получают UTC, как из базы.
+    """
+    club_id = session.info.get("club_id") if session is not None else None
+    if club_id is None:
+        return
+    zone = zone_for_club(club_id)
+    for key in _utc_columns(type(target)):
+        value = target.__dict__.get(key)
+        if value is not None:
+            target.__dict__[key] = value.astimezone(zone)
+
+@event.listens_for(Base, "load", propagate=True)
+def _localize_on_load(target, context):
+    _localize(target, context.session)
+
+@event.listens_for(Base, "refresh", propagate=True)
+def _localize_on_refresh(target, context, attrs):
+    _localize(target, context.session)
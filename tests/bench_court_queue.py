@@ -0,0 +1,141 @@
+"""
+Нагрузочное сравнение записи броней: очередь по корту (BOOKING_WRITE_LOCK=memory/advisory)
+против прямого пути (off) при наплыве на одни и те же слоты.
+
+    python -m tests.bench_court_queue --database-url postgresql://localhost/tennis_bench
+
+База должна быть пустой — таблицы создаются и очищаются скриптом. Без --database-url
+используется временная SQLite (только для проверки скрипта: SQLite сериализует запись сама).
+Для каждого режима печатаются пропускная способность, p50/p95/p99 задержки, число созданных
+броней, отказов и ошибок базы, а также число двойных броней (должно быть 0).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time as time_module
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--threads", type=int, default=32, help="Одновременных запросов (как threadpool воркера)")
+    parser.add_argument("--courts", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=12, help="Слотов на корт, не больше 16")
+    parser.add_argument("--attempts", type=int, default=16, help="Попыток на каждый слот")
+    parser.add_argument("--modes", default="off,memory,advisory")
+    return parser.parse_args()
+
+args = parse_args()
+# Настройки читаются при импорте app — окружение задаётся до него
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import contextlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from fastapi import HTTPException
+from sqlalchemy import func, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import aliased
+from app.db.base import Base
+from app.db.models import Booking, Court, User
+from app.db.session import engine, ensure_clubs, session_for_club
+from app.schemas.booking import BookingCreate
+from app.services.audit_service import audit_writer
+from app.services.booking_service import create_booking
+from app.services.cache_bus import cache_bus
+from app.services.court_queue_service import court_writers
+from app.utils.timezone import zone_for_club
+from app.core.config import settings
+
+def setup() -> int:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    ensure_clubs()
+    with session_for_club(settings.DEFAULT_CLUB_ID) as db:
+        db.add_all([Court(name=f"Корт {n}") for n in range(1, args.courts + 1)])
+        user = User(email="bench@example.com", first_name="Bench", last_name="User", phone="+7(900)000-00-00",
+                    phone_e164="79000000000", hashed_password="x", role="user")
+        db.add(user)
+        db.commit()
+        return user.id
+
+def attempt(user_id: int, court_id: int, start: datetime):
+    started = time_module.perf_counter()
+    outcome = "created"
+    with session_for_club(settings.DEFAULT_CLUB_ID) as db:
+        try:
+            create_booking(db, BookingCreate(court_id=court_id, start_time=start, end_time=start + timedelta(hours=1), price=1000), user_id, False)
+        except ValueError:
+            outcome = "conflict"
+        except HTTPException:
+            outcome = "busy"  # 503 очереди корта
+        except DBAPIError:
+            db.rollback()
+            outcome = "db_error"  # Дедлок, сериализация, таймаут блокировки
+    return outcome, time_module.perf_counter() - started
+
+def double_bookings() -> int:
+    with session_for_club(settings.DEFAULT_CLUB_ID) as db:
+        other = aliased(Booking)
+        return db.query(func.count()).select_from(Booking).join(other, (other.court_id == Booking.court_id) & (other.id > Booking.id)).filter(
+            Booking.status == "active", other.status == "active",
+            other.start_time < Booking.end_time, other.end_time > Booking.start_time
+        ).scalar()
+
+def run_mode(mode: str, user_id: int) -> dict:
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM bookings"))
+    court_writers.mode = mode
+    cache_bus.dispatch_all()
+    zone = zone_for_club(settings.DEFAULT_CLUB_ID)
+    day = datetime.now(zone).date() + timedelta(days=1)
+    jobs = [
+        (court_id, datetime.combine(day, time(7 + slot), tzinfo=zone))
+        for court_id in range(1, args.courts + 1)
+        for slot in range(args.slots)
+        for _ in range(args.attempts)
+    ]
+    random.Random(38).shuffle(jobs)
+    started = time_module.perf_counter()
+    # create_booking печатает отладку на каждый вызов — в замер она не должна попадать
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(lambda job: attempt(user_id, *job), jobs))
+    elapsed = time_module.perf_counter() - started
+    audit_writer.flush()
+    latencies = sorted(latency for _, latency in results)
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    outcomes = [outcome for outcome, _ in results]
+    return {
+        "mode": mode,
+        "rps": len(results) / elapsed,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        **{name: outcomes.count(name) for name in ("created", "conflict", "busy", "db_error")},
+        "double": double_bookings(),
+    }
+
+def main():
+    logging.disable(logging.WARNING)
+    if args.slots > 16:
+        sys.exit("--slots не больше 16: брони не должны пересекать полночь")
+    modes = [mode for mode in args.modes.split(",") if mode != "advisory" or engine.dialect.name == "postgresql"]
+    user_id = setup()
+    print(f"{engine.dialect.name}: {args.courts} кортов × {args.slots} слотов × {args.attempts} попыток, {args.threads} потоков")
+    print(f"{'mode':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'created':>9}{'conflict':>10}{'busy':>6}{'db_err':>8}{'double':>8}")
+    for mode in modes:
+        r = run_mode(mode, user_id)
+        print(f"{r['mode']:<10}{r['rps']:>9.0f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}"
+              f"{r['created']:>9}{r['conflict']:>10}{r['busy']:>6}{r['db_error']:>8}{r['double']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте app — окружение задаётся до него
+_db_dir = tempfile.mkdtemp(prefix="tennis-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_dir}/app.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("SMS_P1SMS_API_KEY", "test-key")
+os.environ.setdefault("ANALYTICS_DIR", f"{_db_dir}/analytics")
+os.environ.setdefault("CLUB_IDS", "[2]")
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from app.main import app
+from app.db.base import Base
+from app.db.models import Booking, Court, User
+from app.db.session import SessionLocal, engine, ensure_clubs
+from app.core.security import create_access_token
+from app.services.cache_bus import cache_bus
+
+class Client:
+    """Синхронная обёртка над httpx.AsyncClient c ASGITransport (TestClient несовместим с httpx 0.28)."""
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+        return asyncio.run(send())
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    ensure_clubs()
+    # In-process кэши переживают пересоздание таблиц — сбрасываем их
+    cache_bus.dispatch_all()
+    yield
+
+@pytest.fixture
+def client():
+    return Client()
+
+@pytest.fixture
+def db():
+    session = SessionLocal(info={"club_id": 1})
+    yield session
+    session.close()
+
+def make_user(db, role: str = "user", suffix: str = "0") -> User:
+    user = User(
+        email=f"{role}{suffix}@example.com",
+        first_name="Иван",
+        last_name="Петров",
+        phone=f"+7(900)000-00-{int(suffix):02d}",
+        phone_e164=f"790000000{int(suffix):02d}",
+        hashed_password="x",
+        role=role
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+def auth_headers(user: User) -> dict:
+    token = create_access_token({"sub": str(user.id), "club": user.club_id})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def admin(db):
+    return make_user(db, "admin", "1")
+
+@pytest.fixture
+def user(db):
+    return make_user(db, "user", "2")
+
+@pytest.fixture
+def court(db):
+    court = Court(name="Корт 1")
+    db.add(court)
+    db.commit()
+    return court
+
+@pytest.fixture
+def booking(db, user, court):
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    booking = Booking(user_id=user.id, court_id=court.id, start_time=start, end_time=start + timedelta(hours=1), price=1000)
+    db.add(booking)
+    db.commit()
+    return booking
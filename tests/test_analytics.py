@@ -0,0 +1,133 @@
+import os
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+from app.core.config import settings
+from app.db.session import engine
+from app.services.analytics_service import (
+    EXPORT_LOCK_NAMESPACE, BookingSnapshot, SnapshotExporter, SnapshotStore, _club_dir, _hour_pieces, _to_local,
+    export_snapshots, occupancy_heatmap, peak_hours, revenue_curve
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")  # 2026-03-29 02:00 CET -> 03:00 CEST
+
+def _minutes(moment: datetime) -> int:
+    return int(moment.timestamp()) // 60
+
+def _snapshot(*bookings) -> BookingSnapshot:
+    """bookings: (корт, начало, конец, цена[, активна]) в местном времени BERLIN."""
+    def row(court, start, end, price, active=1):
+        return court, _minutes(start.replace(tzinfo=BERLIN)), _minutes(end.replace(tzinfo=BERLIN)), price, active
+
+    court_id, start, end, price, active = (np.array(column) for column in zip(*(row(*b) for b in bookings)))
+    return BookingSnapshot(1, "0-0", {"court_id": court_id, "start": start, "end": end, "price": price, "active": active})
+
+def _generations(club_id: int) -> set:
+    club_dir = _club_dir(club_id)
+    return {entry for entry in os.listdir(club_dir) if os.path.isdir(os.path.join(club_dir, entry))}
+
+def test_exports_keep_current_and_previous_generation(booking):
+    store = SnapshotStore()
+    export_snapshots(engine)
+    first = store.get(1).generation
+    export_snapshots(engine)
+    second = store.get(1).generation
+    assert first != second
+    assert _generations(1) >= {first, second}
+    export_snapshots(engine)
+    third = store.get(1).generation
+    assert _generations(1) == {second, third}
+    assert store.get(1).built_at.year >= 2026
+
+def test_club_without_bookings_gets_empty_snapshot(db, booking):
+    store = SnapshotStore()
+    assert export_snapshots(engine)[1] == 1
+    assert len(store.get(1)) == 1
+    db.delete(booking)
+    db.commit()
+    assert export_snapshots(engine)[1] == 0
+    assert len(store.get(1)) == 0
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="нужен Postgres: TEST_DATABASE_URL")
+def test_only_one_exporter_runs_a_round():
+    pg_engine = create_engine(os.environ["TEST_DATABASE_URL"])
+    try:
+        with pg_engine.connect() as other_worker:
+            assert other_worker.execute(select(func.pg_try_advisory_xact_lock(EXPORT_LOCK_NAMESPACE, 0))).scalar()
+            assert SnapshotExporter([pg_engine], settings.ANALYTICS_SNAPSHOT_SECONDS).export_round() is False
+            other_worker.rollback()
+        assert SnapshotExporter([], settings.ANALYTICS_SNAPSHOT_SECONDS, lock_engine=pg_engine).export_round() is True
+    finally:
+        pg_engine.dispose()
+
+def test_to_local_uses_offset_of_each_hour_across_dst():
+    utc = np.array([
+        _minutes(datetime(2026, 3, 29, 0, 30, tzinfo=timezone.utc)),  # 01:30 CET
+        _minutes(datetime(2026, 3, 29, 1, 0, tzinfo=timezone.utc)),   # 03:00 CEST
+    ])
+    local = _to_local(utc, BERLIN)
+    assert (local - utc).tolist() == [60, 120]
+    assert _to_local(np.array([], dtype=np.int32), BERLIN).size == 0
+
+def test_hour_pieces_split_booking_at_hour_boundaries():
+    start, end = np.array([10 * 60 + 30, 14 * 60]), np.array([12 * 60, 14 * 60 + 15])
+    owner, hour, minutes = _hour_pieces(start, end)
+    assert owner.tolist() == [0, 0, 1]
+    assert hour.tolist() == [10, 11, 14]
+    assert minutes.tolist() == [30, 60, 15]
+
+def test_heatmap_averages_over_weekday_occurrences():
+    snapshot = _snapshot(
+        (1, datetime(2026, 10, 12, 10), datetime(2026, 10, 12, 11), 1000),        # понедельник
+        (1, datetime(2026, 10, 13, 10, 30), datetime(2026, 10, 13, 12), 1500),    # вторник
+        (2, datetime(2026, 10, 19, 18), datetime(2026, 10, 19, 19), 1000, 0),     # отменена
+    )
+    # Два понедельника (12 и 19 октября), один вторник
+    courts, heatmap = occupancy_heatmap(snapshot, BERLIN, date(2026, 10, 12), date(2026, 10, 19))
+    assert courts == [1, 2]
+    assert heatmap.shape == (2, 7, 24)
+    assert heatmap[0, 0, 10] == 0.5
+    assert (heatmap[0, 1, 10], heatmap[0, 1, 11]) == (0.5, 1.0)
+    assert heatmap.sum() == 2.0
+
+def test_heatmap_on_dst_transition_day_uses_local_hours():
+    snapshot = _snapshot(
+        (1, datetime(2026, 3, 29, 0, 30), datetime(2026, 3, 29, 1, 30), 1000),
+        (1, datetime(2026, 3, 29, 3), datetime(2026, 3, 29, 4), 1000),
+    )
+    _, heatmap = occupancy_heatmap(snapshot, BERLIN, date(2026, 3, 29), date(2026, 3, 29))
+    sunday = heatmap[0, 6]
+    assert (sunday[0], sunday[1], sunday[2], sunday[3]) == (0.5, 0.5, 0.0, 1.0)
+
+def test_revenue_curve_buckets_by_local_day_week_and_month():
+    snapshot = _snapshot(
+        (1, datetime(2026, 10, 12, 10), datetime(2026, 10, 12, 11), 1000),
+        (1, datetime(2026, 10, 18, 21), datetime(2026, 10, 18, 22), 500),
+        (1, datetime(2026, 10, 19, 0, 30), datetime(2026, 10, 19, 1, 30), 700),  # 18 октября по UTC
+        (1, datetime(2026, 11, 2, 10), datetime(2026, 11, 2, 11), 900),
+        (1, datetime(2026, 11, 3, 10), datetime(2026, 11, 3, 11), 900, 0),
+    )
+    period = (date(2026, 10, 1), date(2026, 11, 30))
+    assert revenue_curve(snapshot, BERLIN, *period) == [
+        (date(2026, 10, 12), 1000, 1), (date(2026, 10, 18), 500, 1),
+        (date(2026, 10, 19), 700, 1), (date(2026, 11, 2), 900, 1),
+    ]
+    assert revenue_curve(snapshot, BERLIN, *period, bucket="week") == [
+        (date(2026, 10, 12), 1500, 2), (date(2026, 10, 19), 700, 1), (date(2026, 11, 2), 900, 1),
+    ]
+    assert revenue_curve(snapshot, BERLIN, *period, bucket="month") == [
+        (date(2026, 10, 1), 2200, 3), (date(2026, 11, 1), 900, 1),
+    ]
+    assert revenue_curve(snapshot, BERLIN, date(2026, 10, 19), date(2026, 10, 19)) == [(date(2026, 10, 19), 700, 1)]
+
+def test_peak_hours_share_of_court_day_capacity():
+    snapshot = _snapshot(
+        (1, datetime(2026, 10, 12, 10), datetime(2026, 10, 12, 11), 1000),
+        (2, datetime(2026, 10, 12, 10), datetime(2026, 10, 12, 11), 1000),
+        (1, datetime(2026, 10, 13, 10, 30), datetime(2026, 10, 13, 12), 1500),
+    )
+    # 2 корта × 2 дня: ёмкость часа — 240 минут
+    assert peak_hours(snapshot, BERLIN, date(2026, 10, 12), date(2026, 10, 13)) == [(10, 150, 0.625), (11, 60, 0.25)]
+    assert peak_hours(snapshot, BERLIN, date(2026, 10, 12), date(2026, 10, 13), limit=1, court_ids=[1]) == [(10, 90, 0.75)]
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.db.models import BookingAuditEvent
+from app.db.session import engine
+from app.services.audit_service import AuditWriter, audit_writer
+from app.utils.query_budget import count_queries
+from app.utils.timezone import zone_for_club
+from tests.conftest import auth_headers
+
+def test_audit_pages_do_not_skip_events_with_equal_timestamps(client, db, admin):
+    same, earlier = datetime(2026, 10, 19, 12, 0, 0), datetime(2026, 10, 19, 11, 0, 0)
+    db.add_all([
+        BookingAuditEvent(booking_id=n, court_id=1, action="created", payload="{}", created_at=same if n < 5 else earlier)
+        for n in range(1, 7)
+    ])
+    db.commit()
+    seen, params = [], {"limit": 2}
+    while True:
+        page = client.get("/api/bookings/audit", params=params, headers=auth_headers(admin)).json()
+        if not page:
+            break
+        seen.extend(event["booking_id"] for event in page)
+        params = {"limit": 2, "date_to": page[-1]["created_at"], "before_id": page[-1]["id"]}
+    assert seen == [4, 3, 2, 1, 6, 5]
+
+def test_before_id_requires_date_to(client, admin):
+    response = client.get("/api/bookings/audit?before_id=3", headers=auth_headers(admin))
+    assert response.status_code == 400
+
+def _insert_statements(queries: list) -> list:
+    return [sql for sql in queries if sql.lstrip().upper().startswith("INSERT INTO BOOKING_AUDIT_EVENTS")]
+
+def test_booking_changes_are_written_in_one_batch_on_flush(client, db, admin, court):
+    audit_writer.flush()  # События предыдущих тестов
+    tomorrow = (datetime.now(zone_for_club(1)) + timedelta(days=1)).date()
+    created = client.post("/api/bookings/", headers=auth_headers(admin), json={
+        "court_id": court.id, "price": 1000,
+        "start_time": f"{tomorrow}T10:00:00", "end_time": f"{tomorrow}T11:00:00"
+    })
+    assert created.status_code == 200, created.text
+    booking_id = created.json()["id"]
+    assert client.delete(f"/api/bookings/{booking_id}", headers=auth_headers(admin)).status_code == 200
+    # Запрос бронирования не пишет журнал сам
+    assert db.query(BookingAuditEvent).count() == 0
+
+    with count_queries() as queries:
+        assert audit_writer.flush() == 2
+    assert len(_insert_statements(queries)) == 1
+    events = db.query(BookingAuditEvent).order_by(BookingAuditEvent.id).all()
+    assert [(e.action, e.booking_id, e.actor_id, e.club_id) for e in events] == [
+        ("created", booking_id, admin.id, 1), ("deleted", booking_id, admin.id, 1)
+    ]
+    assert json.loads(events[1].payload)["price"] == 1000
+    assert audit_writer.flush() == 0
+
+@pytest.fixture
+def flaky_engine():
+    """Отдельный engine на ту же базу: пока failing=True, любой запрос падает."""
+    flaky = create_engine(engine.url)
+    flaky.failing = True
+
+    @event.listens_for(flaky, "before_cursor_execute")
+    def fail(conn, cursor, statement, parameters, context, executemany):
+        if flaky.failing:
+            raise OperationalError(statement, parameters, Exception("database is down"))
+
+    yield flaky
+    flaky.dispose()
+
+def _record(writer: AuditWriter, flaky, booking_id: int):
+    with Session(bind=flaky, info={"club_id": 1}) as session:
+        writer.record(session, "created", {"id": booking_id, "club_id": 1, "court_id": 1, "user_id": None}, None)
+
+def _audited_ids(db) -> list:
+    return [e.booking_id for e in db.query(BookingAuditEvent).order_by(BookingAuditEvent.id)]
+
+def test_failed_flush_requeues_events_in_order(db, flaky_engine):
+    writer = AuditWriter(flush_seconds=60, batch_size=100, max_buffer=10)
+    for booking_id in (1, 2):
+        _record(writer, flaky_engine, booking_id)
+    assert writer.flush() == 0
+    _record(writer, flaky_engine, 3)  # Пришло во время недоступности базы
+    flaky_engine.failing = False
+    assert writer.flush() == 3
+    assert _audited_ids(db) == [1, 2, 3]
+    assert writer.dropped == 0
+
+def test_full_buffer_drops_oldest_events(db, flaky_engine):
+    writer = AuditWriter(flush_seconds=60, batch_size=100, max_buffer=3)
+    for booking_id in (1, 2):
+        _record(writer, flaky_engine, booking_id)
+    assert writer.flush() == 0
+    for booking_id in (3, 4):
+        _record(writer, flaky_engine, booking_id)
+    assert writer.dropped == 1
+    assert writer.flush() == 0
+    assert writer.dropped == 1  # Повторная постановка в очередь ничего не вытесняет сверх max_buffer
+    flaky_engine.failing = False
+    assert writer.flush() == 3
+    assert _audited_ids(db) == [2, 3, 4]
@@ -0,0 +1,32 @@
+import asyncio
+from app.schemas.user import UserCreate
+from app.services import auth_service
+from app.services.auth_service import create_users_bulk
+from app.utils.query_budget import count_queries
+
+def _bulk_statements(db, count: int, batch: int) -> list:
+    users = [
+        UserCreate(
+            email=f"bulk{batch}-{i}@example.com",
+            first_name="Анна",
+            last_name="Смирнова",
+            phone=f"+7(901)000-{batch:02d}-{i:02d}",
+            password="secret",
+            is_admin=True
+        )
+        for i in range(count)
+    ]
+    with count_queries() as statements:
+        result = asyncio.run(create_users_bulk(db, users, is_admin_creator=True))
+    assert result.created == count
+    assert all(row.user_id for row in result.results)
+    return statements
+
+def test_bulk_register_does_not_refresh_users_after_commit(db, monkeypatch):
+    # Хэширование не влияет на число запросов, а bcrypt здесь только замедлил бы тест
+    monkeypatch.setattr(auth_service, "get_password_hashes", lambda passwords: [f"hash:{p}" for p in passwords])
+    small = _bulk_statements(db, 2, 1)
+    large = _bulk_statements(db, 6, 2)
+    selects = lambda statements: [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    # Число SELECT не растёт с размером пачки: id читаются до commit, без refresh на каждого пользователя
+    assert len(selects(large)) == len(selects(small))
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from app.db.models import CacheEvent
+from app.db.session import engine
+from app.services.cache_bus import CacheBus, CacheInvalidationListener
+
+def _collector(bus: CacheBus, topic: str = "courts") -> list:
+    received = []
+    bus.subscribe(topic, lambda payload: received.append(payload and payload.get("n")))
+    return received
+
+def _event(event_id: int, n: int) -> dict:
+    message = {"topic": "courts", "payload": {"n": n}, "origin": "other-worker"}
+    return {"id": event_id, "topic": "courts", "payload": json.dumps(message)}
+
+def test_poll_delivers_event_committed_after_higher_id():
+    bus = CacheBus(mode="poll")
+    received = _collector(bus)
+    listener = CacheInvalidationListener(bus, engine, poll_interval=0)
+    with engine.connect() as connection:
+        # id 2 закоммичен раньше id 1 — курсор max(id) потерял бы первое событие
+        connection.execute(insert(CacheEvent), [_event(2, 2)])
+        listener._poll_once(connection)
+        connection.execute(insert(CacheEvent), [_event(1, 1)])
+        listener._poll_once(connection)
+        listener._poll_once(connection)
+    assert received == [2, 1]
+    assert listener._gaps == {}
+
+def test_poll_forgets_gaps_that_never_fill(monkeypatch):
+    bus = CacheBus(mode="poll")
+    _collector(bus)
+    listener = CacheInvalidationListener(bus, engine, poll_interval=0)
+    with engine.connect() as connection:
+        connection.execute(insert(CacheEvent), [_event(3, 3)])
+        listener._poll_once(connection)
+        assert set(listener._gaps) == {1, 2}
+        monkeypatch.setattr("app.services.cache_bus.POLL_GAP_TIMEOUT_SECONDS", -1)
+        listener._poll_once(connection)
+    assert listener._gaps == {}
+
+def _wait_for(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="нужен Postgres: TEST_DATABASE_URL")
+@pytest.mark.parametrize("mode", ["poll", "notify"])
+def test_two_instances_receive_each_others_invalidations(mode):
+    pg_engine = create_engine(os.environ["TEST_DATABASE_URL"])
+    CacheEvent.__table__.create(pg_engine, checkfirst=True)
+    # Два «экземпляра приложения»: свои шины, свои слушатели, общая база
+    bus_a, bus_b = CacheBus(mode=mode), CacheBus(mode=mode)
+    received = _collector(bus_b)
+    listener = CacheInvalidationListener(bus_b, pg_engine, poll_interval=0.05)
+    listener.start()
+    try:
+        time.sleep(0.5)  # Слушатель подписался / прочитал начальный курсор
+        received.clear()
+        early, late = Session(bind=pg_engine, info={"club_id": 1}), Session(bind=pg_engine, info={"club_id": 1})
+        bus_a.publish(early, "courts", n=1)  # Меньший id, commit позже
+        bus_a.publish(late, "courts", n=2)
+        late.commit()
+        assert _wait_for(lambda: 2 in received)
+        early.commit()
+        assert _wait_for(lambda: 1 in received)
+        assert sorted(received) == [1, 2]
+    finally:
+        listener.stop()
+        listener.join(timeout=5)
+        CacheEvent.__table__.drop(pg_engine, checkfirst=True)
+        pg_engine.dispose()
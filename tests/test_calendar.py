@@ -0,0 +1,32 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+from app.core.security import create_access_token
+from tests.conftest import auth_headers
+
+def _feed_url(client, user) -> str:
+    response = client.get("/api/calendar/token", headers=auth_headers(user))
+    assert response.status_code == 200
+    return response.json()["url"]
+
+def test_calendar_token_opens_only_the_feed(client, user):
+    url = _feed_url(client, user)
+    assert client.get(url).status_code == 200
+    token = parse_qs(urlparse(url).query)["token"][0]
+    response = client.get("/api/profile/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_access_token_is_not_a_calendar_token(client, user):
+    token = auth_headers(user)["Authorization"][7:]
+    assert client.get(f"/api/calendar/users/{user.id}.ics?token={token}").status_code == 403
+
+def test_legacy_scoped_token_is_rejected_as_bearer(client, user):
+    token = create_access_token(
+        data={"sub": str(user.id), "scope": "calendar", "club": user.club_id},
+        expires_delta=timedelta(days=365)
+    )
+    response = client.get("/api/profile/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_admin_cannot_mint_feed_for_unknown_user(client, admin):
+    response = client.get("/api/calendar/token?user_id=999", headers=auth_headers(admin))
+    assert response.status_code == 404
@@ -0,0 +1,15 @@
+from tests.conftest import auth_headers
+
+def test_only_computed_field_requested(client, user, booking):
+    response = client.get("/api/bookings/my?fields=user_name", headers=auth_headers(user))
+    assert response.status_code == 200
+    assert response.json() == [{"user_name": "Иван П."}]
+
+def test_admin_list_with_only_computed_field(client, admin, booking):
+    response = client.get("/api/bookings/all?fields=user_name", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert response.json() == [{"user_name": "Иван П."}]
+
+def test_sparse_fields_keep_requested_columns(client, user, booking):
+    response = client.get("/api/bookings/my?fields=id,price", headers=auth_headers(user))
+    assert response.json() == [{"id": booking.id, "price": 1000}]
@@ -0,0 +1,147 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from threading import Event
+import pytest
+from fastapi import HTTPException
+from app.db.models import IdempotencyKey
+from app.services.idempotency_service import DatabaseIdempotencyStore, Idempotency, MemoryIdempotencyStore
+
+@pytest.fixture(params=["memory", "db"])
+def idempotency(request):
+    if request.param == "memory":
+        store = MemoryIdempotencyStore(ttl=60, max_entries=100)
+    else:
+        store = DatabaseIdempotencyStore(ttl=60, pending_timeout=5, purge_interval=60)
+    return Idempotency(store, wait_timeout=5)
+
+class Handler:
+    def __init__(self, result=None, error=None):
+        self.result = result if result is not None else {"id": 1}
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+def test_replay_returns_stored_response(idempotency):
+    handler = Handler({"id": 7, "price": 1000})
+    assert idempotency.run("k", "fp", handler) == {"id": 7, "price": 1000}
+    replay = idempotency.run("k", "fp", handler)
+    assert handler.calls == 1
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.body == b'{"id":7,"price":1000}'
+
+def test_different_fingerprint_is_rejected(idempotency):
+    idempotency.run("k", "fp", Handler())
+    with pytest.raises(HTTPException) as error:
+        idempotency.run("k", "other", Handler())
+    assert error.value.status_code == 422
+
+def test_client_error_is_stored(idempotency):
+    handler = Handler(error=HTTPException(status_code=409, detail="Слот занят"))
+    for _ in range(2):
+        with pytest.raises(HTTPException) as error:
+            idempotency.run("k", "fp", handler)
+        assert (error.value.status_code, error.value.detail) == (409, "Слот занят")
+    assert handler.calls == 1
+
+@pytest.mark.parametrize("error", [HTTPException(status_code=503, detail="busy"), RuntimeError("db down")])
+def test_server_error_releases_key(idempotency, error):
+    with pytest.raises(type(error)):
+        idempotency.run("k", "fp", Handler(error=error))
+    handler = Handler()
+    assert idempotency.run("k", "fp", handler) == {"id": 1}
+    assert handler.calls == 1
+
+def test_concurrent_duplicate_waits_and_replays(idempotency):
+    started, release = Event(), Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return {"id": 3}
+
+    duplicate = Handler()
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(idempotency.run, "k", "fp", slow)
+        assert started.wait(5)
+        second = pool.submit(idempotency.run, "k", "fp", duplicate)
+        release.set()
+        assert first.result() == {"id": 3}
+        replay = second.result()
+    assert duplicate.calls == 0
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+def test_duplicate_gets_409_while_first_is_running(idempotency):
+    idempotency.wait_timeout = 0.2
+    state, claim = idempotency.store.begin("k", "fp")
+    assert state == "new"
+    with pytest.raises(HTTPException) as error:
+        idempotency.run("k", "fp", Handler())
+    assert error.value.status_code == 409
+
+def test_run_async(idempotency):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"id": 5}
+
+    async def scenario():
+        first = await idempotency.run_async("k", "fp", handler)
+        replay = await idempotency.run_async("k", "fp", handler)
+        with pytest.raises(HTTPException) as error:
+            await idempotency.run_async("k", "other", handler)
+        return first, replay, error.value.status_code
+
+    first, replay, mismatch = asyncio.run(scenario())
+    assert first == {"id": 5}
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert mismatch == 422
+    assert len(calls) == 1
+
+def test_no_key_runs_handler_every_time(idempotency):
+    handler = Handler()
+    idempotency.run(None, "fp", handler)
+    idempotency.run(None, "fp", handler)
+    assert handler.calls == 2
+
+def test_stale_pending_row_is_taken_over(db):
+    store = DatabaseIdempotencyStore(ttl=3600, pending_timeout=5, purge_interval=60)
+    db.add(IdempotencyKey(key="k", fingerprint="fp", status="pending", created_at=datetime.utcnow() - timedelta(seconds=30)))
+    db.commit()
+    stale_claim = {"created_at": datetime.utcnow() - timedelta(seconds=30)}
+    handler = Handler()
+    assert Idempotency(store, wait_timeout=0.2).run("k", "fp", handler) == {"id": 1}
+    assert handler.calls == 1
+    # Опоздавший первый обработчик не трогает перехваченную строку
+    store.abort("k", stale_claim)
+    store.complete("k", stale_claim, 500, {"detail": "late"})
+    db.expire_all()
+    row = db.get(IdempotencyKey, "k")
+    assert (row.status, row.status_code) == ("done", 200)
+
+def test_fresh_pending_row_is_not_taken_over(db):
+    store = DatabaseIdempotencyStore(ttl=3600, pending_timeout=5, purge_interval=60)
+    db.add(IdempotencyKey(key="k", fingerprint="fp", status="pending", created_at=datetime.utcnow()))
+    db.commit()
+    with pytest.raises(HTTPException) as error:
+        Idempotency(store, wait_timeout=0.2).run("k", "fp", Handler())
+    assert error.value.status_code == 409
+
+def test_expired_keys_are_purged(db):
+    old = datetime.utcnow() - timedelta(hours=2)
+    db.add_all([
+        IdempotencyKey(key=f"old{n}", fingerprint="fp", status="done", status_code=200, response_body="{}", created_at=old)
+        for n in range(3)
+    ])
+    db.commit()
+    store = DatabaseIdempotencyStore(ttl=3600, pending_timeout=5, purge_interval=60)
+    Idempotency(store, wait_timeout=0.2).run("new", "fp", Handler())
+    db.expire_all()
+    assert [row.key for row in db.query(IdempotencyKey).all()] == ["new"]
@@ -0,0 +1,18 @@
+from datetime import timedelta
+from app.core.security import CALENDAR_TOKEN_AUDIENCE, create_access_token
+from app.utils.profiler import _is_admin_token
+
+def test_admin_access_token_enables_profiling(admin):
+    assert _is_admin_token(create_access_token({"sub": str(admin.id), "club": admin.club_id}))
+
+def test_calendar_tokens_do_not_enable_profiling(admin):
+    feed = create_access_token({"sub": str(admin.id), "club": admin.club_id}, audience=CALENDAR_TOKEN_AUDIENCE)
+    legacy = create_access_token(
+        {"sub": str(admin.id), "scope": "calendar", "club": admin.club_id},
+        expires_delta=timedelta(days=365)
+    )
+    assert not _is_admin_token(feed)
+    assert not _is_admin_token(legacy)
+
+def test_user_token_does_not_enable_profiling(user):
+    assert not _is_admin_token(create_access_token({"sub": str(user.id), "club": user.club_id}))
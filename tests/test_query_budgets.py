@@ -0,0 +1,122 @@
+"""
+Бюджеты SQL-запросов GET-эндпоинтов (@query_budget) на заполненной базе с холодными кэшами.
+Новый эндпоинт с бюджетом нужно добавить в BUDGETED_REQUESTS — иначе упадёт проверка покрытия.
+"""
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+import httpx
+import pytest
+from fastapi.routing import APIRoute
+from app.main import app
+from app.db.models import Booking, BookingAuditEvent, Court, CourtSchedule, Holiday, Tariff
+from app.db.session import engine
+from app.services.analytics_service import export_snapshots
+from app.services.cache_bus import cache_bus
+from app.utils.query_budget import QueryBudgetExceeded, QueryBudgetMiddleware, assert_max_queries
+from tests.conftest import auth_headers, make_user
+
+TOMORROW = date.today() + timedelta(days=1)
+
+# (шаблон пути, путь с параметрами, кто запрашивает)
+BUDGETED_REQUESTS = [
+    ("/api/users/", "/api/users/", "admin"),
+    pytest.param(
+        "/api/users/search", "/api/users/search?q=Пет", "admin",
+        marks=pytest.mark.skipif(engine.dialect.name != "postgresql", reason="поиск использует pg_trgm")
+    ),
+    ("/api/bootstrap/", "/api/bootstrap/", "user"),
+    ("/api/courts/", "/api/courts/", "user"),
+    ("/api/courts/{court_id}/schedule", "/api/courts/{court}/schedule", "user"),
+    ("/api/tariffs/default", "/api/tariffs/default", "admin"),
+    ("/api/tariffs/courts/{court_id}", "/api/tariffs/courts/{court}", "admin"),
+    ("/api/tariffs/holidays", "/api/tariffs/holidays", "user"),
+    ("/api/tariffs/quote", f"/api/tariffs/quote?court_id={{court}}&start_time={TOMORROW}T10:00:00&end_time={TOMORROW}T11:30:00", "user"),
+    ("/api/bookings/availability", f"/api/bookings/availability?court_id={{court}}&date={TOMORROW}", "user"),
+    ("/api/bookings/my", "/api/bookings/my", "user"),
+    ("/api/bookings/all", "/api/bookings/all", "admin"),
+    ("/api/bookings/filter", "/api/bookings/filter?court=Корт 1&user_ids={user}", "admin"),
+    ("/api/bookings/free-slots", "/api/bookings/free-slots?days=3", "user"),
+    ("/api/bookings/audit", "/api/bookings/audit", "admin"),
+    ("/api/bookings/{id}", "/api/bookings/{booking}", "user"),
+    ("/api/analytics/heatmap", "/api/analytics/heatmap", "admin"),
+    ("/api/analytics/revenue", "/api/analytics/revenue?bucket=week", "admin"),
+    ("/api/analytics/peak-hours", "/api/analytics/peak-hours", "admin"),
+    ("/api/profile/me", "/api/profile/me", "user"),
+    ("/api/profile/{user_id}", "/api/profile/{user}", "admin"),
+]
+
+def _budgeted_routes() -> dict:
+    return {
+        route.path: route for route in app.routes
+        if isinstance(route, APIRoute) and "GET" in route.methods and hasattr(route.endpoint, "__query_budget__")
+    }
+
+@pytest.fixture
+def seeded(db):
+    admin, user = make_user(db, "admin", "1"), make_user(db, "user", "2")
+    courts = [Court(name="Корт 1"), Court(name="Корт 2")]
+    db.add_all(courts)
+    db.flush()
+    db.add_all([
+        CourtSchedule(court_id=court.id, weekday=weekday, opens_at=time(7), closes_at=time(23), slot_minutes=60)
+        for court in courts for weekday in range(7)
+    ])
+    db.add_all([
+        Tariff(court_id=None, day_type=day_type, starts_at=time(7), ends_at=time(0), price_per_hour=1200)
+        for day_type in ("weekday", "weekend", "holiday")
+    ])
+    db.add(Tariff(court_id=courts[0].id, day_type="weekday", starts_at=time(18), ends_at=time(0), price_per_hour=2000))
+    db.add(Holiday(date=TOMORROW + timedelta(days=30), name="Праздник"))
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    bookings = [
+        Booking(
+            user_id=(user if n % 2 else admin).id, court_id=courts[n % 2].id, price=1000,
+            start_time=start + timedelta(hours=n * 5 - 40), end_time=start + timedelta(hours=n * 5 - 39)
+        )
+        for n in range(20)
+    ]
+    db.add_all(bookings)
+    db.flush()
+    db.add_all([
+        BookingAuditEvent(
+            booking_id=b.id, court_id=b.court_id, user_id=b.user_id, actor_id=b.user_id,
+            action="created", payload="{}", created_at=datetime.utcnow()
+        )
+        for b in bookings
+    ])
+    db.commit()
+    export_snapshots(engine)
+    return {"admin": admin, "user": user, "court": courts[0].id, "booking": bookings[-1].id}
+
+def _template(request) -> str:
+    return request.values[0] if hasattr(request, "values") else request[0]
+
+def test_every_budgeted_get_endpoint_is_checked():
+    assert set(_budgeted_routes()) == {_template(request) for request in BUDGETED_REQUESTS}
+
+@pytest.mark.parametrize("template, url, role", BUDGETED_REQUESTS, ids=[_template(request) for request in BUDGETED_REQUESTS])
+def test_endpoint_stays_within_query_budget(client, seeded, template, url, role):
+    url = url.format(court=seeded["court"], user=seeded["user"].id, booking=seeded["booking"])
+    headers = auth_headers(seeded[role])
+    # Холодные кэши: шаблоны слотов, тарифы и т. п. читаются из базы внутри замера
+    cache_bus.dispatch_all()
+    with assert_max_queries(_budgeted_routes()[template].endpoint.__query_budget__, f"GET {template}"):
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+
+def _get_through_middleware(url: str, headers: dict) -> httpx.Response:
+    async def send():
+        transport = httpx.ASGITransport(app=QueryBudgetMiddleware(app, mode="raise"))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(url, headers=headers)
+    return asyncio.run(send())
+
+def test_middleware_passes_request_within_budget(seeded):
+    response = _get_through_middleware(f"/api/courts/{seeded['court']}/schedule", auth_headers(seeded["user"]))
+    assert response.status_code == 200
+
+def test_middleware_raises_when_over_budget(seeded, monkeypatch):
+    endpoint = _budgeted_routes()["/api/bookings/my"].endpoint
+    monkeypatch.setattr(endpoint, "__query_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded, match="GET /api/bookings/my: .* budget is 0"):
+        _get_through_middleware("/api/bookings/my", auth_headers(seeded["user"]))
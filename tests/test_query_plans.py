@@ -0,0 +1,126 @@
+"""
+Планы запросов сервисов на PostgreSQL: каждый SELECT, который выполняет сервис, прогоняется
+через EXPLAIN при enable_seqscan = off. Seq Scan в таком плане означает, что подходящего индекса
+нет вовсе. Запускается при TEST_DATABASE_URL (пустая база, её содержимое удаляется).
+"""
+import json
+import os
+import random
+from datetime import date, datetime, time, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import Session
+from app.db.base import Base
+from app.db.models import Booking, BookingAuditEvent, Club, Court, CourtSchedule, User
+from app.services.audit_service import get_audit_events
+from app.services.booking_service import (
+    filter_bookings, find_free_slots, get_all_bookings, get_availability, get_upcoming_bookings
+)
+from app.services.cache_bus import cache_bus
+from app.services.reminder_service import claim_due_reminders
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="нужен Postgres: TEST_DATABASE_URL")
+
+COURTS = 20
+USERS = 300  # Чётные корты и пользователи — клуб 1, нечётные — клуб 2
+BOOKINGS = 20_000
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    pg_engine = create_engine(os.environ["TEST_DATABASE_URL"], connect_args={"options": "-c timezone=utc"})
+    with pg_engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    Base.metadata.create_all(pg_engine)
+    _seed(pg_engine)
+    yield pg_engine
+    pg_engine.dispose()
+
+def _seed(pg_engine):
+    rng = random.Random(39)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    with pg_engine.begin() as connection:
+        connection.execute(insert(Club), [{"id": 1, "name": "Клуб 1"}, {"id": 2, "name": "Клуб 2"}])
+        connection.execute(insert(Court), [
+            {"id": n, "club_id": 1 + n % 2, "name": f"Корт {n}"} for n in range(1, COURTS + 1)
+        ])
+        connection.execute(insert(CourtSchedule), [
+            {"court_id": n, "weekday": weekday, "opens_at": time(7), "closes_at": time(0), "slot_minutes": 60}
+            for n in range(1, COURTS + 1) for weekday in range(7)
+        ])
+        connection.execute(insert(User), [
+            {
+                "id": n, "club_id": 1 + n % 2, "email": f"u{n}@example.com", "first_name": "Иван", "last_name": "Петров",
+                "phone": f"+7(900){n:07d}", "phone_e164": f"7900{n:07d}", "hashed_password": "x", "role": "user"
+            }
+            for n in range(1, USERS + 1)
+        ])
+        bookings = []
+        for n in range(1, BOOKINGS + 1):
+            court_id = rng.randint(1, COURTS)
+            start = now + timedelta(hours=rng.randint(-24 * 180, 24 * 30))
+            bookings.append({
+                "id": n, "club_id": 1 + court_id % 2, "court_id": court_id, "user_id": rng.randint(1, USERS),
+                "start_time": start, "end_time": start + timedelta(hours=1), "price": 1000,
+                "status": "active" if rng.random() < 0.8 else "canceled",
+                "reminder_status": None if start > now else "sent", "reminder_attempts": 0
+            })
+        connection.execute(insert(Booking), bookings)
+        connection.execute(insert(BookingAuditEvent), [
+            {
+                "club_id": b["club_id"], "booking_id": b["id"], "court_id": b["court_id"], "user_id": b["user_id"],
+                "actor_id": b["user_id"], "action": "created", "payload": "{}", "created_at": b["start_time"].replace(tzinfo=None)
+            }
+            for b in bookings[:5000]
+        ])
+        connection.execute(text("ANALYZE"))
+
+def _seq_scans(plan: dict) -> list:
+    found = [plan.get("Relation Name")] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+def _assert_index_only(pg_engine, run):
+    """Выполняет run(db) и проверяет планы всех SELECT, которые он отправил в базу."""
+    cache_bus.dispatch_all()
+    statements = []
+    with pg_engine.connect() as connection:
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        event.listen(connection, "before_cursor_execute", record)
+        with Session(bind=connection, info={"club_id": 1}) as db:
+            run(db)
+        event.remove(connection, "before_cursor_execute", record)
+        connection.rollback()
+        assert statements
+        connection.execute(text("SET enable_seqscan = off"))
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            plan = plan if isinstance(plan, list) else json.loads(plan)
+            scans = _seq_scans(plan[0]["Plan"])
+            assert not scans, f"Seq Scan по {scans}:\n{statement}"
+        connection.rollback()
+
+def _now():
+    return datetime.now(timezone.utc)
+
+SERVICE_QUERIES = {
+    "availability": lambda db: get_availability(db, 2, date.today() + timedelta(days=1), is_admin=True),
+    "upcoming": lambda db: get_upcoming_bookings(db, 4, _now()),
+    "all": lambda db: get_all_bookings(db, ["id", "start_time"]),
+    "filter_by_court": lambda db: filter_bookings(db, court="Корт 4"),
+    "filter_by_users": lambda db: filter_bookings(db, user_ids=[4, 6, 8]),
+    "filter_by_period": lambda db: filter_bookings(db, date_from=_now(), date_to=_now() + timedelta(days=2)),
+    "free_slots": lambda db: find_free_slots(db, 60, date.today() + timedelta(days=1), 3, court_ids=[2, 4]),
+    "audit_by_court": lambda db: get_audit_events(db, court_id=4, limit=50),
+    "audit_feed": lambda db: get_audit_events(db, limit=50),
+    "audit_by_booking": lambda db: get_audit_events(db, booking_id=44),
+    "reminders": lambda db: claim_due_reminders(db, _now(), timedelta(hours=2), 100, timedelta(minutes=1)),
+}
+
+@pytest.mark.parametrize("name", SERVICE_QUERIES)
+def test_service_queries_use_indexes(pg_engine, name):
+    _assert_index_only(pg_engine, SERVICE_QUERIES[name])
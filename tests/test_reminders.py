@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from fastapi import HTTPException
+from app.db.models import Booking
+from app.db.session import engine
+from app.services.reminder_service import ReminderScanner, complete_reminders
+from app.utils import sms
+from app.utils.sms import SmsOutcomeUnknown
+
+@pytest.fixture
+def due_bookings(db, user, court):
+    start = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(minutes=30)
+    bookings = [
+        Booking(user_id=user.id, court_id=court.id, start_time=start + timedelta(hours=n), end_time=start + timedelta(hours=n + 1), price=1000)
+        for n in range(3)
+    ]
+    db.add_all(bookings)
+    db.commit()
+    return [booking.id for booking in bookings]
+
+def _statuses(db, ids):
+    db.expire_all()
+    return [(b.reminder_status, b.reminder_attempts) for b in db.query(Booking).filter(Booking.id.in_(ids)).order_by(Booking.id)]
+
+def test_only_definite_rejections_are_retried(db, due_bookings):
+    db.query(Booking).update({"reminder_status": "claimed"}, synchronize_session=False)
+    db.commit()
+    sent, rejected, unknown = due_bookings
+    complete_reminders(db, [(sent, True), (rejected, False), (unknown, None)], max_attempts=3)
+    assert _statuses(db, due_bookings) == [("sent", 0), (None, 1), ("unknown", 1)]
+
+def test_claims_are_released_when_send_fails_before_sending(db, due_bookings, monkeypatch):
+    monkeypatch.setattr(sms, "P1SMS_API_KEY", None)
+    scanner = ReminderScanner([engine], interval=60, lead=timedelta(hours=6), batch_size=10, max_attempts=3, claim_timeout=timedelta(minutes=10))
+    with pytest.raises(HTTPException):
+        scanner.scan(engine)
+    assert _statuses(db, due_bookings) == [(None, 0)] * 3
+
+def _post_with(handler):
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await sms._post_sms(client, [{"phone": "79000000000", "text": "x"}])
+    return asyncio.run(post())
+
+def _raise(error):
+    def handler(request):
+        raise error
+    return handler
+
+@pytest.mark.parametrize("handler", [
+    _raise(httpx.ReadTimeout("read timeout")),
+    _raise(httpx.RemoteProtocolError("connection closed")),
+    lambda request: httpx.Response(503, text="unavailable"),
+])
+def test_ambiguous_outcomes_are_unknown(handler):
+    with pytest.raises(SmsOutcomeUnknown):
+        _post_with(handler)
+
+@pytest.mark.parametrize("handler", [
+    _raise(httpx.ConnectError("refused")),
+    lambda request: httpx.Response(400, text="bad request"),
+    lambda request: httpx.Response(200, json={"status": "error", "message": "bad key"}),
+])
+def test_definite_failures_are_not_unknown(handler):
+    with pytest.raises(HTTPException) as error:
+        _post_with(handler)
+    assert not isinstance(error.value, SmsOutcomeUnknown)
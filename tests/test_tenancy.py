@@ -0,0 +1,103 @@
+"""
+Изоляция клубов. Тесты с двумя базами запускаются при TEST_DATABASE_URL и TEST_SHARD_DATABASE_URL —
+две пустые локальные базы PostgreSQL; их содержимое удаляется.
+"""
+import os
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, func, insert, select, text
+from app.db.base import Base
+from app.db.models import Club, Court, Holiday
+from app.db.session import SessionLocal, ShardMap, session_for_club
+from app.services.tariff_service import get_holidays, set_holidays
+from tests.conftest import auth_headers
+
+def test_set_holidays_keeps_other_clubs(db):
+    other = session_for_club(2)
+    try:
+        set_holidays(other, [{"date": date(2026, 12, 31), "name": "Новый год"}])
+        set_holidays(db, [{"date": date(2026, 11, 4), "name": None}])
+        set_holidays(db, [])
+        assert [h.date for h in get_holidays(other)] == [date(2026, 12, 31)]
+        assert get_holidays(db) == []
+    finally:
+        other.close()
+
+def test_hold_on_other_clubs_court_is_not_found(client, user):
+    other = session_for_club(2)
+    try:
+        court = Court(name="Чужой корт")
+        other.add(court)
+        other.commit()
+        court_id = court.id
+    finally:
+        other.close()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    response = client.post("/api/bookings/holds", headers=auth_headers(user), json={
+        "court_id": court_id,
+        "start_time": f"{start.isoformat()}Z",
+        "end_time": f"{(start + timedelta(hours=1)).isoformat()}Z"
+    })
+    assert response.status_code == 404
+
+def test_unknown_club_header_is_rejected(client):
+    assert client.get("/api/courts/", headers={"X-Club-Id": "2"}).status_code == 200
+    assert client.get("/api/courts/", headers={"X-Club-Id": "777"}).status_code == 400
+    assert client.get("/api/courts/", headers={"X-Club-Id": "abc"}).status_code == 400
+
+two_databases = pytest.mark.skipif(
+    not (os.getenv("TEST_DATABASE_URL") and os.getenv("TEST_SHARD_DATABASE_URL")),
+    reason="нужны две базы PostgreSQL: TEST_DATABASE_URL и TEST_SHARD_DATABASE_URL"
+)
+
+def _reset(url: str):
+    pg_engine = create_engine(url)
+    with pg_engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    return pg_engine
+
+@two_databases
+def test_shard_map_routes_clubs_to_their_databases():
+    main, shard = _reset(os.environ["TEST_DATABASE_URL"]), _reset(os.environ["TEST_SHARD_DATABASE_URL"])
+    shard_map = ShardMap(main, {"2": os.environ["TEST_SHARD_DATABASE_URL"]})
+    try:
+        for club_id, club_engine in ((1, main), (2, shard_map.engine_for(2))):
+            Base.metadata.create_all(club_engine)
+            with SessionLocal(bind=club_engine, info={"club_id": club_id}) as db:
+                db.add(Club(id=club_id, name=f"Клуб {club_id}"))
+                db.flush()
+                db.add_all([Court(name="Корт 1"), Holiday(date=date(2026, 12, 31))])
+                db.commit()
+        assert shard_map.engine_for(2).url == shard.url
+        for club_engine, club_id in ((main, 1), (shard, 2)):
+            with club_engine.connect() as connection:
+                assert connection.execute(select(Court.club_id)).scalars().all() == [club_id]
+                assert connection.execute(select(Holiday.club_id)).scalars().all() == [club_id]
+    finally:
+        for database in shard_map.databases():
+            database.dispose()
+
+def _alembic(url: str, *args):
+    env = {**os.environ, "DATABASE_URL": url}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-m", "alembic", *args], cwd=root, env=env, check=True)
+
+@two_databases
+@pytest.mark.parametrize("env_name", ["TEST_DATABASE_URL", "TEST_SHARD_DATABASE_URL"])
+def test_migrations_upgrade_downgrade_and_sequences(env_name):
+    url = os.environ[env_name]
+    pg_engine = _reset(url)
+    try:
+        _alembic(url, "upgrade", "head")
+        # Повторный проход через add_clubs: setval после явного id=1 не должен ломать последовательность
+        _alembic(url, "downgrade", "7b3d5f1e8c26")
+        _alembic(url, "upgrade", "head")
+        with pg_engine.begin() as connection:
+            club_id = connection.execute(insert(Club).values(name="Новый клуб").returning(Club.id)).scalar()
+            assert club_id > 1
+            assert connection.execute(select(func.count()).select_from(Club)).scalar() == 2
+    finally:
+        pg_engine.dispose()
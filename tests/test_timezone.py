@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.services.booking_service import _overlay_bookings
+from app.utils.timezone import get_zone
+from tests.conftest import auth_headers
+
+def test_overlay_uses_wall_clock_on_dst_day():
+    zone = get_zone("Europe/Berlin")
+    day_start = datetime(2026, 3, 29, tzinfo=zone)  # 02:00 -> 03:00, в сутках 23 часа
+    template = [(hour * 60, hour * 60 + 60, f"{hour:02d}:00", f"{hour + 1:02d}:00") for hour in (9, 10, 11)]
+    start = datetime(2026, 3, 29, 10, 0, tzinfo=zone).astimezone(timezone.utc)
+    booked = SimpleNamespace(start_time=start, end_time=start + timedelta(hours=1), user=None)
+    slots = _overlay_bookings(template, None, [booked], day_start, is_admin=False)
+    assert [slot.is_booked for slot in slots] == [False, True, False]
+
+def test_booking_times_are_serialized_in_club_zone(client, user, booking):
+    offset = "+03:00"  # DEFAULT_TIMEZONE — Europe/Moscow
+    full = client.get("/api/bookings/my", headers=auth_headers(user)).json()
+    sparse = client.get("/api/bookings/my?fields=id,start_time", headers=auth_headers(user)).json()
+    one = client.get(f"/api/bookings/{booking.id}", headers=auth_headers(user)).json()
+    for item in (full[0], sparse[0], one):
+        assert item["start_time"].endswith(offset)
+
+def test_created_booking_is_serialized_in_club_zone(client, user, court):
+    start = (datetime.now(timezone.utc) + timedelta(days=2)).replace(hour=12, minute=0, second=0, microsecond=0)
+    response = client.post("/api/bookings/", headers=auth_headers(user), json={
+        "court_id": court.id,
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=1)).isoformat(),
+        "price": 1000
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["start_time"] == start.astimezone(get_zone("Europe/Moscow")).isoformat()